@@ -3,13 +3,16 @@ import os
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
-import openai
 from sqlalchemy import func
 from app import db
 from models import Invoice, Client, InvoiceLineItem, AIInteraction, InventoryItem
+from lazy_imports import lazy_import
+from metrics import track
+from sql_functions import days_between
+from money import sum_rupees
 
-# Initialize OpenAI client
-openai.api_key = os.environ.get("OPENAI_API_KEY")
+# The OpenAI client is imported on first use and configured in initialize_ai_models()
+openai = lazy_import('openai')
 
 class AIInvoiceAssistant:
     """AI-powered invoice assistance with GPT-4o"""
@@ -66,11 +69,12 @@ class AIInvoiceAssistant:
             }}
             """
             
-            response = openai.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                response_format={"type": "json_object"}
-            )
+            with track('openai'):
+                response = openai.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    response_format={"type": "json_object"}
+                )
             
             analysis = json.loads(response.choices[0].message.content)
             
@@ -139,11 +143,12 @@ class AIInvoiceAssistant:
             }}
             """
             
-            response = openai.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                response_format={"type": "json_object"}
-            )
+            with track('openai'):
+                response = openai.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    response_format={"type": "json_object"}
+                )
             
             suggestions = json.loads(response.choices[0].message.content)
             return suggestions.get("suggestions", [])
@@ -178,11 +183,12 @@ class AIInvoiceAssistant:
             }}
             """
             
-            response = openai.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                response_format={"type": "json_object"}
-            )
+            with track('openai'):
+                response = openai.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    response_format={"type": "json_object"}
+                )
             
             optimization = json.loads(response.choices[0].message.content)
             return optimization.get("optimized_items", [])
@@ -219,11 +225,11 @@ class PredictiveAnalytics:
                 month_start = current_date.replace(day=1) - timedelta(days=30*i)
                 month_end = month_start + timedelta(days=30)
                 
-                revenue = db.session.query(func.sum(Invoice.total_amount))\
+                revenue = db.session.query(sum_rupees(Invoice.total_amount_paise))\
                     .filter(Invoice.invoice_date.between(month_start.date(), month_end.date()))\
                     .filter(Invoice.payment_status == 'Paid').scalar() or 0
                 
-                outstanding = db.session.query(func.sum(Invoice.total_amount))\
+                outstanding = db.session.query(sum_rupees(Invoice.total_amount_paise))\
                     .filter(Invoice.invoice_date.between(month_start.date(), month_end.date()))\
                     .filter(Invoice.payment_status.in_(['Unpaid', 'Partially Paid'])).scalar() or 0
                 
@@ -268,11 +274,12 @@ class PredictiveAnalytics:
             }}
             """
             
-            response = openai.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                response_format={"type": "json_object"}
-            )
+            with track('openai'):
+                response = openai.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    response_format={"type": "json_object"}
+                )
             
             prediction = json.loads(response.choices[0].message.content)
             return prediction
@@ -288,9 +295,9 @@ class PredictiveAnalytics:
             payment_data = db.session.query(
                 Client.name,
                 Client.id,
-                func.avg(func.julianday(Invoice.payment_date) - func.julianday(Invoice.due_date)).label('avg_delay'),
+                func.avg(days_between(Invoice.payment_date, Invoice.due_date)).label('avg_delay'),
                 func.count(Invoice.id).label('invoice_count'),
-                func.sum(Invoice.total_amount).label('total_business')
+                sum_rupees(Invoice.total_amount_paise).label('total_business')
             ).join(Invoice)\
             .filter(Invoice.payment_status == 'Paid')\
             .filter(Invoice.payment_date.isnot(None))\
@@ -334,11 +341,12 @@ class PredictiveAnalytics:
             }}
             """
             
-            response = openai.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                response_format={"type": "json_object"}
-            )
+            with track('openai'):
+                response = openai.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    response_format={"type": "json_object"}
+                )
             
             analysis = json.loads(response.choices[0].message.content)
             return analysis
@@ -403,11 +411,12 @@ class InventoryAI:
             }}
             """
             
-            response = openai.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                response_format={"type": "json_object"}
-            )
+            with track('openai'):
+                response = openai.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    response_format={"type": "json_object"}
+                )
             
             forecast = json.loads(response.choices[0].message.content)
             
@@ -426,8 +435,10 @@ def initialize_ai_models():
     """Initialize AI services and perform health checks"""
     try:
         # Test OpenAI connection
-        if not openai.api_key:
+        api_key = os.environ.get("OPENAI_API_KEY")
+        if not api_key:
             raise Exception("OpenAI API key not configured")
+        openai.api_key = api_key
         
         # Initialize AI services
         global ai_assistant, predictive_analytics, inventory_ai
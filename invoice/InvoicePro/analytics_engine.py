@@ -2,108 +2,74 @@ import json
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
-from sqlalchemy import func, desc, and_, or_
+from sqlalchemy import func, or_
 from collections import defaultdict
-from sqlalchemy import func, desc
-from models import Client, Invoice
-from app import db
-from models import Client
+from types import SimpleNamespace
 from app import db
 from models import Invoice, Client, InvoiceLineItem, User, AIInteraction, ExpenseTracking, InventoryItem
+from sql_functions import days_between
+from money import PAISE_PER_RUPEE, sum_rupees
+from revenue_rollup import monthly_rollup, month_key
+from cache import memoize
+from receivables import receivables_aging
+from segmentation import client_segmentation
+from service_registry import services
+from fact_store import active_fact_store
+import config
 
-class AnalyticsEngine:
-    """Advanced analytics engine with AI-powered insights"""
-    def fetch_top_clients(limit=10):
-        query = (
-            db.session.query(
-                Client.id,
-                Client.name,
-                func.count(Invoice.id).label("invoice_count"),
-                func.sum(Invoice.amount).label("total_revenue"),
-                (func.sum(Invoice.amount) / func.count(Invoice.id)).label("avg_invoice_value")
-            )
-            .select_from(Invoice)
-            .join(Client, Invoice.client_id == Client.id)
-            .group_by(Client.id)
-            .order_by(desc("total_revenue"))
-            .limit(limit)
-        )
 
-        result = query.all()
+def _cacheable(result):
+    # Failed analyses come back as {'error': ...}; retry those on the next call
+    return not (isinstance(result, dict) and 'error' in result)
 
-        top_clients = []
-        for r in result:
-            top_clients.append({
-                "name": r.name,
-                "total_revenue": r.total_revenue,
-                "invoice_count": r.invoice_count,
-                "avg_invoice_value": r.avg_invoice_value
-            })
 
-        return top_clients
-    def get_client_performance_metrics():
-        """
-        Returns client performance data for the analytics dashboard
-        """
-        client_performance = {
-            'top_clients': fetch_top_clients(),
-            'segments': {
-                'by_value': {'high_value': 0, 'medium_value': 0, 'low_value': 0}
-            },
-            'lifecycle': {
-                'stages': [
-                    {'stage': 'In Discussion', 'count': 0},
-                    {'stage': 'New', 'count': 0},
-                    {'stage': 'Quoted', 'count': 0}
-                ]
-            },
-            'risk_analysis': {
-                'risk_distribution': {'high_risk': 0, 'medium_risk': 0, 'low_risk': 0}
-            }
-        }
-        return client_performance
+# Results are shared across requests until invoice/client data changes
+analytics_cache = memoize(ttl=config.CACHE_DEFAULT_TIMEOUT, maxsize=config.ANALYTICS_CACHE_SIZE,
+                          cache_if=_cacheable, enabled=config.ANALYTICS_CACHE_ENABLED)
 
+class AnalyticsEngine:
+    """Advanced analytics engine with AI-powered insights"""
     
-    def __init__(self):
-        self.cache = {}
-        self.cache_timeout = 300  # 5 minutes
+    def __init__(self, db_session=None):
+        self.db_session = db_session if db_session is not None else db.session
     
+    @analytics_cache
     def get_revenue_trends(self, time_range: str = '12m') -> Dict[str, Any]:
         """Get revenue trends with predictive analysis"""
+        try:
+            return self.build_revenue_trends(time_range, monthly_rollup())
+        except Exception as e:
+            logging.error(f"Revenue trends analysis failed: {e}")
+            return {'error': str(e)}
+    
+    def build_revenue_trends(self, time_range: str, paid_months: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Revenue trends from the paid ``monthly_rollup()`` rows"""
         try:
             # Parse time range
             months = self._parse_time_range(time_range)
             
             # Get historical revenue data
             end_date = datetime.now()
-            start_date = end_date - timedelta(days=30 * months)
+            start_month = month_key(end_date - timedelta(days=30 * months))
             
-            monthly_revenue = db.session.query(
-                func.strftime('%Y-%m', Invoice.invoice_date).label('month'),
-                func.sum(Invoice.total_amount).label('revenue'),
-                func.count(Invoice.id).label('invoice_count'),
-                func.avg(Invoice.total_amount).label('avg_invoice_value')
-            ).filter(
-                Invoice.invoice_date >= start_date.date(),
-                Invoice.payment_status == 'Paid'
-            ).group_by('month').order_by('month').all()
+            monthly_revenue = [row for row in paid_months if row['month'] >= start_month and row['invoice_count']]
             
             # Calculate growth rates
             revenue_data = []
             previous_revenue = 0
             
             for i, data in enumerate(monthly_revenue):
-                current_revenue = float(data.revenue or 0)
+                current_revenue = data['revenue']
                 growth_rate = 0
                 
                 if i > 0 and previous_revenue > 0:
                     growth_rate = ((current_revenue - previous_revenue) / previous_revenue) * 100
                 
                 revenue_data.append({
-                    'month': data.month,
+                    'month': data['month'],
                     'revenue': current_revenue,
-                    'invoice_count': data.invoice_count,
-                    'avg_invoice_value': float(data.avg_invoice_value or 0),
+                    'invoice_count': data['invoice_count'],
+                    'avg_invoice_value': current_revenue / data['invoice_count'],
                     'growth_rate': round(growth_rate, 2)
                 })
                 
@@ -132,50 +98,36 @@ class AnalyticsEngine:
             logging.error(f"Revenue trends analysis failed: {e}")
             return {'error': str(e)}
     
+    @analytics_cache
     def get_client_performance_metrics(self) -> Dict[str, Any]:
         """Comprehensive client performance analysis"""
+        try:
+            return self.build_client_performance_metrics(self._analyze_client_segments(), self._analyze_client_lifecycle())
+        except Exception as e:
+            logging.error(f"Client performance analysis failed: {e}")
+            return {'error': str(e)}
+    
+    def build_client_performance_metrics(self, segmentation: Dict[str, Any],
+                                         lifecycle_analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """Client performance around precomputed segmentation and lifecycle results"""
         try:
             # Top performing clients
-            top_clients = db.session.query(
-                Client.id,
-                Client.name,
-                Client.client_type,
-                Client.ai_risk_score,
-                Client.predicted_ltv,
-                func.sum(Invoice.total_amount).label('total_revenue'),
-                func.count(Invoice.id).label('invoice_count'),
-                func.avg(Invoice.total_amount).label('avg_invoice_value'),
-                func.max(Invoice.invoice_date).label('last_invoice_date')
-            ).join(Invoice).filter(
-                Invoice.payment_status == 'Paid'
-            ).group_by(Client.id).order_by(
-                func.sum(Invoice.total_amount).desc()
-            ).limit(20).all()
-            
-            # Client segmentation analysis
-            client_segments = self._analyze_client_segments()
-            
-            # Client lifecycle analysis
-            lifecycle_analysis = self._analyze_client_lifecycle()
+            top_clients = self._top_clients(20)
             
-            # Client risk analysis
-            risk_analysis = self._analyze_client_risk()
+            # Client value and risk segmentation (one query)
+            client_segments = {
+                key: segmentation[key]
+                for key in ('by_value', 'value_histogram', 'value_risk_matrix', 'thresholds')
+                if key in segmentation
+            }
+            risk_analysis = {
+                key: segmentation[key]
+                for key in ('risk_distribution', 'risk_histogram')
+                if key in segmentation
+            }
             
             return {
-                'top_clients': [
-                    {
-                        'id': client.id,
-                        'name': client.name,
-                        'type': client.client_type,
-                        'total_revenue': float(client.total_revenue),
-                        'invoice_count': client.invoice_count,
-                        'avg_invoice_value': float(client.avg_invoice_value),
-                        'last_invoice_date': client.last_invoice_date.isoformat() if client.last_invoice_date else None,
-                        'risk_score': float(client.ai_risk_score or 0),
-                        'predicted_ltv': float(client.predicted_ltv or 0)
-                    }
-                    for client in top_clients
-                ],
+                'top_clients': top_clients,
                 'segments': client_segments,
                 'lifecycle': lifecycle_analysis,
                 'risk_analysis': risk_analysis
@@ -185,83 +137,35 @@ class AnalyticsEngine:
             logging.error(f"Client performance analysis failed: {e}")
             return {'error': str(e)}
     
+    @analytics_cache
     def get_payment_analytics(self) -> Dict[str, Any]:
         """Advanced payment behavior analytics"""
         try:
-            # Payment status distribution
-            payment_status_dist = db.session.query(
-                Invoice.payment_status,
-                func.count(Invoice.id).label('count'),
-                func.sum(Invoice.total_amount).label('amount')
-            ).group_by(Invoice.payment_status).all()
-            
-            # Payment timing analysis
-            payment_timing = db.session.query(
-                func.avg(
-                    func.julianday(Invoice.payment_date) - func.julianday(Invoice.due_date)
-                ).label('avg_delay'),
-                func.min(
-                    func.julianday(Invoice.payment_date) - func.julianday(Invoice.due_date)
-                ).label('min_delay'),
-                func.max(
-                    func.julianday(Invoice.payment_date) - func.julianday(Invoice.due_date)
-                ).label('max_delay')
-            ).filter(
-                Invoice.payment_status == 'Paid',
-                Invoice.payment_date.isnot(None),
-                Invoice.due_date.isnot(None)
-            ).first()
-            
-            # Payment mode analysis
-            payment_modes = db.session.query(
-                Invoice.payment_mode,
-                func.count(Invoice.id).label('count'),
-                func.sum(Invoice.total_amount).label('amount')
-            ).filter(
-                Invoice.payment_status == 'Paid',
-                Invoice.payment_mode.isnot(None)
-            ).group_by(Invoice.payment_mode).all()
-            
+            return self.build_payment_analytics(monthly_rollup(), self._analyze_outstanding_invoices())
+        except Exception as e:
+            logging.error(f"Payment analytics failed: {e}")
+            return {'error': str(e)}
+    
+    def build_payment_analytics(self, paid_months: List[Dict[str, Any]],
+                                outstanding_analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """Payment analytics from the paid ``monthly_rollup()`` rows and the outstanding analysis"""
+        try:
             # Monthly collection trends
-            monthly_collections = db.session.query(
-                func.strftime('%Y-%m', Invoice.payment_date).label('month'),
-                func.sum(Invoice.total_amount).label('collected'),
-                func.count(Invoice.id).label('invoices_paid')
-            ).filter(
-                Invoice.payment_status == 'Paid',
-                Invoice.payment_date >= (datetime.now() - timedelta(days=365)).date()
-            ).group_by('month').order_by('month').all()
-            
-            # Outstanding analysis
-            outstanding_analysis = self._analyze_outstanding_invoices()
+            last_year = month_key(datetime.now() - timedelta(days=365))
+            monthly_collections = [
+                row for row in paid_months
+                if row['month'] >= last_year and row['collected_count']
+            ]
             
             return {
-                'payment_status_distribution': [
-                    {
-                        'status': item.payment_status,
-                        'count': item.count,
-                        'amount': float(item.amount or 0)
-                    }
-                    for item in payment_status_dist
-                ],
-                'payment_timing': {
-                    'avg_delay_days': float(payment_timing.avg_delay or 0),
-                    'min_delay_days': float(payment_timing.min_delay or 0),
-                    'max_delay_days': float(payment_timing.max_delay or 0)
-                },
-                'payment_modes': [
-                    {
-                        'mode': item.payment_mode,
-                        'count': item.count,
-                        'amount': float(item.amount)
-                    }
-                    for item in payment_modes
-                ],
+                'payment_status_distribution': self._payment_status_distribution(),
+                'payment_timing': self._payment_timing(),
+                'payment_modes': self._payment_mode_totals(),
                 'monthly_collections': [
                     {
-                        'month': item.month,
-                        'collected': float(item.collected),
-                        'invoices_paid': item.invoices_paid
+                        'month': item['month'],
+                        'collected': item['collected'],
+                        'invoices_paid': item['collected_count']
                     }
                     for item in monthly_collections
                 ],
@@ -272,41 +176,40 @@ class AnalyticsEngine:
             logging.error(f"Payment analytics failed: {e}")
             return {'error': str(e)}
     
+    @analytics_cache
     def get_profitability_analysis(self) -> Dict[str, Any]:
         """Detailed profitability analysis with cost tracking"""
         try:
-            # Overall profitability
-            overall_profit = db.session.query(
-                func.sum(InvoiceLineItem.unit_price * InvoiceLineItem.quantity).label('total_revenue'),
-                func.sum(InvoiceLineItem.cost_price * InvoiceLineItem.quantity).label('total_cost')
-            ).join(Invoice).filter(
-                Invoice.payment_status == 'Paid'
-            ).first()
+            return self.build_profitability_analysis(monthly_rollup())
+        except Exception as e:
+            logging.error(f"Profitability analysis failed: {e}")
+            return {'error': str(e)}
+    
+    def build_profitability_analysis(self, paid_months: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Profitability from the paid ``monthly_rollup()`` rows plus the per-client query"""
+        try:
+            # Revenue here is net of tax, matching the line items' cost prices
+            paid_months = [row for row in paid_months if row['invoice_count']]
             
-            total_revenue = float(overall_profit.total_revenue or 0)
-            total_cost = float(overall_profit.total_cost or 0)
+            # Overall profitability
+            total_revenue = sum(row['revenue'] - row['tax'] for row in paid_months)
+            total_cost = sum(row['cost'] for row in paid_months)
             total_profit = total_revenue - total_cost
             profit_margin = (total_profit / total_revenue * 100) if total_revenue > 0 else 0
             
             # Monthly profitability trends
-            monthly_profit = db.session.query(
-                func.strftime('%Y-%m', Invoice.invoice_date).label('month'),
-                func.sum(InvoiceLineItem.unit_price * InvoiceLineItem.quantity).label('revenue'),
-                func.sum(InvoiceLineItem.cost_price * InvoiceLineItem.quantity).label('cost')
-            ).join(Invoice).filter(
-                Invoice.payment_status == 'Paid',
-                Invoice.invoice_date >= (datetime.now() - timedelta(days=365)).date()
-            ).group_by('month').order_by('month').all()
-            
+            last_year = month_key(datetime.now() - timedelta(days=365))
             monthly_data = []
-            for item in monthly_profit:
-                revenue = float(item.revenue or 0)
-                cost = float(item.cost or 0)
+            for item in paid_months:
+                if item['month'] < last_year:
+                    continue
+                revenue = item['revenue'] - item['tax']
+                cost = item['cost']
                 profit = revenue - cost
                 margin = (profit / revenue * 100) if revenue > 0 else 0
                 
                 monthly_data.append({
-                    'month': item.month,
+                    'month': item['month'],
                     'revenue': revenue,
                     'cost': cost,
                     'profit': profit,
@@ -314,27 +217,16 @@ class AnalyticsEngine:
                 })
             
             # Client profitability analysis
-            client_profitability = db.session.query(
-                Client.id,
-                Client.name,
-                func.sum(InvoiceLineItem.unit_price * InvoiceLineItem.quantity).label('revenue'),
-                func.sum(InvoiceLineItem.cost_price * InvoiceLineItem.quantity).label('cost')
-            ).join(Invoice).join(InvoiceLineItem).filter(
-                Invoice.payment_status == 'Paid'
-            ).group_by(Client.id).order_by(
-                func.sum(InvoiceLineItem.unit_price * InvoiceLineItem.quantity).desc()
-            ).limit(10).all()
-            
             client_data = []
-            for client in client_profitability:
-                revenue = float(client.revenue or 0)
-                cost = float(client.cost or 0)
+            for client in self._client_profitability(10):
+                revenue = client['revenue']
+                cost = client['cost']
                 profit = revenue - cost
                 margin = (profit / revenue * 100) if revenue > 0 else 0
                 
                 client_data.append({
-                    'id': client.id,
-                    'name': client.name,
+                    'id': client['id'],
+                    'name': client['name'],
                     'revenue': revenue,
                     'cost': cost,
                     'profit': profit,
@@ -419,16 +311,8 @@ class AnalyticsEngine:
             end_date = datetime.now()
             start_date = end_date - timedelta(days=30 * months)
             
-            monthly_data = db.session.query(
-                func.strftime('%Y-%m', Invoice.invoice_date).label('month'),
-                func.sum(Invoice.total_amount).label('revenue')
-            ).filter(
-                Invoice.invoice_date >= start_date.date(),
-                Invoice.payment_status == 'Paid'
-            ).group_by('month').order_by('month').all()
-            
             # Fill in missing months with zero revenue
-            revenue_dict = {item.month: float(item.revenue) for item in monthly_data}
+            revenue_dict = {item['month']: item['revenue'] for item in monthly_rollup(since=start_date)}
             
             result = []
             current_date = start_date.replace(day=1)
@@ -454,73 +338,98 @@ class AnalyticsEngine:
             logging.error(f"Monthly revenue trend failed: {e}")
             return []
     
+    @staticmethod
+    def build_invoice_insight(client_risk_score: Optional[float], predicted_payment_date,
+                              ai_risk_assessment) -> Dict[str, Any]:
+        """AI insight for one invoice from already-loaded column values"""
+        invoice_insights = {
+            'payment_risk': 'Low',
+            'predicted_payment_date': None,
+            'ai_confidence': 0.0
+        }
+        
+        # Risk assessment based on client history
+        if client_risk_score:
+            if client_risk_score > 0.7:
+                invoice_insights['payment_risk'] = 'High'
+            elif client_risk_score > 0.4:
+                invoice_insights['payment_risk'] = 'Medium'
+        
+        # Predicted payment date
+        if predicted_payment_date:
+            invoice_insights['predicted_payment_date'] = predicted_payment_date.isoformat()
+        
+        # AI risk assessment confidence
+        if isinstance(ai_risk_assessment, dict):
+            invoice_insights['ai_confidence'] = ai_risk_assessment.get('confidence', 0.0)
+        
+        return invoice_insights
+    
     def get_ai_invoice_insights(self, invoice_ids: List[int]) -> Dict[str, Any]:
-        """Get AI insights for specific invoices"""
+        """Get AI insights for specific invoices
+        
+        The whole batch is one query selecting only the columns the insight
+        needs (joined to the client's risk score), keyed by invoice id in
+        the order given.
+        """
         try:
-            insights = {}
-            
-            for invoice_id in invoice_ids:
-                invoice = Invoice.query.get(invoice_id)
-                if not invoice:
-                    continue
-                
-                invoice_insights = {
-                    'payment_risk': 'Low',
-                    'predicted_payment_date': None,
-                    'ai_confidence': 0.0
-                }
-                
-                # Risk assessment based on client history
-                if invoice.client.ai_risk_score:
-                    if invoice.client.ai_risk_score > 0.7:
-                        invoice_insights['payment_risk'] = 'High'
-                    elif invoice.client.ai_risk_score > 0.4:
-                        invoice_insights['payment_risk'] = 'Medium'
-                    else:
-                        invoice_insights['payment_risk'] = 'Low'
-                
-                # Predicted payment date
-                if invoice.predicted_payment_date:
-                    invoice_insights['predicted_payment_date'] = invoice.predicted_payment_date.isoformat()
-                
-                # AI risk assessment confidence
-                if invoice.ai_risk_assessment:
-                    invoice_insights['ai_confidence'] = invoice.ai_risk_assessment.get('confidence', 0.0)
-                
-                insights[invoice_id] = invoice_insights
-            
-            return insights
+            if not invoice_ids:
+                return {}
+            
+            rows = db.session.query(
+                Invoice.id,
+                Invoice.predicted_payment_date,
+                Invoice.ai_risk_assessment,
+                Client.ai_risk_score
+            ).outerjoin(Client, Client.id == Invoice.client_id).filter(
+                Invoice.id.in_(invoice_ids)
+            ).all()
+            
+            by_id = {
+                row.id: self.build_invoice_insight(row.ai_risk_score, row.predicted_payment_date, row.ai_risk_assessment)
+                for row in rows
+            }
+            return {invoice_id: by_id[invoice_id] for invoice_id in invoice_ids if invoice_id in by_id}
             
         except Exception as e:
             logging.error(f"AI invoice insights failed: {e}")
             return {}
     
-    def find_similar_invoices(self, invoice_id: int, limit: int = 5) -> List[Dict[str, Any]]:
-        """Find similar invoices based on AI analysis"""
+    def find_similar_invoices(self, invoice_id: int, limit: int = 5,
+                              cross_client: bool = False) -> List[Dict[str, Any]]:
+        """Find similar invoices by amount, date, line count and line-item descriptions
+
+        Scores come from the in-memory similarity index; only the matches are
+        read from the database. Same client only unless ``cross_client``.
+        """
         try:
-            invoice = Invoice.query.get(invoice_id)
-            if not invoice:
+            index = services.get('invoice_similarity_index')
+            if index is None:
+                return []
+            matches = index.search(invoice_id, limit=limit, cross_client=cross_client)
+            if not matches:
                 return []
             
-            # Find invoices with similar amounts and same client
-            similar_invoices = Invoice.query.filter(
-                Invoice.id != invoice_id,
-                Invoice.client_id == invoice.client_id,
-                Invoice.total_amount.between(
-                    invoice.total_amount * 0.8,
-                    invoice.total_amount * 1.2
-                )
-            ).order_by(Invoice.invoice_date.desc()).limit(limit).all()
+            rows = {
+                row.id: row for row in self.db_session.query(
+                    Invoice.id, Invoice.invoice_number, Invoice.invoice_date, Invoice.client_id,
+                    Invoice.total_amount_paise, Invoice.payment_status
+                ).filter(Invoice.id.in_([match_id for match_id, _ in matches]))
+            }
             
             result = []
-            for similar_invoice in similar_invoices:
+            for match_id, score in matches:
+                row = rows.get(match_id)
+                if row is None:
+                    continue
                 result.append({
-                    'id': similar_invoice.id,
-                    'invoice_number': similar_invoice.invoice_number,
-                    'date': similar_invoice.invoice_date.isoformat(),
-                    'amount': float(similar_invoice.total_amount),
-                    'payment_status': similar_invoice.payment_status,
-                    'similarity_score': self._calculate_similarity_score(invoice, similar_invoice)
+                    'id': row.id,
+                    'invoice_number': row.invoice_number,
+                    'date': row.invoice_date.isoformat(),
+                    'client_id': row.client_id,
+                    'amount': row.total_amount_paise / PAISE_PER_RUPEE,
+                    'payment_status': row.payment_status,
+                    'similarity_score': score
                 })
             
             return result
@@ -529,6 +438,138 @@ class AnalyticsEngine:
             logging.error(f"Similar invoices search failed: {e}")
             return []
     
+    # Invoice group-bys, answered by the fact store when the columnar backend is on
+    
+    def _payment_status_distribution(self) -> List[Dict[str, Any]]:
+        store = active_fact_store()
+        if store is not None:
+            return store.payment_status_distribution()
+        
+        rows = db.session.query(
+            Invoice.payment_status,
+            func.count(Invoice.id).label('count'),
+            sum_rupees(Invoice.total_amount_paise).label('amount')
+        ).group_by(Invoice.payment_status).all()
+        return [
+            {'status': item.payment_status, 'count': item.count, 'amount': float(item.amount or 0)}
+            for item in rows
+        ]
+    
+    def _payment_timing(self) -> Dict[str, float]:
+        store = active_fact_store()
+        if store is not None:
+            return store.payment_timing()
+        
+        delay = days_between(Invoice.payment_date, Invoice.due_date)
+        timing = db.session.query(
+            func.avg(delay).label('avg_delay'),
+            func.min(delay).label('min_delay'),
+            func.max(delay).label('max_delay')
+        ).filter(
+            Invoice.payment_status == 'Paid',
+            Invoice.payment_date.isnot(None),
+            Invoice.due_date.isnot(None)
+        ).first()
+        return {
+            'avg_delay_days': float(timing.avg_delay or 0),
+            'min_delay_days': float(timing.min_delay or 0),
+            'max_delay_days': float(timing.max_delay or 0)
+        }
+    
+    def _payment_mode_totals(self) -> List[Dict[str, Any]]:
+        store = active_fact_store()
+        if store is not None:
+            return store.payment_mode_totals()
+        
+        rows = db.session.query(
+            Invoice.payment_mode,
+            func.count(Invoice.id).label('count'),
+            sum_rupees(Invoice.total_amount_paise).label('amount')
+        ).filter(
+            Invoice.payment_status == 'Paid',
+            Invoice.payment_mode.isnot(None)
+        ).group_by(Invoice.payment_mode).all()
+        return [
+            {'mode': item.payment_mode, 'count': item.count, 'amount': float(item.amount)}
+            for item in rows
+        ]
+    
+    def _top_clients(self, limit: int) -> List[Dict[str, Any]]:
+        """Clients by paid revenue"""
+        store = active_fact_store()
+        if store is not None:
+            totals = store.client_totals(limit)
+            clients = {
+                client.id: client for client in db.session.query(
+                    Client.id, Client.name, Client.client_type, Client.ai_risk_score, Client.predicted_ltv
+                ).filter(Client.id.in_([item['client_id'] for item in totals]))
+            }
+            rows = [
+                SimpleNamespace(**item, **clients[item['client_id']]._asdict())
+                for item in totals if item['client_id'] in clients
+            ]
+        else:
+            rows = db.session.query(
+                Client.id,
+                Client.name,
+                Client.client_type,
+                Client.ai_risk_score,
+                Client.predicted_ltv,
+                sum_rupees(Invoice.total_amount_paise).label('total_revenue'),
+                func.count(Invoice.id).label('invoice_count'),
+                func.avg(Invoice.total_amount).label('avg_invoice_value'),
+                func.max(Invoice.invoice_date).label('last_invoice_date')
+            ).join(Invoice).filter(
+                Invoice.payment_status == 'Paid'
+            ).group_by(Client.id).order_by(
+                sum_rupees(Invoice.total_amount_paise).desc()
+            ).limit(limit).all()
+        
+        return [
+            {
+                'id': client.id,
+                'name': client.name,
+                'type': client.client_type,
+                'total_revenue': float(client.total_revenue),
+                'invoice_count': client.invoice_count,
+                'avg_invoice_value': float(client.avg_invoice_value),
+                'last_invoice_date': client.last_invoice_date.isoformat() if client.last_invoice_date else None,
+                'risk_score': float(client.ai_risk_score or 0),
+                'predicted_ltv': float(client.predicted_ltv or 0)
+            }
+            for client in rows
+        ]
+    
+    def _client_profitability(self, limit: int) -> List[Dict[str, Any]]:
+        """Line-item revenue and cost of paid invoices per client"""
+        store = active_fact_store()
+        if store is not None:
+            totals = store.client_profitability(limit)
+            names = dict(db.session.query(Client.id, Client.name).filter(
+                Client.id.in_([item['client_id'] for item in totals])))
+            return [
+                {'id': item['client_id'], 'name': names[item['client_id']], 'revenue': item['revenue'], 'cost': item['cost']}
+                for item in totals if item['client_id'] in names
+            ]
+        
+        # Whole paise per line: the stored net amount, and the cost rounded as the rollup does
+        line_revenue = InvoiceLineItem.total_amount_paise - InvoiceLineItem.tax_amount_paise
+        line_cost = func.round(InvoiceLineItem.cost_price_paise * InvoiceLineItem.quantity)
+        rows = db.session.query(
+            Client.id,
+            Client.name,
+            sum_rupees(line_revenue).label('revenue'),
+            sum_rupees(line_cost).label('cost')
+        ).select_from(Client).join(Invoice).join(InvoiceLineItem).filter(
+            Invoice.payment_status == 'Paid'
+        ).group_by(Client.id).order_by(
+            func.sum(line_revenue).desc()
+        ).limit(limit).all()
+        return [
+            {'id': row.id, 'name': row.name, 'revenue': float(row.revenue or 0), 'cost': float(row.cost or 0)}
+            for row in rows
+        ]
+    
     # Helper methods
     
     def _parse_time_range(self, time_range: str) -> int:
@@ -556,37 +597,9 @@ class AnalyticsEngine:
             return 'stable'
     
     def _analyze_client_segments(self) -> Dict[str, Any]:
-        """Analyze client segments"""
+        """Analyze client value and risk segments"""
         try:
-            # Segment by revenue
-            high_value = db.session.query(func.count(Client.id)).join(Invoice).filter(
-                Invoice.payment_status == 'Paid'
-            ).group_by(Client.id).having(
-                func.sum(Invoice.total_amount) > 100000
-            ).count()
-            
-            medium_value = db.session.query(func.count(Client.id)).join(Invoice).filter(
-                Invoice.payment_status == 'Paid'
-            ).group_by(Client.id).having(
-                and_(
-                    func.sum(Invoice.total_amount) >= 25000,
-                    func.sum(Invoice.total_amount) <= 100000
-                )
-            ).count()
-            
-            low_value = db.session.query(func.count(Client.id)).join(Invoice).filter(
-                Invoice.payment_status == 'Paid'
-            ).group_by(Client.id).having(
-                func.sum(Invoice.total_amount) < 25000
-            ).count()
-            
-            return {
-                'by_value': {
-                    'high_value': high_value,
-                    'medium_value': medium_value,
-                    'low_value': low_value
-                }
-            }
+            return client_segmentation()
             
         except Exception as e:
             logging.error(f"Client segmentation failed: {e}")
@@ -611,91 +624,34 @@ class AnalyticsEngine:
             logging.error(f"Client lifecycle analysis failed: {e}")
             return {}
     
-    def _analyze_client_risk(self) -> Dict[str, Any]:
-        """Analyze client risk distribution"""
-        try:
-            high_risk = db.session.query(func.count(Client.id)).filter(
-                Client.ai_risk_score > 0.7
-            ).scalar() or 0
-            
-            medium_risk = db.session.query(func.count(Client.id)).filter(
-                and_(Client.ai_risk_score >= 0.3, Client.ai_risk_score <= 0.7)
-            ).scalar() or 0
-            
-            low_risk = db.session.query(func.count(Client.id)).filter(
-                Client.ai_risk_score < 0.3
-            ).scalar() or 0
-            
-            return {
-                'risk_distribution': {
-                    'high_risk': high_risk,
-                    'medium_risk': medium_risk,
-                    'low_risk': low_risk
-                }
-            }
-            
-        except Exception as e:
-            logging.error(f"Client risk analysis failed: {e}")
-            return {}
-    
     def _analyze_outstanding_invoices(self) -> Dict[str, Any]:
         """Analyze outstanding invoices"""
         try:
-            current_date = datetime.now().date()
-            
-            # Outstanding by age
-            overdue_30 = db.session.query(
-                func.count(Invoice.id).label('count'),
-                func.sum(Invoice.total_amount - Invoice.amount_paid).label('amount')
-            ).filter(
-                Invoice.payment_status.in_(['Unpaid', 'Partially Paid']),
-                Invoice.due_date < current_date - timedelta(days=30)
-            ).first()
-            
-            overdue_60 = db.session.query(
-                func.count(Invoice.id).label('count'),
-                func.sum(Invoice.total_amount - Invoice.amount_paid).label('amount')
-            ).filter(
-                Invoice.payment_status.in_(['Unpaid', 'Partially Paid']),
-                Invoice.due_date < current_date - timedelta(days=60)
-            ).first()
-            
-            overdue_90 = db.session.query(
-                func.count(Invoice.id).label('count'),
-                func.sum(Invoice.total_amount - Invoice.amount_paid).label('amount')
-            ).filter(
-                Invoice.payment_status.in_(['Unpaid', 'Partially Paid']),
-                Invoice.due_date < current_date - timedelta(days=90)
-            ).first()
-            
+            aging = receivables_aging()
             return {
-                'aging_analysis': {
-                    '30_days': {
-                        'count': overdue_30.count or 0,
-                        'amount': float(overdue_30.amount or 0)
-                    },
-                    '60_days': {
-                        'count': overdue_60.count or 0,
-                        'amount': float(overdue_60.amount or 0)
-                    },
-                    '90_days': {
-                        'count': overdue_90.count or 0,
-                        'amount': float(overdue_90.amount or 0)
-                    }
-                }
+                'aging_analysis': aging['buckets'],
+                'total': aging['total'],
+                'top_debtors': aging['top_debtors']
             }
             
         except Exception as e:
             logging.error(f"Outstanding analysis failed: {e}")
             return {}
     
-    def _generate_business_recommendations(self) -> List[str]:
-        """Generate AI-powered business recommendations"""
+    def _generate_business_recommendations(self, recent_revenue: Optional[Dict[str, Any]] = None,
+                                           payment_analytics: Optional[Dict[str, Any]] = None,
+                                           segmentation: Optional[Dict[str, Any]] = None) -> List[str]:
+        """Generate AI-powered business recommendations
+        
+        Takes already computed 3-month revenue trends, payment analytics and
+        segmentation when the caller has them; missing ones are computed here.
+        """
         try:
             recommendations = []
             
             # Analyze recent trends and generate recommendations
-            recent_revenue = self.get_revenue_trends('3m')
+            if recent_revenue is None:
+                recent_revenue = self.get_revenue_trends('3m')
             if 'summary' in recent_revenue:
                 trend = recent_revenue['summary'].get('trend_direction', 'stable')
                 
@@ -707,7 +663,8 @@ class AnalyticsEngine:
                     recommendations.append("Focus on client retention strategies to maintain growth momentum.")
             
             # Payment behavior recommendations
-            payment_analytics = self.get_payment_analytics()
+            if payment_analytics is None:
+                payment_analytics = self.get_payment_analytics()
             if 'payment_timing' in payment_analytics:
                 avg_delay = payment_analytics['payment_timing'].get('avg_delay_days', 0)
                 
@@ -716,9 +673,9 @@ class AnalyticsEngine:
                     recommendations.append("Consider offering early payment discounts to improve cash flow.")
             
             # Client risk recommendations
-            high_risk_clients = db.session.query(func.count(Client.id)).filter(
-                Client.ai_risk_score > 0.7
-            ).scalar() or 0
+            if segmentation is None:
+                segmentation = self._analyze_client_segments()
+            high_risk_clients = segmentation.get('risk_distribution', {}).get('high_risk', 0)
             
             if high_risk_clients > 0:
                 recommendations.append(f"You have {high_risk_clients} high-risk clients. Review credit terms and payment history.")
@@ -729,45 +686,6 @@ class AnalyticsEngine:
             logging.error(f"Business recommendations generation failed: {e}")
             return ["Unable to generate recommendations at this time."]
     
-    def _calculate_similarity_score(self, invoice1: Invoice, invoice2: Invoice) -> float:
-        """Calculate similarity score between two invoices"""
-        try:
-            score = 0.0
-            
-            # Amount similarity (40% weight)
-            amount_diff = abs(invoice1.total_amount - invoice2.total_amount)
-            max_amount = max(invoice1.total_amount, invoice2.total_amount)
-            amount_similarity = 1 - (amount_diff / max_amount) if max_amount > 0 else 1
-            score += amount_similarity * 0.4
-            
-            # Client similarity (30% weight)
-            if invoice1.client_id == invoice2.client_id:
-                score += 0.3
-            
-            # Date proximity (20% weight)
-            date_diff = abs((invoice1.invoice_date - invoice2.invoice_date).days)
-            date_similarity = max(0, 1 - (date_diff / 365))  # Similarity decreases over a year
-            score += date_similarity * 0.2
-            
-            # Item count similarity (10% weight)
-            count1 = len(invoice1.line_items)
-            count2 = len(invoice2.line_items)
-            count_diff = abs(count1 - count2)
-            max_count = max(count1, count2)
-            count_similarity = 1 - (count_diff / max_count) if max_count > 0 else 1
-            score += count_similarity * 0.1
-            
-            return round(score, 2)
-            
-        except Exception as e:
-            logging.error(f"Similarity calculation failed: {e}")
-            return 0.0
-
-    def __init__(self, db_session):
-        self.db_session = db_session
-
-    # Existing methods ...
-
     def get_lead_stats(self):
         
  
@@ -791,3 +709,13 @@ class AnalyticsEngine:
                 stats["closed"] = count
 
         return stats
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and sizes of the memoized analytics methods"""
+        methods = (self.get_revenue_trends, self.get_client_performance_metrics,
+                   self.get_payment_analytics, self.get_profitability_analysis)
+        return {
+            method.__name__: method.cache_info()
+            for method in methods
+            if hasattr(method, 'cache_info')
+        }
@@ -0,0 +1,257 @@
+"""Dependency-aware computation graph behind the analytics page
+
+Each node declares the nodes it reads and the request parameters it uses.
+A run computes only what its targets need, each shared intermediate (the
+monthly rollup, segmentation, receivables aging) once, and independent nodes
+concurrently on a thread pool. Worker threads push their own app context, so
+every node gets its own database session; page latency follows the slowest
+chain of nodes rather than their sum.
+
+Node results are cached against the data version like the memoized
+AnalyticsEngine methods, so a repeat load with unchanged data runs nothing.
+"""
+import inspect
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from flask import current_app
+
+from cache import TTLCache, data_version
+from metrics import metrics
+from service_registry import services
+import config
+
+
+class Node:
+    """A named computation with its input nodes and request parameters"""
+
+    def __init__(self, name: str, func: Callable, inputs: Tuple[str, ...], params: Tuple[str, ...],
+                 cached: bool):
+        self.name = name
+        self.func = func
+        self.inputs = inputs
+        self.params = params
+        self.cached = cached
+
+
+class ComputationGraph:
+    """Nodes registered with :meth:`node`, evaluated with :meth:`run`
+
+    A node function takes its inputs and parameters as keyword arguments
+    named after them. Node functions handle their own errors; anything that
+    escapes becomes ``{'error': ...}`` for that node and is not cached.
+    """
+
+    def __init__(self, max_workers: int = 4, cache_size: int = 128, ttl: int = 300):
+        self.max_workers = max_workers
+        self.ttl = ttl
+        self._nodes: Dict[str, Node] = {}
+        self._cache = TTLCache(maxsize=cache_size)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def node(self, name: Optional[str] = None, cached: bool = True):
+        """Register a function as a node; its argument names select inputs and parameters
+
+        Arguments naming a registered node are inputs (so nodes must be
+        registered after what they read); the rest are request parameters.
+        """
+        def decorator(func):
+            arguments = tuple(inspect.signature(func).parameters)
+            inputs = tuple(arg for arg in arguments if arg in self._nodes)
+            params = tuple(arg for arg in arguments if arg not in self._nodes)
+            self._nodes[name or func.__name__] = Node(name or func.__name__, func, inputs, params, cached)
+            return func
+        return decorator
+
+    def _executor_instance(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='analytics-graph')
+            return self._executor
+
+    def _cache_key(self, node: Node, params: Dict[str, Any]):
+        return (node.name,) + tuple(params.get(param) for param in node.params)
+
+    def _plan(self, targets: Iterable[str], params: Dict[str, Any], version) -> Tuple[Dict[str, Any], Dict[str, Node]]:
+        """Cached results, and the nodes still to compute for ``targets``"""
+        results, todo = {}, {}
+
+        def visit(name):
+            if name in results or name in todo:
+                return
+            node = self._nodes[name]
+            if node.cached:
+                found, value = self._cache.get(self._cache_key(node, params), version)
+                if found:
+                    results[name] = value
+                    return
+            todo[name] = node
+            for dependency in node.inputs:
+                visit(dependency)
+
+        for target in targets:
+            visit(target)
+        return results, todo
+
+    def _call(self, node: Node, kwargs: Dict[str, Any]):
+        try:
+            return node.func(**kwargs)
+        except Exception as e:
+            logging.error(f"Analytics node {node.name} failed: {e}")
+            return {'error': str(e)}
+
+    def _call_in_context(self, app, collector, node: Node, kwargs: Dict[str, Any]):
+        # A fresh app context means a fresh scoped session, removed again on exit;
+        # the collector charges this thread's SQL time to the request that asked
+        with app.app_context(), metrics.collecting(collector):
+            return self._call(node, kwargs)
+
+    def run(self, targets: Iterable[str], params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Compute ``targets`` (and whatever they need) and return every result by node name"""
+        params = dict(params or {})
+        targets = list(targets)
+        version = data_version.current()
+        results, todo = self._plan(targets, params, version)
+
+        def arguments(node):
+            kwargs = {name: results[name] for name in node.inputs}
+            kwargs.update((param, params.get(param)) for param in node.params)
+            return kwargs
+
+        def finish(node, value):
+            results[node.name] = value
+            if node.cached and not (isinstance(value, dict) and 'error' in value):
+                self._cache.set(self._cache_key(node, params), value, self.ttl, version)
+
+        def ready():
+            return [node for node in todo.values() if all(name in results for name in node.inputs)]
+
+        if self.max_workers <= 1:
+            while todo:
+                for node in ready():
+                    del todo[node.name]
+                    finish(node, self._call(node, arguments(node)))
+            return results
+
+        app = current_app._get_current_object()
+        collector = metrics.current_collector()
+        executor = self._executor_instance()
+        running = {}
+        while todo or running:
+            for node in ready():
+                del todo[node.name]
+                running[executor.submit(self._call_in_context, app, collector, node, arguments(node))] = node
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                finish(running.pop(future), future.result())
+        return results
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+
+analytics_graph = ComputationGraph(max_workers=config.ANALYTICS_GRAPH_WORKERS,
+                                   cache_size=config.ANALYTICS_CACHE_SIZE,
+                                   ttl=config.CACHE_DEFAULT_TIMEOUT)
+
+
+def _engine():
+    # Engines are cheap; each worker builds one around its own session
+    from analytics_engine import AnalyticsEngine
+    return AnalyticsEngine()
+
+
+# Shared intermediates
+
+@analytics_graph.node()
+def paid_months():
+    from revenue_rollup import monthly_rollup
+    return monthly_rollup()
+
+
+@analytics_graph.node()
+def segmentation():
+    return _engine()._analyze_client_segments()
+
+
+@analytics_graph.node()
+def lifecycle():
+    return _engine()._analyze_client_lifecycle()
+
+
+@analytics_graph.node()
+def outstanding():
+    return _engine()._analyze_outstanding_invoices()
+
+
+# Page sections
+
+@analytics_graph.node()
+def revenue_trends(paid_months, time_range):
+    return _engine().build_revenue_trends(time_range or '12m', paid_months)
+
+
+@analytics_graph.node()
+def recent_revenue_trends(paid_months):
+    return _engine().build_revenue_trends('3m', paid_months)
+
+
+@analytics_graph.node()
+def client_performance(segmentation, lifecycle):
+    return _engine().build_client_performance_metrics(segmentation, lifecycle)
+
+
+@analytics_graph.node()
+def payment_analytics(paid_months, outstanding):
+    return _engine().build_payment_analytics(paid_months, outstanding)
+
+
+@analytics_graph.node()
+def profitability_analysis(paid_months):
+    return _engine().build_profitability_analysis(paid_months)
+
+
+@analytics_graph.node()
+def recommendations(recent_revenue_trends, payment_analytics, segmentation):
+    return _engine()._generate_business_recommendations(recent_revenue_trends, payment_analytics, segmentation)
+
+
+@analytics_graph.node(cached=False)
+def ai_predictions():
+    predictive_analytics = services.get('predictive_analytics')
+    if not (current_app.config.get("AI_FEATURES_ENABLED") and predictive_analytics):
+        return {}
+    try:
+        return {
+            'cash_flow': predictive_analytics.predict_cash_flow(6),
+            'payment_patterns': predictive_analytics.analyze_client_payment_patterns()
+        }
+    except Exception as e:
+        logging.error(f"AI predictions failed: {e}")
+        return {}
+
+
+@analytics_graph.node(cached=False)
+def blockchain_insights():
+    blockchain_service = services.get('blockchain_service')
+    if not (current_app.config.get("BLOCKCHAIN_ENABLED") and blockchain_service):
+        return {}
+    try:
+        return blockchain_service.get_blockchain_stats()
+    except Exception as e:
+        logging.error(f"Blockchain analytics failed: {e}")
+        return {}
+
+
+ANALYTICS_PAGE_SECTIONS = ('revenue_trends', 'client_performance', 'payment_analytics',
+                           'profitability_analysis', 'recommendations', 'ai_predictions', 'blockchain_insights')
+
+
+def compute_analytics_page(time_range: str = '12m') -> Dict[str, Any]:
+    """All sections of the analytics page, keyed as the template expects"""
+    results = analytics_graph.run(ANALYTICS_PAGE_SECTIONS, {'time_range': time_range})
+    return {name: results[name] for name in ANALYTICS_PAGE_SECTIONS}
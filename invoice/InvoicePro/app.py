@@ -1,5 +1,8 @@
 import os
+import gc
 import logging
+import threading
+import weakref
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
@@ -15,31 +18,8 @@ logging.basicConfig(level=logging.DEBUG)
 class Base(DeclarativeBase):
     pass
 
-# Create the app
-app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET", "revolutionary-invoice-ai-system-2025")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
-
-# Configure the database to use SQLite
-app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///revolutionary_invoice.db")
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_pre_ping": True,
-}
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-
-# AI and Advanced Features Configuration
-app.config["OPENAI_API_KEY"] = os.environ.get("OPENAI_API_KEY")
-app.config["BLOCKCHAIN_ENABLED"] = os.environ.get("BLOCKCHAIN_ENABLED", "true").lower() == "true"
-app.config["AI_FEATURES_ENABLED"] = os.environ.get("AI_FEATURES_ENABLED", "true").lower() == "true"
-app.config["UPLOAD_FOLDER"] = os.path.join(os.getcwd(), "uploads")
-app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16MB max file size
-
-# Ensure upload directory exists
-os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
-
-# Initialize SQLAlchemy
+# Extensions are created unbound and attached to the app in create_app()
 db = SQLAlchemy(model_class=Base)
-db.init_app(app)
 
 '''
 app.config.update(
@@ -60,14 +40,19 @@ def send_invoice_email(invoice, recipient_email):
     msg['To'] = recipient_email
     msg.set_content(f"Dear {invoice.client.name},\n\nPlease find attached Invoice #{invoice.invoice_number}.\n\nThanks!")
 
-    # Optional: attach PDF (if you have a PDF file path)
-    pdf_path = f"invoices/invoice_{invoice.id}.pdf"
+    # Attach the pipeline's PDF while it is current, otherwise render one now
+    from invoice_pipeline import prerendered_pdf
+    from pdf_generator import generate_invoice_pdf
     try:
-        with open(pdf_path, 'rb') as f:
-            pdf_data = f.read()
+        pdf_path = prerendered_pdf(invoice)
+        if pdf_path:
+            with open(pdf_path, 'rb') as f:
+                pdf_data = f.read()
+        else:
+            pdf_data = generate_invoice_pdf(invoice).getvalue()
         msg.add_attachment(pdf_data, maintype='application', subtype='pdf', filename=f"Invoice_{invoice.invoice_number}.pdf")
-    except FileNotFoundError:
-        print("Warning: PDF not found, sending email without attachment.")
+    except Exception as e:
+        print(f"Warning: PDF unavailable ({e}), sending email without attachment.")
 
     # Send email via SMTP (example using Gmail)
     try:
@@ -77,46 +62,85 @@ def send_invoice_email(invoice, recipient_email):
     except Exception as e:
         raise Exception(f"SMTP failed: {e}")
 
-mail = Mail(app)
+mail = Mail()
 
 
 # Optional: specify path to wkhtmltopdf if not in PATH
 #PDFKIT_CONFIG = pdfkit.configuration(wkhtmltopdf=r"C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe")
 
 
-# Import models and routes after db initialization
-with app.app_context():
-    import models
-    import routes
-    from utils import number_to_words
-    from ai_services import initialize_ai_models
-    from blockchain_service import initialize_blockchain
+# Lazily initialized services (AI, blockchain, OCR, voice, similar-invoice index, analytics facts)
+import sqlite_tuning
+from service_registry import services
+from metrics import metrics
+from query_profiler import query_profiler
+from cache import data_version
 
-    # Register custom Jinja2 filters
-    app.jinja_env.filters['number_to_words'] = number_to_words
 
-    db.create_all()
-    
-    # Initialize AI models if enabled
-    if app.config["AI_FEATURES_ENABLED"]:
-        try:
-            initialize_ai_models()
-            logging.info("AI models initialized successfully")
-        except Exception as e:
-            logging.error(f"Failed to initialize AI models: {e}")
-    
-    # Initialize blockchain if enabled
-    if app.config["BLOCKCHAIN_ENABLED"]:
-        try:
-            initialize_blockchain()
-            logging.info("Blockchain service initialized successfully")
-        except Exception as e:
-            logging.error(f"Failed to initialize blockchain: {e}")
-    
-    # Initialize default company data
+def _load_ai_services():
+    import ai_services
+    ai_services.initialize_ai_models()
+    return ai_services
+
+
+def _load_blockchain_services():
+    import blockchain_service
+    blockchain_service.initialize_blockchain()
+    return blockchain_service
+
+
+def _load_ocr_services():
+    import ocr_service
+    ocr_service.initialize_ocr_service()
+    return ocr_service
+
+
+def _load_voice_services():
+    import voice_service
+    voice_service.initialize_voice_service()
+    return voice_service
+
+
+def _load_similarity_index():
+    import similarity_index
+    similarity_index.initialize_similarity_index()
+    return similarity_index
+
+
+def _load_fact_store():
+    import fact_store
+    fact_store.initialize_fact_store()
+    return fact_store
+
+
+services.register('ai', _load_ai_services,
+                  provides=['ai_assistant', 'predictive_analytics', 'inventory_ai'],
+                  enabled=lambda app: app.config["AI_FEATURES_ENABLED"])
+services.register('blockchain', _load_blockchain_services,
+                  provides=['blockchain_service', 'smart_contract_manager'],
+                  enabled=lambda app: app.config["BLOCKCHAIN_ENABLED"])
+services.register('ocr', _load_ocr_services,
+                  provides=['ocr_processor', 'receipt_processor'],
+                  enabled=lambda app: app.config["AI_FEATURES_ENABLED"])
+services.register('voice', _load_voice_services,
+                  provides=['voice_processor', 'voice_invoice_builder'],
+                  enabled=lambda app: app.config["AI_FEATURES_ENABLED"])
+services.register('similarity', _load_similarity_index,
+                  provides=['invoice_similarity_index'])
+services.register('facts', _load_fact_store,
+                  provides=['invoice_fact_store'],
+                  enabled=lambda app: app.config["ANALYTICS_BACKEND"] == "columnar")
+
+
+def bootstrap_database():
+    """Create tables and seed the default company and admin user"""
     from models import Company, User
     from utils import generate_password_hash
-    
+    from migrations import run_migrations
+
+    db.create_all()
+    run_migrations(db.engine)
+
     # Create default company if none exists
     if not Company.query.first():
         company = Company()
@@ -133,7 +157,7 @@ with app.app_context():
         company.logo_path = '/static/images/logo.svg'
         db.session.add(company)
         db.session.commit()
-    
+
     # Create default admin user if not exists
     if not User.query.filter_by(username='admin').first():
         admin_user = User(
@@ -147,7 +171,186 @@ with app.app_context():
         db.session.add(admin_user)
         db.session.commit()
         logging.info("Default admin user created with advanced features enabled")
-@app.context_processor
+
+
+_db_bootstrapped = False
+_db_bootstrap_lock = threading.Lock()
+
+
+def ensure_database_bootstrapped():
+    """Run the database bootstrap once per process, on the first request"""
+    global _db_bootstrapped
+    if _db_bootstrapped:
+        return
+    with _db_bootstrap_lock:
+        if not _db_bootstrapped:
+            bootstrap_database()
+            _db_bootstrapped = True
+
+
+def init_db_command():
+    """Create tables and seed default data without serving a request"""
+    global _db_bootstrapped
+    bootstrap_database()
+    _db_bootstrapped = True
+    print("Database initialized")
+
+
+def migrate_command():
+    """Apply pending schema migrations"""
+    from migrations import run_migrations
+    applied = run_migrations(db.engine)
+    print(f"Applied migrations: {applied}" if applied else "Schema is up to date")
+
+
+def rebuild_rollup_command():
+    """Recompute the monthly revenue rollup from the invoice tables"""
+    from revenue_rollup import rebuild_rollup
+    with db.engine.begin() as conn:
+        rows = rebuild_rollup(conn)
+    print(f"Monthly revenue rollup rebuilt ({rows} rows)")
+
+
+def run_invoice_pipeline_command():
+    """Run invoice side effects left pending, running or failed (stop the app's workers first)"""
+    from invoice_pipeline import run_unfinished
+    results = run_unfinished()
+    print(f"Invoice pipeline ran for {len(results)} invoices")
+
+
 def inject_today():
     return {'today': datetime.now()}
 
+
+def dispose_engine_connections(app, close=False):
+    """Drop pooled connections, e.g. those inherited from a parent process
+
+    With ``close=False`` the parent's sockets are left alone; the child simply
+    starts with an empty pool and opens its own connections on demand.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=close)
+
+
+# Apps whose pools a forked child must drop; weak, so discarded apps are not kept alive
+_forkable_apps = weakref.WeakSet()
+
+
+def _dispose_after_fork():
+    for app in list(_forkable_apps):
+        dispose_engine_connections(app)
+
+
+# Forked workers (gunicorn --preload) must not reuse the master's connections.
+# Registered once here: fork handlers can never be removed again.
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_dispose_after_fork)
+
+
+def create_app():
+    """Build and configure the Flask application"""
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("SESSION_SECRET", "revolutionary-invoice-ai-system-2025")
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+
+    # Configure the database to use SQLite
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///revolutionary_invoice.db")
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "pool_pre_ping": True,
+    }
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+
+    # WAL and related pragmas for SQLite databases (ignored for other backends)
+    app.config["SQLITE_TUNING"] = os.environ.get("SQLITE_TUNING", "true").lower() == "true"
+
+    # AI and Advanced Features Configuration
+    app.config["OPENAI_API_KEY"] = os.environ.get("OPENAI_API_KEY")
+    app.config["BLOCKCHAIN_ENABLED"] = os.environ.get("BLOCKCHAIN_ENABLED", "true").lower() == "true"
+    app.config["AI_FEATURES_ENABLED"] = os.environ.get("AI_FEATURES_ENABLED", "true").lower() == "true"
+    # "columnar" answers invoice analytics from in-memory NumPy columns (fact_store.py)
+    app.config["ANALYTICS_BACKEND"] = os.environ.get("ANALYTICS_BACKEND", "sql").lower()
+    app.config["UPLOAD_FOLDER"] = os.path.join(os.getcwd(), "uploads")
+    # Cross-process cache invalidation marker (cache.py); defaults to the instance folder
+    app.config["DATA_VERSION_FILE"] = os.environ.get("DATA_VERSION_FILE")
+    app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16MB max file size
+
+    # Ensure upload directory exists
+    os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
+
+    db.init_app(app)
+    sqlite_tuning.init_app(app)
+    mail.init_app(app)
+    services.init_app(app)
+    metrics.init_app(app)
+    query_profiler.init_app(app)
+    data_version.init_app(app)
+
+    app.before_request(ensure_database_bootstrapped)
+    app.cli.command('init-db')(init_db_command)
+    app.cli.command('migrate')(migrate_command)
+    app.cli.command('rebuild-rollup')(rebuild_rollup_command)
+    app.cli.command('run-invoice-pipeline')(run_invoice_pipeline_command)
+    app.context_processor(inject_today)
+
+    # Import models and routes after db initialization
+    with app.app_context():
+        import models
+        # Registers the session listeners that keep the monthly revenue rollup current
+        import revenue_rollup  # noqa: F401
+        import routes
+        from utils import number_to_words
+
+        routes.init_app(app)
+
+        # Register custom Jinja2 filters
+        app.jinja_env.filters['number_to_words'] = number_to_words
+
+    _forkable_apps.add(app)
+
+    # Optionally initialize services ahead of the first request
+    if os.environ.get("SERVICE_WARMUP", "false").lower() == "true":
+        services.warm_up(background=True)
+
+    return app
+
+
+def preload_shared_state(app):
+    """Load heavy read-only state once, before worker processes are forked
+
+    Called from ``wsgi.py`` when gunicorn runs with ``--preload``: compiled
+    templates, ReportLab styles, OCR/voice regex tables and the blockchain
+    invoice index are built in the master and shared copy-on-write by every
+    worker instead of being rebuilt per process.
+    """
+    global _db_bootstrapped
+    start = datetime.now()
+
+    with app.app_context():
+        bootstrap_database()
+        _db_bootstrapped = True
+
+        # Jinja keeps compiled templates in its cache after the first load
+        for name in app.jinja_env.list_templates(extensions=['html']):
+            try:
+                app.jinja_env.get_template(name)
+            except Exception as e:
+                logging.warning(f"Template {name} could not be compiled: {e}")
+
+        import pdf_generator
+        pdf_generator.get_invoice_styles()
+
+        # Service modules compile their regex tables at import; the
+        # blockchain group also builds its invoice index while loading
+        services.warm_up(background=False)
+
+    # The master must not hand open connections to its workers
+    dispose_engine_connections(app, close=True)
+
+    # Keep preloaded objects out of the collector so its bookkeeping does not
+    # touch (and un-share) their memory pages in the workers
+    gc.collect()
+    gc.freeze()
+
+    logging.info(f"Shared state preloaded in {(datetime.now() - start).total_seconds() * 1000:.1f} ms")
+
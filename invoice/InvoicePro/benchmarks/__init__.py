@@ -0,0 +1,6 @@
+"""Performance benchmarks for the invoice system.
+
+Run from the InvoicePro directory, e.g. ``python -m benchmarks.startup_imports``.
+Results are written as JSON under ``benchmarks/results/`` so they can be
+diffed across releases.
+"""
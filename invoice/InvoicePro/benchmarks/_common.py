@@ -0,0 +1,81 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(APP_DIR, 'benchmarks', 'results')
+
+
+def current_rss_mb() -> float:
+    """Resident set size of the current process in MB"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    import resource
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes elsewhere
+    return usage / (1024 * 1024) if sys.platform == 'darwin' else usage / 1024
+
+
+def benchmark_env(database_path: Optional[str] = None, **overrides) -> Dict[str, str]:
+    """Environment for a benchmark subprocess pointed at a scratch database
+
+    ``BENCH_WORKDIR`` names a fresh scratch directory to run subprocesses in
+    (see ``workdir``); files the app writes relative to its working directory
+    (the blockchain ledger, uploads) land there, and so do the data version
+    marker and pre-rendered PDFs, keeping the source tree clean. Blockchain
+    mining is off unless overridden.
+    """
+    env = dict(os.environ)
+    workdir = tempfile.mkdtemp(prefix='invoice-bench-')
+    if database_path is None:
+        database_path = os.path.join(workdir, 'bench.db')
+    env['DATABASE_URL'] = f"sqlite:///{database_path}"
+    env['BENCH_WORKDIR'] = workdir
+    env['DATA_VERSION_FILE'] = os.path.join(workdir, 'data_version')
+    env['INVOICE_PDF_DIR'] = os.path.join(workdir, 'invoices')
+    env['BLOCKCHAIN_ENABLED'] = 'false'
+    env.setdefault('OPENAI_API_KEY', '')
+    env['PYTHONPATH'] = APP_DIR + os.pathsep + env.get('PYTHONPATH', '')
+    env.update({key: str(value) for key, value in overrides.items()})
+    return env
+
+
+def workdir(env: Dict[str, str]) -> str:
+    """Working directory for subprocesses started with ``env``"""
+    return env.get('BENCH_WORKDIR') or tempfile.mkdtemp(prefix='invoice-bench-')
+
+
+def run_python(code: str, env: Dict[str, str], *args: str) -> subprocess.CompletedProcess:
+    """Run a snippet in a fresh interpreter from the scratch working directory"""
+    return subprocess.run(
+        [sys.executable, *args, '-c', code],
+        cwd=workdir(env), env=env, capture_output=True, text=True, check=False
+    )
+
+
+def write_results(name: str, results: Dict[str, Any], output: Optional[str] = None) -> str:
+    """Write benchmark results with run metadata and return the file path"""
+    path = output or os.path.join(RESULTS_DIR, f"{name}.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    payload = {
+        'benchmark': name,
+        'recorded_at': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results
+    }
+    with open(path, 'w') as f:
+        json.dump(payload, f, indent=2, sort_keys=True, default=str)
+    return path
@@ -0,0 +1,224 @@
+"""Timings of every public AnalyticsEngine method and the utils analytics helpers.
+
+For each dataset size (10k, 100k and 1M invoices by default) a scratch SQLite
+database is seeded with ``benchmarks.seed`` and probed in a fresh process per
+analytics backend. Each call is timed three ways:
+
+* ``first_ms``: the first call in the process;
+* ``cold_ms``: median over ``--repeat`` calls, each after a data version bump,
+  so memoized results, graph nodes and the in-memory indexes have to
+  revalidate as they would after a write;
+* ``warm_ms``: median over ``--repeat`` calls with nothing changed.
+
+Loading the in-memory services (similarity index, fact store) is timed on
+its own so it does not land on whichever method happens to run first.
+
+    python -m benchmarks.analytics [--sizes 10000 100000 1000000] [--backends sql columnar]
+                                   [--repeat 5] [--data-dir DIR]
+
+Seeding a million invoices takes several minutes; ``--data-dir`` keeps the
+seeded databases (one per size) and reuses them on later runs. Results go
+to ``benchmarks/results/analytics.json``; compare files between runs to spot
+regressions. Exits non-zero when a call raises or a public method has no
+benchmark entry.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+
+from benchmarks._common import benchmark_env, run_python, write_results
+
+
+def _sample(db):
+    """Ids the per-invoice calls run against: the busiest client's latest invoice and a list page"""
+    from sqlalchemy import func
+    from models import Invoice
+
+    busiest_client = db.session.query(Invoice.client_id).group_by(Invoice.client_id) \
+        .order_by(func.count(Invoice.id).desc()).limit(1).scalar()
+    invoice_id = db.session.query(func.max(Invoice.id)).filter(Invoice.client_id == busiest_client).scalar()
+    page = [row.id for row in db.session.query(Invoice.id).order_by(Invoice.invoice_date.desc()).limit(20)]
+    return {'invoice_id': invoice_id, 'page': page}
+
+
+def engine_calls(engine, sample):
+    """``{method name: zero-argument callable}`` for every public AnalyticsEngine method
+
+    The ``build_*`` methods take the intermediates the analytics graph feeds
+    them; those are computed once here so only the method itself is timed.
+    """
+    from revenue_rollup import monthly_rollup
+
+    paid_months = monthly_rollup()
+    segmentation = engine._analyze_client_segments()
+    lifecycle = engine._analyze_client_lifecycle()
+    outstanding = engine._analyze_outstanding_invoices()
+
+    return {
+        'get_revenue_trends': lambda: engine.get_revenue_trends('12m'),
+        'build_revenue_trends': lambda: engine.build_revenue_trends('12m', paid_months),
+        'get_client_performance_metrics': engine.get_client_performance_metrics,
+        'build_client_performance_metrics': lambda: engine.build_client_performance_metrics(segmentation, lifecycle),
+        'get_payment_analytics': engine.get_payment_analytics,
+        'build_payment_analytics': lambda: engine.build_payment_analytics(paid_months, outstanding),
+        'get_profitability_analysis': engine.get_profitability_analysis,
+        'build_profitability_analysis': lambda: engine.build_profitability_analysis(paid_months),
+        'get_ai_insights': engine.get_ai_insights,
+        'get_monthly_revenue_trend': lambda: engine.get_monthly_revenue_trend(12),
+        'build_invoice_insight': lambda: engine.build_invoice_insight(0.8, None, {'confidence': 0.9}),
+        'get_ai_invoice_insights': lambda: engine.get_ai_invoice_insights(sample['page']),
+        'find_similar_invoices': lambda: engine.find_similar_invoices(sample['invoice_id']),
+        'find_similar_invoices[cross_client]': lambda: engine.find_similar_invoices(sample['invoice_id'],
+                                                                                   cross_client=True),
+        'get_lead_stats': engine.get_lead_stats,
+        'cache_stats': engine.cache_stats,
+    }
+
+
+def utils_calls(sample):
+    """``{helper name: zero-argument callable}`` for the utils analytics helpers"""
+    import utils
+
+    return {
+        'get_monthly_revenue_data': lambda: utils.get_monthly_revenue_data(12),
+        'get_client_performance_metrics': utils.get_client_performance_metrics,
+        'get_payment_analytics': utils.get_payment_analytics,
+        'get_tax_summary': utils.get_tax_summary,
+        'calculate_profitability': utils.calculate_profitability,
+        'calculate_profitability[invoice]': lambda: utils.calculate_profitability(sample['invoice_id']),
+        'get_kpi_summary': utils.get_kpi_summary,
+        'get_outstanding_invoices_summary': utils.get_outstanding_invoices_summary,
+    }
+
+
+def public_methods():
+    """Names of the public AnalyticsEngine methods, which ``engine_calls`` must cover"""
+    from analytics_engine import AnalyticsEngine
+    return sorted(name for name in vars(AnalyticsEngine) if not name.startswith('_')
+                  and callable(getattr(AnalyticsEngine, name)))
+
+
+def _time_calls(calls, repeat):
+    import time
+    from cache import data_version
+
+    def timed(func):
+        start = time.perf_counter()
+        func()
+        return (time.perf_counter() - start) * 1000
+
+    timings = {}
+    for name, func in calls.items():
+        try:
+            first = timed(func)
+            cold = []
+            for _ in range(repeat):
+                data_version.bump()
+                cold.append(timed(func))
+            warm = [timed(func) for _ in range(repeat)]
+            timings[name] = {'first_ms': first, 'cold_ms': statistics.median(cold),
+                             'warm_ms': statistics.median(warm)}
+        except Exception as e:
+            timings[name] = {'error': f"{type(e).__name__}: {e}"}
+    return timings
+
+
+def probe(repeat):
+    """Time every engine method and utils helper, print the report as JSON"""
+    import time
+    from sqlalchemy import func
+    from analytics_engine import AnalyticsEngine
+    from app import create_app, db
+    from models import Invoice
+    from service_registry import services
+
+    app = create_app()
+    report = {'backend': app.config['ANALYTICS_BACKEND']}
+    with app.app_context():
+        report['invoices'] = db.session.query(func.count(Invoice.id)).scalar()
+        sample = _sample(db)
+
+        report['services'] = {}
+        for name in ('invoice_similarity_index', 'invoice_fact_store'):
+            start = time.perf_counter()
+            loaded = services.get(name)
+            report['services'][name] = {'loaded': loaded is not None,
+                                        'load_ms': (time.perf_counter() - start) * 1000}
+
+        calls = engine_calls(AnalyticsEngine(), sample)
+        report['missing'] = [name for name in public_methods() if name not in calls]
+        report['engine'] = _time_calls(calls, repeat)
+        report['utils'] = _time_calls(utils_calls(sample), repeat)
+    print(json.dumps(report, default=str))
+
+
+def _seed(size, args, env):
+    clients = args.clients or max(50, size // 500)
+    print(f"Seeding {size} invoices for {clients} clients...")
+    result = run_python(
+        f"from benchmarks.seed import main; main(['--clients', '{clients}', '--invoices', '{size}'])", env
+    )
+    if result.returncode != 0:
+        print(result.stderr, file=sys.stderr)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+                        help='invoice counts to benchmark')
+    parser.add_argument('--clients', type=int, help='clients per dataset (default: invoices / 500, at least 50)')
+    parser.add_argument('--backends', nargs='+', default=['sql'], choices=['sql', 'columnar'],
+                        help='ANALYTICS_BACKEND values to probe')
+    parser.add_argument('--repeat', type=int, default=5, help='timed calls per method for the cold and warm medians')
+    parser.add_argument('--data-dir', help='keep seeded databases here and reuse them')
+    parser.add_argument('--output', help='results file (default benchmarks/results/analytics.json)')
+    args = parser.parse_args(argv)
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='invoice-analytics-')
+    os.makedirs(data_dir, exist_ok=True)
+
+    results, failed = {}, False
+    for size in args.sizes:
+        database_path = os.path.join(data_dir, f"analytics-{size}.db")
+        if not os.path.exists(database_path):
+            if _seed(size, args, benchmark_env(database_path)).returncode != 0:
+                return 1
+
+        results[str(size)] = {}
+        for backend in args.backends:
+            print(f"Probing {size} invoices, {backend} backend...")
+            env = benchmark_env(database_path, ANALYTICS_BACKEND=backend, SERVICE_WARMUP='false')
+            result = run_python(f"from benchmarks.analytics import probe; probe({args.repeat})", env)
+            if result.returncode != 0:
+                print(result.stderr, file=sys.stderr)
+                return result.returncode
+            report = json.loads(result.stdout.strip().splitlines()[-1])
+            results[str(size)][backend] = report
+
+            for name, data in report['services'].items():
+                if data['loaded']:
+                    print(f"  {'load ' + name:48s} {data['load_ms']:9.1f} ms")
+
+            for group in ('engine', 'utils'):
+                for name, data in report[group].items():
+                    if 'error' in data:
+                        failed = True
+                        print(f"  {group + '.' + name:48s} ERROR {data['error']}")
+                    else:
+                        print(f"  {group + '.' + name:48s} first {data['first_ms']:9.1f} ms  "
+                              f"cold {data['cold_ms']:9.1f} ms  warm {data['warm_ms']:8.2f} ms")
+            for name in report['missing']:
+                failed = True
+                print(f"  ! AnalyticsEngine.{name} has no benchmark entry")
+
+    path = write_results('analytics', {'sizes': results, 'repeat': args.repeat}, args.output)
+    print(f"Results written to {path}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""Cold-start and first-request benchmark.
+
+Seeds a scratch SQLite database, then for each run starts a fresh
+interpreter that builds the app and requests the main routes twice through
+the Flask test client. Records boot time (import plus ``create_app()``), time from boot to the
+first dashboard byte, first (cold) and second (warm) response time per route,
+and RSS at idle and after the first requests.
+
+    python -m benchmarks.cold_start [--runs 5] [--clients 50] [--invoices 1000]
+
+Response times are measured until the test client returns the response
+object, which for these non-streaming views is the time to first byte.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+
+from benchmarks._common import benchmark_env, run_python, write_results
+
+MAIN_ROUTES = [
+    '/',
+    '/invoices',
+    '/clients',
+    '/analytics',
+    '/invoice/1',
+    '/api/analytics_data?type=revenue'
+]
+
+PROBE = """
+import json, os, sys, time
+start = time.perf_counter()
+from app import create_app
+flask_app = create_app()
+import_ms = (time.perf_counter() - start) * 1000
+from benchmarks._common import current_rss_mb
+idle_rss_mb = current_rss_mb()
+
+client = flask_app.test_client()
+with client.session_transaction() as sess:
+    sess['user_id'] = 1
+    sess['username'] = 'admin'
+    sess['is_admin'] = True
+
+routes = json.loads(os.environ['BENCH_ROUTES'])
+timings = {'cold': {}, 'warm': {}}
+first_byte_ms = None
+for phase in ('cold', 'warm'):
+    for route in routes:
+        t0 = time.perf_counter()
+        response = client.get(route)
+        elapsed = (time.perf_counter() - t0) * 1000
+        if first_byte_ms is None:
+            first_byte_ms = (time.perf_counter() - start) * 1000
+        timings[phase][route] = {'ms': elapsed, 'status': response.status_code, 'bytes': len(response.data)}
+
+print(json.dumps({
+    'import_ms': import_ms,
+    'import_to_first_byte_ms': first_byte_ms,
+    'idle_rss_mb': idle_rss_mb,
+    'rss_after_requests_mb': current_rss_mb(),
+    'timings': timings
+}))
+"""
+
+
+def _summary(values):
+    values = list(values)
+    return {'median': statistics.median(values), 'min': min(values), 'max': max(values)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters to measure')
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--invoices', type=int, default=1000)
+    parser.add_argument('--output', help='results file (default benchmarks/results/cold_start.json)')
+    args = parser.parse_args(argv)
+
+    database_path = os.path.join(tempfile.mkdtemp(prefix='invoice-cold-start-'), 'bench.db')
+    env = benchmark_env(database_path, BENCH_ROUTES=json.dumps(MAIN_ROUTES))
+
+    seeded = run_python(
+        f"from benchmarks.seed import main; main(['--clients', '{args.clients}', '--invoices', '{args.invoices}'])",
+        env
+    )
+    if seeded.returncode != 0:
+        print(seeded.stderr, file=sys.stderr)
+        return seeded.returncode
+
+    samples = []
+    for _ in range(args.runs):
+        probe = run_python(PROBE, env)
+        if probe.returncode != 0:
+            print(probe.stderr, file=sys.stderr)
+            return probe.returncode
+        samples.append(json.loads(probe.stdout.strip().splitlines()[-1]))
+
+    results = {
+        'dataset': {'clients': args.clients, 'invoices': args.invoices},
+        'runs': args.runs,
+        'import_ms': _summary(s['import_ms'] for s in samples),
+        'import_to_first_byte_ms': _summary(s['import_to_first_byte_ms'] for s in samples),
+        'idle_rss_mb': _summary(s['idle_rss_mb'] for s in samples),
+        'rss_after_requests_mb': _summary(s['rss_after_requests_mb'] for s in samples),
+        'routes': {
+            route: {
+                'status': samples[-1]['timings']['cold'][route]['status'],
+                'cold_ms': _summary(s['timings']['cold'][route]['ms'] for s in samples),
+                'warm_ms': _summary(s['timings']['warm'][route]['ms'] for s in samples)
+            }
+            for route in MAIN_ROUTES
+        }
+    }
+    path = write_results('cold_start', results, args.output)
+
+    print(f"boot (create_app):     {results['import_ms']['median']:8.1f} ms")
+    print(f"import -> first byte:  {results['import_to_first_byte_ms']['median']:8.1f} ms")
+    print(f"idle RSS:              {results['idle_rss_mb']['median']:8.1f} MB")
+    for route, data in results['routes'].items():
+        print(f"  {route:40s} cold {data['cold_ms']['median']:8.1f} ms  warm {data['warm_ms']['median']:8.1f} ms  [{data['status']}]")
+    print(f"Results written to {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""Parity and speed of the columnar fact store against the SQL analytics.
+
+Seeds a scratch SQLite database (50k invoices by default), builds the
+in-memory fact store and runs every group-by it answers both ways: results
+must match the SQL implementation, and each is timed. The comparison is
+repeated after a batch of ORM edits (status changes, new and deleted
+invoices, line-item changes) to check the incremental refresh.
+
+    python -m benchmarks.fact_store [--invoices 50000] [--clients 500] [--repeat 5]
+
+Exits non-zero when any result differs.
+"""
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import tempfile
+
+from benchmarks._common import benchmark_env, run_python, write_results
+
+
+def _close(a, b, path, mismatches):
+    """Recursively compare two results; floats to a cent or a relative 1e-9"""
+    if isinstance(a, dict) and isinstance(b, dict):
+        if set(a) != set(b):
+            mismatches.append(f"{path}: keys {sorted(a)} != {sorted(b)}")
+            return
+        for key in a:
+            _close(a[key], b[key], f"{path}.{key}", mismatches)
+    elif isinstance(a, list) and isinstance(b, list):
+        if len(a) != len(b):
+            mismatches.append(f"{path}: {len(a)} rows != {len(b)} rows")
+            return
+        for i, (x, y) in enumerate(zip(a, b)):
+            _close(x, y, f"{path}[{i}]", mismatches)
+    elif isinstance(a, (int, float)) and isinstance(b, (int, float)) and not isinstance(a, bool):
+        if not math.isclose(a, b, rel_tol=1e-9, abs_tol=0.01):
+            mismatches.append(f"{path}: {a} != {b}")
+    elif a != b:
+        mismatches.append(f"{path}: {a!r} != {b!r}")
+
+
+def _by(key):
+    return lambda rows: sorted(rows, key=lambda row: str(row[key]))
+
+
+def checks(engine, store):
+    """(name, SQL callable, columnar callable, normalizer) for every shared group-by"""
+    return [
+        ('payment_status_distribution', engine._payment_status_distribution,
+         store.payment_status_distribution, _by('status')),
+        ('payment_timing', engine._payment_timing, store.payment_timing, None),
+        ('payment_modes', engine._payment_mode_totals, store.payment_mode_totals, _by('mode')),
+        ('top_clients', lambda: engine._top_clients(20), lambda: engine._top_clients(20), None),
+        ('client_profitability', lambda: engine._client_profitability(10),
+         lambda: engine._client_profitability(10), None),
+    ]
+
+
+def _timed(func, repeat):
+    import time
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(timings)
+
+
+def _edit_invoices():
+    """A mixed batch of ORM changes for the incremental refresh check"""
+    from datetime import date
+    from app import db
+    from models import Invoice, InvoiceLineItem
+
+    invoices = Invoice.query.order_by(Invoice.id).limit(40).all()
+    for invoice in invoices[:10]:
+        invoice.payment_status = 'Paid'
+        invoice.payment_mode = 'UPI'
+        invoice.payment_date = date.today()
+        invoice.amount_paid_paise = invoice.total_amount_paise
+    for invoice in invoices[10:20]:
+        invoice.total_amount_paise += 12345
+    for invoice in invoices[20:25]:
+        InvoiceLineItem.query.filter_by(invoice_id=invoice.id).delete()
+        db.session.delete(invoice)
+    item = InvoiceLineItem.query.filter_by(invoice_id=invoices[30].id).first()
+    item.quantity += 3
+    template = invoices[35]
+    db.session.add(Invoice(
+        invoice_number=f"FACT-{template.id}", client_id=template.client_id, invoice_date=date.today(),
+        due_date=date.today(), total_amount_paise=99900, payment_status='Partially Paid',
+        amount_paid_paise=50000, payment_date=date.today()
+    ))
+    db.session.commit()
+
+
+def probe(repeat):
+    """Compare and time SQL and columnar results, print the report as JSON"""
+    import analytics_engine
+    from app import create_app
+    from fact_store import InvoiceFactStore
+
+    app = create_app()
+    report = {'checks': {}, 'mismatches': []}
+    with app.app_context():
+        store = InvoiceFactStore()
+        store.build()
+        report['store'] = store.stats()
+        engine = analytics_engine.AnalyticsEngine()
+
+        def compare(label, timed):
+            for name, sql, columnar, normalize in checks(engine, store):
+                analytics_engine.active_fact_store = lambda: None
+                expected, sql_ms = _timed(sql, repeat if timed else 1)
+                analytics_engine.active_fact_store = lambda: store
+                actual, columnar_ms = _timed(columnar, repeat if timed else 1)
+                if normalize:
+                    expected, actual = normalize(expected), normalize(actual)
+                mismatches = []
+                _close(json.loads(json.dumps(expected, default=str)),
+                       json.loads(json.dumps(actual, default=str)), f"{label}.{name}", mismatches)
+                report['mismatches'].extend(mismatches[:5])
+                if timed:
+                    report['checks'][name] = {'sql_ms': sql_ms, 'columnar_ms': columnar_ms,
+                                              'match': not mismatches}
+
+        compare('initial', timed=True)
+        _edit_invoices()
+        compare('after_edits', timed=False)
+        report['store_after_edits'] = store.stats()
+    print(json.dumps(report, default=str))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=500)
+    parser.add_argument('--invoices', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5, help='timed executions per query')
+    parser.add_argument('--output', help='results file (default benchmarks/results/fact_store.json)')
+    args = parser.parse_args(argv)
+
+    database_path = os.path.join(tempfile.mkdtemp(prefix='invoice-facts-'), 'bench.db')
+    env = benchmark_env(database_path)
+
+    print(f"Seeding {args.invoices} invoices...")
+    for code in (f"from benchmarks.seed import main; main(['--clients', '{args.clients}', '--invoices', '{args.invoices}'])",
+                 f"from benchmarks.fact_store import probe; probe({args.repeat})"):
+        result = run_python(code, env)
+        if result.returncode != 0:
+            print(result.stderr, file=sys.stderr)
+            return result.returncode
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+
+    results = dict(report, dataset={'clients': args.clients, 'invoices': args.invoices}, repeat=args.repeat)
+    path = write_results('fact_store', results, args.output)
+
+    print(f"Fact store: {report['store']['invoices']} invoices, {report['store']['memory_mb']} MB, "
+          f"built in {report['store']['build_seconds']:.2f}s")
+    for name, data in report['checks'].items():
+        print(f"  {name:28s} sql {data['sql_ms']:9.2f} ms  columnar {data['columnar_ms']:9.3f} ms  "
+              f"{'ok' if data['match'] else 'MISMATCH'}")
+    for mismatch in report['mismatches']:
+        print(f"  ! {mismatch}")
+    print(f"Results written to {path}")
+    return 1 if report['mismatches'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
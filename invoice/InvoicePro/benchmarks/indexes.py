@@ -0,0 +1,154 @@
+"""Before/after benchmark for the invoice index migration.
+
+Seeds a scratch SQLite database (100k invoices by default), drops the
+indexes added by migration 1, times the dashboard/analytics/list query
+shapes, applies the migration and times them again. Query plans are
+recorded for both runs so index usage can be checked.
+
+    python -m benchmarks.indexes [--invoices 100000] [--clients 2000] [--repeat 7]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+
+from benchmarks._common import benchmark_env, run_python, write_results
+
+
+def hot_path_queries():
+    """(name, SQLAlchemy query) pairs mirroring the app's hot paths"""
+    from datetime import date, timedelta
+    from sqlalchemy import func
+    from app import db
+    from models import Invoice, InvoiceLineItem
+
+    today = date.today()
+    year_ago = today - timedelta(days=365)
+    month_ago = today - timedelta(days=30)
+    busiest_client = db.session.query(Invoice.client_id).group_by(Invoice.client_id) \
+        .order_by(func.count(Invoice.id).desc()).limit(1).scalar()
+    sample_invoice = db.session.query(func.max(Invoice.id)).scalar() // 2
+
+    return [
+        ('recent_invoices', db.session.query(Invoice.id).order_by(Invoice.created_at.desc()).limit(5)),
+        ('invoice_list_page', db.session.query(Invoice.id).order_by(Invoice.invoice_date.desc()).limit(20).offset(200)),
+        ('paid_revenue_last_year', db.session.query(func.sum(Invoice.total_amount))
+            .filter(Invoice.payment_status == 'Paid', Invoice.invoice_date >= year_ago)),
+        ('revenue_last_30_days', db.session.query(func.sum(Invoice.total_amount), func.count(Invoice.id))
+            .filter(Invoice.invoice_date >= month_ago)),
+        ('overdue_invoices', db.session.query(Invoice.id)
+            .filter(Invoice.payment_status == 'Unpaid', Invoice.due_date < today)),
+        ('upcoming_payments', db.session.query(Invoice.id)
+            .filter(Invoice.payment_status != 'Paid', Invoice.due_date >= today,
+                    Invoice.due_date <= today + timedelta(days=7))
+            .order_by(Invoice.due_date)),
+        ('client_history', db.session.query(Invoice.id, Invoice.total_amount)
+            .filter(Invoice.client_id == busiest_client, Invoice.invoice_date >= year_ago)
+            .order_by(Invoice.invoice_date.desc())),
+        ('invoice_line_items', db.session.query(InvoiceLineItem.id)
+            .filter(InvoiceLineItem.invoice_id == sample_invoice)),
+    ]
+
+
+def probe(repeat):
+    """Time each hot-path query and print the results as JSON"""
+    import time
+    from sqlalchemy import text
+    from app import create_app, db
+
+    app = create_app()
+    results = {}
+    with app.app_context():
+        for name, query in hot_path_queries():
+            statement = query.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+            plan = [row[-1] for row in db.session.execute(text(f"EXPLAIN QUERY PLAN {statement}"))]
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                query.all()
+                timings.append((time.perf_counter() - start) * 1000)
+            results[name] = {'median_ms': statistics.median(timings), 'min_ms': min(timings), 'plan': plan}
+    print(json.dumps(results))
+
+
+DROP_INDEXES = """
+from sqlalchemy import text
+from app import create_app, db
+from migrations import INVOICE_INDEXES, applied_versions
+app = create_app()
+with app.app_context():
+    applied_versions(db.engine)
+    with db.engine.begin() as conn:
+        for name, table, columns in INVOICE_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        conn.execute(text("DELETE FROM schema_version WHERE version = 1"))
+        conn.execute(text("ANALYZE"))
+"""
+
+MIGRATE = """
+from sqlalchemy import text
+from app import create_app, db
+from migrations import run_migrations
+app = create_app()
+with app.app_context():
+    run_migrations(db.engine)
+    with db.engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+"""
+
+
+def _run(code, env):
+    result = run_python(code, env)
+    if result.returncode != 0:
+        print(result.stderr, file=sys.stderr)
+        raise SystemExit(result.returncode)
+    return result.stdout
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=2000)
+    parser.add_argument('--invoices', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=7, help='timed executions per query')
+    parser.add_argument('--output', help='results file (default benchmarks/results/indexes.json)')
+    args = parser.parse_args(argv)
+
+    database_path = os.path.join(tempfile.mkdtemp(prefix='invoice-indexes-'), 'bench.db')
+    env = benchmark_env(database_path)
+
+    print(f"Seeding {args.invoices} invoices...")
+    _run(f"from benchmarks.seed import main; main(['--clients', '{args.clients}', '--invoices', '{args.invoices}'])", env)
+
+    _run(DROP_INDEXES, env)
+    before = json.loads(_run(f"from benchmarks.indexes import probe; probe({args.repeat})", env).strip().splitlines()[-1])
+
+    _run(MIGRATE, env)
+    after = json.loads(_run(f"from benchmarks.indexes import probe; probe({args.repeat})", env).strip().splitlines()[-1])
+
+    results = {
+        'dataset': {'clients': args.clients, 'invoices': args.invoices},
+        'repeat': args.repeat,
+        'queries': {
+            name: {
+                'before_ms': before[name]['median_ms'],
+                'after_ms': after[name]['median_ms'],
+                'speedup': before[name]['median_ms'] / after[name]['median_ms'] if after[name]['median_ms'] else None,
+                'plan_before': before[name]['plan'],
+                'plan_after': after[name]['plan']
+            }
+            for name in before
+        }
+    }
+    path = write_results('indexes', results, args.output)
+
+    for name, data in results['queries'].items():
+        print(f"  {name:26s} before {data['before_ms']:9.2f} ms  after {data['after_ms']:9.2f} ms  "
+              f"x{data['speedup'] or 0:6.1f}")
+    print(f"Results written to {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""Line-item insertion: one ORM object per line against the bulk line-item engine.
+
+Creates invoices with 10, 100 and 1000 lines both ways in a scratch SQLite
+database and times validation, pricing and insert through the commit. The
+ORM path is the old ``create_invoice`` loop (``compute_invoice_totals`` plus
+an ``InvoiceLineItem`` per line); the engine path is
+``price_line_items`` + ``save_line_items``. Stored amounts must match.
+
+    python -m benchmarks.line_items [--lines 10 100 1000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+
+from benchmarks._common import benchmark_env, run_python, write_results
+
+
+def _payload(count, seed=7):
+    import random
+    rng = random.Random(seed)
+    return [{'description': f"Item {i}", 'hsn_code': '998314', 'quantity': rng.choice([1, 2, 2.5, 10]),
+             'unit_price': round(rng.uniform(10, 5000), 2), 'tax_percentage': rng.choice([5, 12, 18, 28]),
+             'cost_price': round(rng.uniform(5, 2000), 2)} for i in range(count)]
+
+
+def _orm(invoice, payload):
+    from app import db
+    from models import InvoiceLineItem
+    from money import compute_invoice_totals, to_paise
+
+    totals = compute_invoice_totals([item['quantity'] for item in payload],
+                                    [item['unit_price'] for item in payload],
+                                    [item.get('tax_percentage', 18.0) for item in payload])
+    lines = totals['lines']
+    for i, item in enumerate(payload, 1):
+        db.session.add(InvoiceLineItem(
+            invoice_id=invoice.id, sr_no=i, hsn_code=item.get('hsn_code', ''), description=item['description'],
+            quantity=float(item['quantity']), unit=item.get('unit', 'Nos'),
+            unit_price_paise=int(lines['unit_price'][i - 1]), tax_percentage=float(item['tax_percentage']),
+            tax_amount_paise=int(lines['tax'][i - 1]), total_amount_paise=int(lines['total'][i - 1]),
+            cost_price_paise=to_paise(item.get('cost_price', 0))
+        ))
+    invoice.subtotal_paise = totals['subtotal']
+    invoice.cgst_paise = totals['cgst']
+    invoice.sgst_paise = totals['sgst']
+    invoice.igst_paise = totals['igst']
+    invoice.total_amount_paise = totals['total']
+
+
+def _engine(invoice, payload):
+    from line_items import price_line_items, save_line_items
+    save_line_items(invoice, price_line_items(payload))
+
+
+def probe(line_counts, repeat):
+    """Time both paths per line count and compare what they stored; print JSON"""
+    import time
+    from datetime import date
+    from app import create_app, db
+    from models import Client, Invoice, InvoiceLineItem
+
+    app = create_app()
+    report = {'timings': {}, 'mismatches': []}
+    with app.app_context():
+        client_id = Client.query.first().id
+        for count in line_counts:
+            payload = _payload(count)
+            timings, stored = {}, {}
+            for name, path in (('orm', _orm), ('engine', _engine)):
+                runs = []
+                for run in range(repeat):
+                    start = time.perf_counter()
+                    invoice = Invoice(invoice_number=f"LINES-{name}-{count}-{run}", client_id=client_id,
+                                      invoice_date=date.today(), due_date=date.today())
+                    db.session.add(invoice)
+                    db.session.flush()
+                    path(invoice, payload)
+                    db.session.commit()
+                    runs.append((time.perf_counter() - start) * 1000)
+                timings[f"{name}_ms"] = statistics.median(runs)
+                rows = InvoiceLineItem.query.filter_by(invoice_id=invoice.id).order_by(InvoiceLineItem.sr_no)
+                stored[name] = (
+                    [(row.unit_price_paise, row.tax_amount_paise, row.total_amount_paise, row.cost_price_paise,
+                      row.total_amount) for row in rows],
+                    (invoice.subtotal_paise, invoice.total_amount_paise, invoice.total_amount)
+                )
+            if stored['orm'] != stored['engine']:
+                report['mismatches'].append(f"{count} lines: stored amounts differ")
+            report['timings'][str(count)] = timings
+    print(json.dumps(report))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='results file (default benchmarks/results/line_items.json)')
+    args = parser.parse_args(argv)
+
+    env = benchmark_env(os.path.join(tempfile.mkdtemp(prefix='invoice-lines-'), 'bench.db'))
+    for code in ("from benchmarks.seed import main; main(['--clients', '20', '--invoices', '1000'])",
+                 f"from benchmarks.line_items import probe; probe({args.lines!r}, {args.repeat})"):
+        result = run_python(code, env)
+        if result.returncode != 0:
+            print(result.stderr, file=sys.stderr)
+            return result.returncode
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+
+    path = write_results('line_items', dict(report, repeat=args.repeat), args.output)
+    for count, data in report['timings'].items():
+        print(f"  {count:>5s} lines  orm {data['orm_ms']:8.1f} ms  engine {data['engine_ms']:8.1f} ms  "
+              f"({data['orm_ms'] / data['engine_ms']:.1f}x)")
+    for mismatch in report['mismatches']:
+        print(f"  ! {mismatch}")
+    print(f"Results written to {path}")
+    return 1 if report['mismatches'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,415 @@
+"""HTTP load test of the main routes with scenario mixes.
+
+Virtual users log in as the admin user and pick scenarios at random with
+the weights of the chosen mix, back to back, for a fixed duration:
+
+    dashboard        GET  /
+    invoice_list     GET  /invoices?page=N
+    invoice_search   GET  /invoices?search=...&status=...
+    create_invoice   POST /create_invoice (AJAX)
+    invoice_pdf      GET  /invoice/<id>/pdf
+    analytics_data   GET  /api/analytics_data?type=...
+    send_invoice     POST /invoice/<id>/send
+
+Requests go through the Flask test client in one process (``--target
+testclient``, the default) or over HTTP to a local gunicorn started for the
+run (``--target gunicorn``, sized with ``--workers`` and ``--threads``).
+OpenAI and SMTP are replaced by the local stubs in ``benchmarks.stubs``
+with configurable latencies. Redirects are not followed, so a failed PDF
+(which redirects back to the invoice) counts as an error.
+
+    python -m benchmarks.loadtest [--mix mixed browse] [--users 8] [--seconds 30]
+                                  [--target gunicorn --workers 2 --threads 4]
+
+Reports requests per second, errors and latency percentiles per scenario,
+including "database is locked" failures on the write paths. Results go to
+``benchmarks/results/loadtest.json``.
+"""
+import argparse
+import json
+import os
+import random
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from bisect import bisect
+from collections import Counter, defaultdict
+from http.cookiejar import CookieJar
+from itertools import accumulate
+
+from benchmarks._common import APP_DIR, benchmark_env, run_python, workdir, write_results
+
+USERNAME = 'admin'
+PASSWORD = 'RevolutionaryAI2025!'
+AJAX = {'X-Requested-With': 'XMLHttpRequest'}
+
+MIXES = {
+    'browse': {'dashboard': 3, 'invoice_list': 4, 'invoice_search': 3, 'analytics_data': 1},
+    'billing': {'invoice_list': 2, 'create_invoice': 5, 'invoice_pdf': 2, 'send_invoice': 1},
+    'reporting': {'dashboard': 2, 'analytics_data': 5, 'invoice_pdf': 3},
+    'mixed': {'dashboard': 2, 'invoice_list': 3, 'invoice_search': 2, 'create_invoice': 2,
+              'invoice_pdf': 1, 'analytics_data': 2, 'send_invoice': 1},
+}
+ANALYTICS_TYPES = ['revenue', 'clients', 'payments', 'kpis']
+SEARCH_STATUSES = ['', '', 'Paid', 'Unpaid', 'Partially Paid']
+PRODUCTS = [('998314', 'Cloud hosting - monthly plan'), ('847130', 'Laptop - business series'),
+            ('998361', 'Digital marketing campaign'), ('852872', 'LED monitor 27 inch')]
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+# Transports: request(method, path, data, headers) -> (status, content type, body)
+
+class TestClientSession:
+    """A logged-in Flask test client"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None, headers=None):
+        response = self.client.open(path, method=method, data=data, headers=headers or {})
+        return response.status_code, response.content_type or '', response.get_data()
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpSession:
+    """A logged-in HTTP client with its own cookie jar"""
+
+    def __init__(self, base_url, timeout=60):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()), _NoRedirect())
+
+    def request(self, method, path, data=None, headers=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        request = urllib.request.Request(self.base_url + path, data=body, method=method, headers=headers or {})
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                return response.status, response.headers.get('Content-Type', ''), response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers.get('Content-Type', ''), e.read()
+
+
+def login(session):
+    status, _, _ = session.request('POST', '/login', {'username': USERNAME, 'password': PASSWORD})
+    status_after, _, _ = session.request('GET', '/')
+    if status_after != 200:
+        raise RuntimeError(f"Login failed (POST /login returned {status})")
+
+
+# Scenarios: take (session, rng, context) and return None on success or an error description
+
+def _expect(status, content_type, body, wanted='text/html'):
+    if status != 200:
+        return f"HTTP {status}"
+    if wanted not in content_type:
+        return f"unexpected {content_type or 'content type'}"
+    return None
+
+
+def _short(message):
+    return ' '.join(str(message).split())[:80]
+
+
+def _json_error(body, key='error'):
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return 'invalid JSON'
+    if isinstance(payload, dict):
+        if payload.get('success') is False:
+            return _short(payload.get(key) or payload.get('message'))
+        if 'error' in payload:
+            return _short(payload['error'])
+    return None
+
+
+def dashboard(session, rng, context):
+    return _expect(*session.request('GET', '/'))
+
+
+def invoice_list(session, rng, context):
+    return _expect(*session.request('GET', f"/invoices?page={rng.randint(1, context['pages'])}"))
+
+
+def invoice_search(session, rng, context):
+    query = urllib.parse.urlencode({'search': rng.choice(context['search_terms']),
+                                    'status': rng.choice(SEARCH_STATUSES)})
+    return _expect(*session.request('GET', f"/invoices?{query}"))
+
+
+def create_invoice(session, rng, context):
+    today = time.strftime('%Y-%m-%d')
+    lines = []
+    for _ in range(rng.randint(1, 5)):
+        hsn_code, description = rng.choice(PRODUCTS)
+        lines.append({'description': description, 'hsn_code': hsn_code, 'quantity': rng.randint(1, 10),
+                      'unit_price': round(rng.uniform(100, 5000), 2), 'tax_percentage': 18})
+    status, content_type, body = session.request('POST', '/create_invoice', {
+        'client_id': rng.choice(context['client_ids']),
+        'invoice_date': today,
+        'due_date': today,
+        'line_items': json.dumps(lines)
+    }, AJAX)
+    return _expect(status, content_type, body, 'application/json') or _json_error(body)
+
+
+def invoice_pdf(session, rng, context):
+    return _expect(*session.request('GET', f"/invoice/{rng.choice(context['invoice_ids'])}/pdf"),
+                   wanted='application/pdf')
+
+
+def analytics_data(session, rng, context):
+    status, content_type, body = session.request('GET', f"/api/analytics_data?type={rng.choice(ANALYTICS_TYPES)}")
+    return _expect(status, content_type, body, 'application/json') or _json_error(body)
+
+
+def send_invoice(session, rng, context):
+    status, content_type, body = session.request('POST', f"/invoice/{rng.choice(context['invoice_ids'])}/send")
+    return _expect(status, content_type, body, 'application/json') or _json_error(body, 'message')
+
+
+SCENARIOS = {func.__name__: func for func in (dashboard, invoice_list, invoice_search, create_invoice,
+                                              invoice_pdf, analytics_data, send_invoice)}
+
+
+def load_context(app, sample=500):
+    """Ids and search terms the scenarios draw from"""
+    from sqlalchemy import func
+    from models import Client, Invoice
+
+    with app.app_context():
+        invoice_count = Invoice.query.count()
+        client_ids = [row.id for row in Client.query.with_entities(Client.id).limit(sample)]
+        names = [row.name for row in Client.query.with_entities(Client.name).limit(50)]
+        invoice_ids = [row.id for row in Invoice.query.with_entities(Invoice.id)
+                       .order_by(func.random()).limit(sample)]
+    terms = [name.split()[-1] for name in names if name] + ['INV', 'BENCH-0001']
+    return {'client_ids': client_ids, 'invoice_ids': invoice_ids, 'search_terms': terms,
+            'pages': max(1, min(invoice_count // 20, 50))}
+
+
+def _user(session_factory, mix, context, seed, start_at, warmup_until, deadline, samples, failures, crashes):
+    rng = random.Random(seed)
+    names = list(mix)
+    cumulative = list(accumulate(mix.values()))
+    try:
+        session = session_factory()
+        login(session)
+    except Exception as e:
+        crashes.append(e)
+        return
+    while time.perf_counter() < start_at:
+        time.sleep(0.001)
+    while True:
+        now = time.perf_counter()
+        if now >= deadline:
+            return
+        name = names[bisect(cumulative, rng.random() * cumulative[-1])]
+        try:
+            error = SCENARIOS[name](session, rng, context)
+        except Exception as e:
+            error = _short(f"{type(e).__name__}: {e}")
+        elapsed = time.perf_counter() - now
+        if now >= warmup_until:
+            samples[name].append(elapsed * 1000)
+            if error:
+                failures[name][error] += 1
+
+
+def run_mix(session_factory, mix, context, users, seconds, warmup, seed=42):
+    """Drive ``users`` concurrent sessions through ``mix``; per-scenario figures"""
+    samples = defaultdict(list)
+    failures = defaultdict(Counter)
+    crashes = []
+    start_at = time.perf_counter() + 0.5 + 0.05 * users
+    warmup_until = start_at + warmup
+    deadline = warmup_until + seconds
+    threads = [
+        threading.Thread(target=_user, args=(session_factory, mix, context, seed + i, start_at, warmup_until,
+                                             deadline, samples, failures, crashes), daemon=True)
+        for i in range(users)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if crashes:
+        raise crashes[0]
+
+    report = {}
+    for name in mix:
+        latencies = samples.get(name, [])
+        errors = sum(failures[name].values())
+        report[name] = {
+            'requests': len(latencies),
+            'errors': errors,
+            'locked_errors': sum(count for error, count in failures[name].items() if 'locked' in error),
+            'error_kinds': dict(failures[name].most_common(3)),
+            'requests_per_second': len(latencies) / seconds,
+            'mean_ms': statistics.mean(latencies) if latencies else None,
+            'p50_ms': _percentile(latencies, 0.5),
+            'p90_ms': _percentile(latencies, 0.9),
+            'p95_ms': _percentile(latencies, 0.95),
+            'p99_ms': _percentile(latencies, 0.99),
+            'max_ms': max(latencies) if latencies else None
+        }
+    total = sum(data['requests'] for data in report.values())
+    return {
+        'scenarios': report,
+        'total': {'requests': total, 'errors': sum(data['errors'] for data in report.values()),
+                  'requests_per_second': total / seconds}
+    }
+
+
+def stubbed_app():
+    """App factory for gunicorn with OpenAI and SMTP stubbed: ``benchmarks.loadtest:stubbed_app()``"""
+    from benchmarks import stubs
+    stubs.install()
+    from app import create_app
+    return create_app()
+
+
+def drive(mixes, users, seconds, warmup, base_url=None):
+    """Run each mix against the test client or ``base_url``; print the report as JSON"""
+    import logging
+    from benchmarks import stubs
+
+    logging.disable(logging.WARNING)
+    if base_url:
+        from app import create_app
+        app = create_app()
+        factory = lambda: HttpSession(base_url)
+    else:
+        app = stubbed_app()
+        factory = lambda: TestClientSession(app)
+
+    context = load_context(app)
+    report = {'mixes': {}}
+    for name in mixes:
+        report['mixes'][name] = run_mix(factory, MIXES[name], context, users, seconds, warmup)
+    if base_url is None:
+        report['stub_calls'] = dict(stubs.calls)
+        metrics = app.extensions.get('request_metrics')
+        if metrics is not None:
+            report['server_subsystems'] = metrics.snapshot()['subsystems']
+    print(json.dumps(report, default=str))
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _start_gunicorn(env, workers, threads):
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--threads', str(threads),
+         '--bind', f"127.0.0.1:{port}", '--timeout', '120', '--config', os.path.join(APP_DIR, 'gunicorn.conf.py'),
+         'benchmarks.loadtest:stubbed_app()'],
+        cwd=workdir(env), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn exited: {proc.stderr.read()[-2000:]}")
+        try:
+            urllib.request.urlopen(base_url + '/login', timeout=5).close()
+            return proc, base_url
+        except OSError:
+            time.sleep(0.25)
+    proc.terminate()
+    raise RuntimeError('gunicorn did not start within 60s')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mix', nargs='+', default=['mixed'], choices=sorted(MIXES))
+    parser.add_argument('--users', type=int, default=8, help='concurrent virtual users')
+    parser.add_argument('--seconds', type=float, default=30, help='measured duration per mix')
+    parser.add_argument('--warmup', type=float, default=3, help='unmeasured seconds before each mix')
+    parser.add_argument('--target', choices=['testclient', 'gunicorn'], default='testclient')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=4, help='gunicorn threads per worker')
+    parser.add_argument('--openai-latency-ms', type=float, default=500)
+    parser.add_argument('--smtp-latency-ms', type=float, default=200)
+    parser.add_argument('--database', help='existing SQLite file to run against (default: seed a scratch copy)')
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--invoices', type=int, default=20000)
+    parser.add_argument('--output', help='results file (default benchmarks/results/loadtest.json)')
+    args = parser.parse_args(argv)
+
+    database_path = args.database or os.path.join(tempfile.mkdtemp(prefix='invoice-load-'), 'bench.db')
+    env = benchmark_env(database_path, STUB_OPENAI_LATENCY_MS=args.openai_latency_ms,
+                        STUB_SMTP_LATENCY_MS=args.smtp_latency_ms, OPENAI_API_KEY='stub-key')
+    if not args.database:
+        print(f"Seeding {args.invoices} invoices...")
+        seeded = run_python(
+            f"from benchmarks.seed import main; main(['--clients', '{args.clients}', '--invoices', '{args.invoices}'])",
+            env
+        )
+        if seeded.returncode != 0:
+            print(seeded.stderr, file=sys.stderr)
+            return seeded.returncode
+
+    server, base_url = None, None
+    if args.target == 'gunicorn':
+        server, base_url = _start_gunicorn(env, args.workers, args.threads)
+    try:
+        print(f"Driving {', '.join(args.mix)} with {args.users} users for {args.seconds:g}s each ({args.target})...")
+        result = run_python(
+            f"from benchmarks.loadtest import drive; "
+            f"drive({args.mix!r}, {args.users}, {args.seconds}, {args.warmup}, {base_url!r})", env
+        )
+    finally:
+        if server is not None:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=30)
+    if result.returncode != 0:
+        print(result.stderr, file=sys.stderr)
+        return result.returncode
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+
+    results = dict(report, target=args.target, users=args.users, seconds=args.seconds,
+                   stub_latency_ms={'openai': args.openai_latency_ms, 'smtp': args.smtp_latency_ms})
+    if args.target == 'gunicorn':
+        results.update(workers=args.workers, threads=args.threads)
+    path = write_results('loadtest', results, args.output)
+
+    for mix, data in report['mixes'].items():
+        total = data['total']
+        print(f"{mix}: {total['requests_per_second']:.1f} req/s, {total['errors']} errors")
+        for name, figures in data['scenarios'].items():
+            if not figures['requests']:
+                print(f"  {name:16s} no requests")
+                continue
+            print(f"  {name:16s} {figures['requests_per_second']:7.2f} req/s  p50 {figures['p50_ms']:8.1f}  "
+                  f"p95 {figures['p95_ms']:8.1f}  p99 {figures['p99_ms']:8.1f}  max {figures['max_ms']:8.1f} ms  "
+                  f"errors {figures['errors']} (locked {figures['locked_errors']})")
+            for error, count in figures['error_kinds'].items():
+                print(f"      {count:5d} x {error}")
+    print(f"Results written to {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,332 @@
+"""Seed a database with synthetic clients, invoices, payments, challans and expenses.
+
+    python -m benchmarks.seed --clients 50 --invoices 1000
+
+The target database comes from ``DATABASE_URL`` like the app itself. Output
+is deterministic for a given ``--seed``. Distributions aim at a plausible
+small business rather than uniform noise:
+
+* a few clients carry most of the business (Zipf weights), and corporate
+  clients place larger orders;
+* invoice volume grows over the history window, peaks at fiscal year end
+  (March) and in the festive season, and drops at weekends;
+* payment follows the client's ``payment_behavior_pattern``: early payers
+  settle before the due date, late payers weeks after it, a few never pay.
+  Invoices not yet settled are unpaid or partially paid, and overdue ones
+  carry escalating payment reminders;
+* part of the invoices ship with a delivery challan mirroring their lines;
+* expenses spread over the usual categories with per-category amounts.
+
+Rows are generated and inserted in chunks, so a million invoices fit in a
+modest amount of memory; everything is committed once at the end.
+"""
+import argparse
+import math
+import random
+import sys
+import time
+from bisect import bisect
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+
+from sqlalchemy import func, insert
+
+CHUNK = 20000
+
+STATES = ['Technology State', 'Tamil Nadu', 'Karnataka', 'Maharashtra', 'Kerala', 'Gujarat']
+CLIENT_TYPES = [('Regular', 0.6, 1.0), ('Premium', 0.3, 1.6), ('Corporate', 0.1, 2.8)]
+BEHAVIOURS = [('Early', 0.25), ('Consistent', 0.5), ('Late', 0.25)]
+# Days paid relative to the due date: (mean, spread) per payment behaviour
+PAYMENT_DELAYS = {'Early': (-6, 3), 'Consistent': (2, 4), 'Late': (24, 15)}
+NEVER_PAID = 0.02
+PARTIAL_SHARE = 0.3
+PAYMENT_TERMS = [15, 30, 30, 30, 45, 60]
+PAYMENT_MODES = [('UPI', 0.4), ('NEFT', 0.3), ('Cheque', 0.15), ('Cash', 0.1), ('Card', 0.05)]
+# Relative monthly volume: fiscal year end in March, festive season in October-November
+SEASONALITY = {1: 1.0, 2: 1.05, 3: 1.35, 4: 0.85, 5: 0.9, 6: 0.9,
+               7: 0.95, 8: 1.0, 9: 1.05, 10: 1.2, 11: 1.15, 12: 1.0}
+WEEKEND_VOLUME = 0.3
+ANNUAL_GROWTH = 0.25
+PRODUCTS = [
+    ('998314', 'Cloud hosting - monthly plan', 'Month'), ('998313', 'Software support retainer', 'Month'),
+    ('847130', 'Laptop - business series', 'Nos'), ('847160', 'Wireless keyboard and mouse', 'Nos'),
+    ('998361', 'Digital marketing campaign', 'Nos'), ('998599', 'On-site installation', 'Hrs'),
+    ('852872', 'LED monitor 27 inch', 'Nos'), ('998316', 'Managed backup service', 'Month')
+]
+REMINDER_TYPES = ['Payment Due', 'Overdue', 'Final Notice']
+# category: (weight, median amount in rupees, subcategories, vendors, tax deductible)
+EXPENSE_CATEGORIES = {
+    'Rent': (0.05, 45000, ['Office'], ['Skyline Estates'], True),
+    'Salaries': (0.1, 60000, ['Payroll', 'Contractors'], ['Payroll'], True),
+    'Utilities': (0.15, 4000, ['Electricity', 'Internet', 'Water'], ['TNEB', 'Airtel Business', 'Metro Water'], True),
+    'Travel': (0.2, 3500, ['Flights', 'Cabs', 'Hotels'], ['IndiGo', 'Uber', 'Ola', 'Taj Hotels'], True),
+    'Office Supplies': (0.2, 1500, ['Stationery', 'Pantry'], ['Amazon Business', 'Local Stationers'], True),
+    'Software': (0.15, 6000, ['Subscriptions', 'Licences'], ['Microsoft', 'Zoho', 'Google Workspace'], True),
+    'Meals': (0.15, 900, ['Client meetings', 'Team'], ['Swiggy', 'Zomato', 'Saravana Bhavan'], False),
+}
+
+
+def _picker(rng, options):
+    """Draw from ``[(value, weight, ...)]`` with precomputed cumulative weights"""
+    values = [option[0] for option in options]
+    cumulative = list(accumulate(option[1] for option in options))
+    return lambda: values[bisect(cumulative, rng.random() * cumulative[-1])]
+
+
+def _date_picker(rng, today, days):
+    """Draw dates from the last ``days`` days shaped by growth, seasonality and weekends"""
+    dates = [today - timedelta(days=offset) for offset in range(days, -1, -1)]
+    weights = [
+        (1 + ANNUAL_GROWTH * index / 365) * SEASONALITY[day.month] * (WEEKEND_VOLUME if day.weekday() >= 5 else 1)
+        for index, day in enumerate(dates)
+    ]
+    return _picker(rng, list(zip(dates, weights)))
+
+
+def _rupees(paise):
+    return paise / 100
+
+
+class _Batches:
+    """Row lists per model, flushed to the session as bulk inserts"""
+
+    def __init__(self, db, models):
+        self.db = db
+        self.rows = {model: [] for model in models}
+        self.counts = {model: 0 for model in models}
+
+    def add(self, model, row):
+        self.rows[model].append(row)
+
+    def flush(self):
+        for model, rows in self.rows.items():
+            if rows:
+                self.db.session.execute(insert(model), rows)
+                self.counts[model] += len(rows)
+                rows.clear()
+
+
+def seed_database(app, db, clients=50, invoices=1000, max_line_items=5, seed=42,
+                  days=730, challan_ratio=0.3, expenses=None):
+    """Insert synthetic data with chunked bulk inserts and return row counts
+
+    ``expenses`` defaults to one expense for every ten invoices.
+    """
+    from app import bootstrap_database
+    from models import (ChallanLineItem, Client, DeliveryChallan, ExpenseTracking, Invoice,
+                        InvoiceLineItem, PaymentReminder, User)
+
+    rng = random.Random(seed)
+    today = date.today()
+    if expenses is None:
+        expenses = invoices // 10
+
+    with app.app_context():
+        bootstrap_database()
+        admin_id = User.query.filter_by(username='admin').first().id
+
+        def next_id(model):
+            return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+        first_client_id = next_id(Client)
+        invoice_id, item_id = next_id(Invoice), next_id(InvoiceLineItem)
+        challan_id = next_id(DeliveryChallan)
+
+        pick_type = _picker(rng, CLIENT_TYPES)
+        pick_behaviour = _picker(rng, BEHAVIOURS)
+        client_rows = []
+        for client_id in range(first_client_id, first_client_id + clients):
+            client_rows.append({
+                'id': client_id,
+                'name': f"Bench Client {client_id:05d}",
+                'state': rng.choice(STATES),
+                'email': f"client{client_id}@example.com",
+                'phone': f"+91-90000{client_id:05d}",
+                'client_type': pick_type(),
+                'lead_stage': rng.choice(['New', 'In Discussion', 'Quoted', 'Closed']),
+                'ai_risk_score': round(rng.random(), 2),
+                'payment_behavior_pattern': pick_behaviour()
+            })
+        if client_rows:
+            db.session.execute(insert(Client), client_rows)
+
+        # A few clients carry most of the business
+        pick_client = _picker(rng, [(row, 1 / (rank + 1)) for rank, row in enumerate(client_rows)])
+        order_scale = {name: scale for name, _, scale in CLIENT_TYPES}
+        pick_date = _date_picker(rng, today, days)
+        pick_mode = _picker(rng, PAYMENT_MODES)
+
+        batches = _Batches(db, [Invoice, InvoiceLineItem, DeliveryChallan, ChallanLineItem, PaymentReminder])
+        for _ in range(invoices):
+            client = pick_client()
+            invoice_date = pick_date()
+            due_date = invoice_date + timedelta(days=rng.choice(PAYMENT_TERMS))
+
+            lines = []
+            subtotal = total_tax = 0
+            # Amounts in integer paise (whole quantities, 18% GST rounded half up)
+            for sr_no in range(1, rng.randint(1, max_line_items) + 1):
+                hsn_code, description, unit = rng.choice(PRODUCTS)
+                quantity = rng.randint(1, 20)
+                unit_price = round(math.exp(rng.gauss(7, 1)) * order_scale[client['client_type']] * 100)
+                cost_price = round(unit_price * rng.uniform(0.5, 0.9))
+                line_total = quantity * unit_price
+                tax_amount = (line_total * 18 + 50) // 100
+                lines.append((hsn_code, description, unit, quantity, unit_price, line_total))
+                batches.add(InvoiceLineItem, {
+                    'id': item_id,
+                    'invoice_id': invoice_id,
+                    'sr_no': sr_no,
+                    'hsn_code': hsn_code,
+                    'description': description,
+                    'quantity': float(quantity),
+                    'unit_price': _rupees(unit_price),
+                    'unit_price_paise': unit_price,
+                    'tax_percentage': 18.0,
+                    'tax_amount': _rupees(tax_amount),
+                    'tax_amount_paise': tax_amount,
+                    'total_amount': _rupees(line_total + tax_amount),
+                    'total_amount_paise': line_total + tax_amount,
+                    'cost_price': _rupees(cost_price),
+                    'cost_price_paise': cost_price
+                })
+                item_id += 1
+                subtotal += line_total
+                total_tax += tax_amount
+            total_amount = subtotal + total_tax
+            cgst = total_tax - total_tax // 2
+
+            # Settled once the client's usual delay has passed, otherwise still open
+            mean, spread = PAYMENT_DELAYS[client['payment_behavior_pattern']]
+            paid_on = due_date + timedelta(days=round(rng.gauss(mean, spread)))
+            paid_on = max(paid_on, invoice_date)
+            if paid_on <= today and rng.random() >= NEVER_PAID:
+                status, amount_paid = 'Paid', total_amount
+            elif rng.random() < PARTIAL_SHARE:
+                status, amount_paid, paid_on = 'Partially Paid', round(total_amount * rng.uniform(0.1, 0.9)), None
+            else:
+                status, amount_paid, paid_on = 'Unpaid', 0, None
+
+            batches.add(Invoice, {
+                'id': invoice_id,
+                'invoice_number': f"BENCH-{invoice_id:08d}",
+                'client_id': client['id'],
+                'invoice_date': invoice_date,
+                'due_date': due_date,
+                'subtotal': _rupees(subtotal),
+                'subtotal_paise': subtotal,
+                'cgst': _rupees(cgst),
+                'cgst_paise': cgst,
+                'sgst': _rupees(total_tax - cgst),
+                'sgst_paise': total_tax - cgst,
+                'igst': 0.0,
+                'igst_paise': 0,
+                'total_amount': _rupees(total_amount),
+                'total_amount_paise': total_amount,
+                'payment_status': status,
+                'payment_date': paid_on,
+                'payment_mode': pick_mode() if status == 'Paid' else None,
+                'amount_paid': _rupees(amount_paid),
+                'amount_paid_paise': amount_paid
+            })
+
+            # A reminder a week past due, then every fortnight until paid or three were sent
+            settled = paid_on or today
+            for level, sent_on in enumerate(range(7, (settled - due_date).days + 1, 14), start=1):
+                if level > len(REMINDER_TYPES):
+                    break
+                batches.add(PaymentReminder, {
+                    'invoice_id': invoice_id,
+                    'reminder_date': datetime.combine(due_date + timedelta(days=sent_on), datetime.min.time()),
+                    'reminder_type': REMINDER_TYPES[level - 1],
+                    'status': 'Sent',
+                    'escalation_level': level
+                })
+
+            if rng.random() < challan_ratio:
+                challan_date = max(invoice_date - timedelta(days=rng.randint(0, 3)), today - timedelta(days=days))
+                delivery_date = challan_date + timedelta(days=rng.randint(1, 7))
+                batches.add(DeliveryChallan, {
+                    'id': challan_id,
+                    'challan_number': f"BENCH-CH-{challan_id:08d}",
+                    'client_id': client['id'],
+                    'challan_date': challan_date,
+                    'delivery_date': delivery_date if delivery_date <= today else None,
+                    'status': 'Delivered' if delivery_date <= today else 'Open',
+                    'invoice_id': invoice_id
+                })
+                for sr_no, (hsn_code, description, unit, quantity, unit_price, line_total) in enumerate(lines, start=1):
+                    batches.add(ChallanLineItem, {
+                        'challan_id': challan_id,
+                        'sr_no': sr_no,
+                        'hsn_code': hsn_code,
+                        'description': description,
+                        'quantity': float(quantity),
+                        'unit': unit,
+                        'unit_price': _rupees(unit_price),
+                        'total_amount': _rupees(line_total)
+                    })
+                challan_id += 1
+
+            invoice_id += 1
+            if len(batches.rows[Invoice]) >= CHUNK:
+                batches.flush()
+        batches.flush()
+
+        categories = list(EXPENSE_CATEGORIES.items())
+        pick_category = _picker(rng, [(name, spec[0]) for name, spec in categories])
+        expense_batches = _Batches(db, [ExpenseTracking])
+        for _ in range(expenses):
+            category = pick_category()
+            _, median, subcategories, vendors, tax_deductible = EXPENSE_CATEGORIES[category]
+            subcategory = rng.choice(subcategories)
+            expense_batches.add(ExpenseTracking, {
+                'user_id': admin_id,
+                'expense_date': pick_date(),
+                'amount': round(median * math.exp(rng.gauss(0, 0.5)), 2),
+                'category': category,
+                'subcategory': subcategory,
+                'description': f"{subcategory} - {category.lower()}",
+                'vendor_name': rng.choice(vendors),
+                'tax_deductible': tax_deductible
+            })
+            if len(expense_batches.rows[ExpenseTracking]) >= CHUNK:
+                expense_batches.flush()
+        expense_batches.flush()
+
+        db.session.commit()
+
+    return {
+        'clients': len(client_rows),
+        'invoices': batches.counts[Invoice],
+        'line_items': batches.counts[InvoiceLineItem],
+        'payment_reminders': batches.counts[PaymentReminder],
+        'challans': batches.counts[DeliveryChallan],
+        'challan_line_items': batches.counts[ChallanLineItem],
+        'expenses': expense_batches.counts[ExpenseTracking]
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--invoices', type=int, default=1000)
+    parser.add_argument('--max-line-items', type=int, default=5)
+    parser.add_argument('--days', type=int, default=730, help='history window ending today')
+    parser.add_argument('--challan-ratio', type=float, default=0.3, help='share of invoices shipped with a challan')
+    parser.add_argument('--expenses', type=int, help='expense rows (default: invoices / 10)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    from app import create_app, db
+    app = create_app()
+
+    start = time.perf_counter()
+    counts = seed_database(app, db, args.clients, args.invoices, args.max_line_items, args.seed,
+                           days=args.days, challan_ratio=args.challan_ratio, expenses=args.expenses)
+    print(f"Seeded {counts} in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
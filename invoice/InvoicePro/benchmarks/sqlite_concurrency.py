@@ -0,0 +1,168 @@
+"""Mixed reader/writer throughput on SQLite, with and without the pragma layer.
+
+Seeds one database in the default rollback-journal mode and copies it for
+each configuration. Reader processes run dashboard-style aggregate queries
+and writer processes create invoices with line items, all for a fixed
+duration. Reports operations per second, latency percentiles and
+"database is locked" errors for each role.
+
+    python -m benchmarks.sqlite_concurrency [--readers 4] [--writers 2] [--seconds 10]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks._common import benchmark_env, run_python, workdir, write_results
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def worker(role, seconds, worker_id):
+    """Run reads or writes for ``seconds`` and print a JSON summary"""
+    import time
+    from datetime import date, timedelta
+    from sqlalchemy import func
+    from sqlalchemy.exc import OperationalError
+    from app import create_app, db
+    from models import Invoice, InvoiceLineItem
+
+    app = create_app()
+    latencies = []
+    locked = 0
+    today = date.today()
+
+    with app.app_context():
+        client_ids = [row[0] for row in db.session.query(Invoice.client_id).distinct().limit(50)]
+        deadline = time.perf_counter() + seconds
+        n = 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                if role == 'reader':
+                    db.session.query(Invoice.payment_status, func.sum(Invoice.total_amount), func.count(Invoice.id)) \
+                        .group_by(Invoice.payment_status).all()
+                    db.session.query(Invoice.id).order_by(Invoice.created_at.desc()).limit(5).all()
+                    db.session.query(func.count(Invoice.id)).filter(
+                        Invoice.payment_status != 'Paid', Invoice.due_date < today).scalar()
+                    db.session.rollback()
+                else:
+                    invoice = Invoice(
+                        invoice_number=f"CONC-{worker_id}-{n}-{os.getpid()}",
+                        client_id=client_ids[n % len(client_ids)],
+                        invoice_date=today,
+                        due_date=today + timedelta(days=30),
+                        subtotal=1000.0, cgst=90.0, sgst=90.0, total_amount=1180.0,
+                        payment_status='Unpaid'
+                    )
+                    db.session.add(invoice)
+                    db.session.flush()
+                    for sr_no in range(1, 4):
+                        db.session.add(InvoiceLineItem(
+                            invoice_id=invoice.id, sr_no=sr_no, description='Benchmark item',
+                            quantity=1.0, unit_price=333.33, tax_percentage=18.0,
+                            tax_amount=60.0, total_amount=393.33
+                        ))
+                    db.session.commit()
+                latencies.append((time.perf_counter() - start) * 1000)
+            except OperationalError as e:
+                db.session.rollback()
+                if 'locked' not in str(e):
+                    raise
+                locked += 1
+            n += 1
+
+    print(json.dumps({'role': role, 'ops': len(latencies), 'locked': locked,
+                      'seconds': seconds, 'latencies_ms': latencies}))
+
+
+def _run_mix(env, readers, writers, seconds):
+    code = "from benchmarks.sqlite_concurrency import worker; worker({role!r}, {seconds}, {worker_id})"
+    procs = []
+    for worker_id in range(readers + writers):
+        role = 'reader' if worker_id < readers else 'writer'
+        procs.append(subprocess.Popen(
+            [sys.executable, '-c', code.format(role=role, seconds=seconds, worker_id=worker_id)],
+            cwd=workdir(env), env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+        ))
+
+    outputs = []
+    for proc in procs:
+        stdout, stderr = proc.communicate()
+        if proc.returncode != 0:
+            print(stderr, file=sys.stderr)
+            raise SystemExit(proc.returncode)
+        outputs.append(json.loads(stdout.strip().splitlines()[-1]))
+
+    summary = {}
+    for role in ('reader', 'writer'):
+        runs = [o for o in outputs if o['role'] == role]
+        latencies = [ms for o in runs for ms in o['latencies_ms']]
+        ops = sum(o['ops'] for o in runs)
+        summary[role] = {
+            'processes': len(runs),
+            'ops': ops,
+            'ops_per_second': ops / seconds,
+            'locked_errors': sum(o['locked'] for o in runs),
+            'p50_ms': _percentile(latencies, 0.5),
+            'p95_ms': _percentile(latencies, 0.95),
+            'p99_ms': _percentile(latencies, 0.99),
+            'mean_ms': statistics.mean(latencies) if latencies else None
+        }
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--invoices', type=int, default=20000)
+    parser.add_argument('--output', help='results file (default benchmarks/results/sqlite_concurrency.json)')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='invoice-sqlite-')
+    seed_path = os.path.join(workdir, 'seed.db')
+    seeded = run_python(
+        f"from benchmarks.seed import main; main(['--clients', '{args.clients}', '--invoices', '{args.invoices}'])",
+        benchmark_env(seed_path, SQLITE_TUNING='false')
+    )
+    if seeded.returncode != 0:
+        print(seeded.stderr, file=sys.stderr)
+        return seeded.returncode
+
+    results = {
+        'dataset': {'clients': args.clients, 'invoices': args.invoices},
+        'mix': {'readers': args.readers, 'writers': args.writers, 'seconds': args.seconds},
+        'configurations': {}
+    }
+    for name, tuning in (('rollback_journal', 'false'), ('wal_pragmas', 'true')):
+        path = os.path.join(workdir, f"{name}.db")
+        shutil.copyfile(seed_path, path)
+        env = benchmark_env(path, SQLITE_TUNING=tuning)
+        results['configurations'][name] = _run_mix(env, args.readers, args.writers, args.seconds)
+
+    path = write_results('sqlite_concurrency', results, args.output)
+
+    for name, summary in results['configurations'].items():
+        print(name)
+        for role, data in summary.items():
+            p95 = f"{data['p95_ms']:.1f}" if data['p95_ms'] is not None else '-'
+            print(f"  {role:7s} {data['ops_per_second']:8.1f} ops/s  p95 {p95:>8s} ms  "
+                  f"locked {data['locked_errors']}")
+    print(f"Results written to {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""Startup import report for ``create_app()``.
+
+Runs ``python -X importtime -c "import app; app.create_app()"`` in a fresh interpreter against a
+scratch database, records the slowest imports, the wall-clock boot time and
+the RSS after boot. Exits non-zero when one of ``lazy_imports.HEAVY_MODULES``
+is imported during boot, so worker start-up stays lean.
+
+    python -m benchmarks.startup_imports [--repeat 5] [--top 25] [--output path]
+"""
+import argparse
+import json
+import statistics
+import sys
+
+from benchmarks._common import benchmark_env, run_python, write_results
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+app.create_app()
+elapsed = time.perf_counter() - start
+from lazy_imports import loaded_heavy_modules
+from benchmarks._common import current_rss_mb
+print(json.dumps({
+    'import_ms': elapsed * 1000,
+    'rss_mb': current_rss_mb(),
+    'heavy_modules': loaded_heavy_modules(),
+    'module_count': len(sys.modules)
+}))
+"""
+
+
+def parse_importtime(stderr: str):
+    """Parse ``-X importtime`` output into (module, self_us, cumulative_us, depth) rows"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        parts = line.split(':', 1)[1].split('|')
+        if len(parts) != 3:
+            continue
+        self_us, cumulative_us, name = parts
+        # One separator space, then two spaces per nesting level
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help='boot measurements to take')
+    parser.add_argument('--top', type=int, default=25, help='slowest imports to report')
+    parser.add_argument('--output', help='results file (default benchmarks/results/startup_imports.json)')
+    args = parser.parse_args(argv)
+
+    env = benchmark_env()
+
+    # Per-module timings from a single -X importtime run
+    traced = run_python('import app; app.create_app()', env, '-X', 'importtime')
+    rows = parse_importtime(traced.stderr)
+    slowest = sorted(rows, key=lambda row: row[2], reverse=True)[:args.top]
+
+    # Wall-clock boot time and memory without the tracing overhead
+    samples = []
+    for _ in range(args.repeat):
+        probe = run_python(PROBE, env)
+        if probe.returncode != 0:
+            print(probe.stderr, file=sys.stderr)
+            return probe.returncode
+        samples.append(json.loads(probe.stdout.strip().splitlines()[-1]))
+
+    heavy_modules = sorted({name for sample in samples for name in sample['heavy_modules']})
+    results = {
+        'import_ms': {
+            'median': statistics.median(s['import_ms'] for s in samples),
+            'min': min(s['import_ms'] for s in samples),
+            'max': max(s['import_ms'] for s in samples)
+        },
+        'rss_mb_after_import': statistics.median(s['rss_mb'] for s in samples),
+        'module_count': samples[-1]['module_count'],
+        'heavy_modules_at_boot': heavy_modules,
+        'slowest_imports': [
+            {'module': name, 'self_us': self_us, 'cumulative_us': cumulative_us, 'depth': depth}
+            for name, self_us, cumulative_us, depth in slowest
+        ]
+    }
+    path = write_results('startup_imports', results, args.output)
+
+    print(f"create_app: {results['import_ms']['median']:.1f} ms median, "
+          f"RSS {results['rss_mb_after_import']:.1f} MB, {results['module_count']} modules")
+    for row in results['slowest_imports'][:10]:
+        print(f"  {row['cumulative_us'] / 1000:8.1f} ms  {'  ' * row['depth']}{row['module']}")
+    print(f"Results written to {path}")
+
+    if heavy_modules:
+        print(f"Heavy modules imported at boot: {', '.join(heavy_modules)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
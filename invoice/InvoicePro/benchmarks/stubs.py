@@ -0,0 +1,123 @@
+"""Local stand-ins for the OpenAI API and SMTP, for load tests.
+
+``install()`` patches the OpenAI chat completions call and ``smtplib``'s
+client classes in the current process, and sets a dummy API key so the
+AI services start. The stubs sleep for a configurable time to mimic the
+network round trip, then return a canned JSON completion or accept the
+message. Nothing leaves the machine.
+
+Latencies come from ``STUB_OPENAI_LATENCY_MS`` and ``STUB_SMTP_LATENCY_MS``
+unless passed explicitly, so a server process can be stubbed through its
+environment (see ``benchmarks.loadtest.stubbed_app``).
+"""
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+# One completion carrying every top-level key the AI service prompts ask for
+CANNED_COMPLETION = {
+    'payment_behavior': 'Pays within terms',
+    'average_order_value': 25000.0,
+    'preferred_products': ['Cloud hosting - monthly plan'],
+    'seasonal_patterns': 'Higher volume in March',
+    'risk_assessment': {'score': 0.3, 'factors': []},
+    'recommendations': ['Offer an early payment discount'],
+    'predicted_ltv': 300000.0,
+    'next_order_prediction': {'likely_date': None, 'estimated_value': 25000.0, 'suggested_products': []},
+    'suggestions': [],
+    'optimized_items': [],
+    'monthly_predictions': [],
+    'summary': {'total_predicted_revenue': 0.0, 'cash_flow_trend': 'stable', 'risk_factors': [],
+                'recommendations': []},
+    'payment_behavior_segments': [],
+    'insights': {'best_performing_clients': [], 'at_risk_clients': [], 'overall_collection_health': 'good',
+                 'recommendations': []},
+    'predictions': {'clients_likely_to_default': [], 'improvement_opportunities': []},
+    'demand_forecast': {'total_demand': 0.0, 'daily_average': 0.0, 'peak_demand_days': [], 'confidence_level': 0.5},
+    'reorder_recommendation': {'should_reorder': False, 'suggested_quantity': 0.0, 'reorder_urgency': 'low',
+                               'reasoning': 'stub'},
+    'seasonal_insights': {'pattern_detected': False, 'seasonal_factors': [], 'next_peak_period': ''},
+    'intent': 'unknown',
+    'confidence': 0.8,
+    'entities': {},
+    'parameters': {'requires_confirmation': True, 'missing_info': []},
+    'alternative_intents': []
+}
+
+calls = {'openai': 0, 'smtp': 0}
+_calls_lock = threading.Lock()
+
+
+def _count(name):
+    with _calls_lock:
+        calls[name] += 1
+
+
+def _completion(latency):
+    def create(self, *args, **kwargs):
+        _count('openai')
+        time.sleep(latency)
+        message = SimpleNamespace(role='assistant', content=json.dumps(CANNED_COMPLETION))
+        return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message, finish_reason='stop')],
+                               model=kwargs.get('model'), usage=None)
+    return create
+
+
+class StubSMTP:
+    """Accepts logins and messages like ``smtplib.SMTP``; delivers nothing"""
+
+    latency = 0.0
+
+    def __init__(self, host='', port=0, *args, **kwargs):
+        self.host = host
+        self.port = port
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.quit()
+
+    def ehlo(self, *args, **kwargs):
+        return 250, b'stub'
+
+    def starttls(self, *args, **kwargs):
+        return 220, b'stub'
+
+    def login(self, user, password, *args, **kwargs):
+        return 235, b'stub'
+
+    def send_message(self, msg, *args, **kwargs):
+        _count('smtp')
+        time.sleep(self.latency)
+        return {}
+
+    def sendmail(self, from_addr, to_addrs, msg, *args, **kwargs):
+        _count('smtp')
+        time.sleep(self.latency)
+        return {}
+
+    def quit(self):
+        return 221, b'stub'
+
+    close = quit
+
+
+def install(openai_latency_ms=None, smtp_latency_ms=None):
+    """Patch OpenAI and SMTP in this process; safe to call more than once"""
+    import smtplib
+    from openai.resources.chat.completions import Completions
+
+    if openai_latency_ms is None:
+        openai_latency_ms = float(os.environ.get('STUB_OPENAI_LATENCY_MS', '500'))
+    if smtp_latency_ms is None:
+        smtp_latency_ms = float(os.environ.get('STUB_SMTP_LATENCY_MS', '200'))
+
+    Completions.create = _completion(openai_latency_ms / 1000)
+    StubSMTP.latency = smtp_latency_ms / 1000
+    smtplib.SMTP = smtplib.SMTP_SSL = StubSMTP
+    # The services refuse to start without a key; any value will do now
+    if not os.environ.get('OPENAI_API_KEY'):
+        os.environ['OPENAI_API_KEY'] = 'stub-key'
@@ -7,6 +7,7 @@ from typing import Dict, Any, Optional
 import os
 from app import db
 from models import BlockchainRecord, SmartContract, Invoice
+from metrics import timed
 
 class BlockchainInvoiceVerification:
     """Blockchain-based invoice verification system"""
@@ -14,6 +15,8 @@ class BlockchainInvoiceVerification:
     def __init__(self):
         self.chain = []
         self.pending_transactions = []
+        # invoice_id -> (block index, transaction) for the first block recording it
+        self.invoice_index = {}
         self.blockchain_file = os.path.join(os.getcwd(), "blockchain_data", "invoice_chain.json")
         self.load_blockchain()
     
@@ -71,6 +74,7 @@ class BlockchainInvoiceVerification:
         items_string = json.dumps(items_data, sort_keys=True)
         return hashlib.sha256(items_string.encode()).hexdigest()
     
+    @timed('blockchain')
     def add_invoice_to_blockchain(self, invoice: Invoice) -> str:
         """Add invoice to blockchain for verification"""
         try:
@@ -151,12 +155,14 @@ class BlockchainInvoiceVerification:
         
         # Add block to chain
         self.chain.append(new_block)
+        self._index_block(new_block)
         
         # Clear pending transactions
         self.pending_transactions = []
         
         return new_block
     
+    @timed('blockchain')
     def verify_invoice_integrity(self, invoice_id: int) -> Dict[str, Any]:
         """Verify invoice integrity using blockchain"""
         try:
@@ -165,14 +171,7 @@ class BlockchainInvoiceVerification:
                 return {"verified": False, "reason": "Invoice not found or not on blockchain"}
             
             # Find transaction in blockchain
-            transaction = None
-            for block in self.chain:
-                for tx in block["transactions"]:
-                    if tx.get("invoice_id") == invoice_id:
-                        transaction = tx
-                        break
-                if transaction:
-                    break
+            block_index, transaction = self.invoice_index.get(invoice_id, (None, None))
             
             if not transaction:
                 return {"verified": False, "reason": "Transaction not found in blockchain"}
@@ -202,16 +201,10 @@ class BlockchainInvoiceVerification:
                 "verified": True,
                 "blockchain_hash": transaction["hash"],
                 "timestamp": transaction["timestamp"],
-                "block_index": None,
+                "block_index": block_index,
                 "integrity_check": current_hash == blockchain_data["line_items_hash"]
             }
             
-            # Find block index
-            for block in self.chain:
-                if transaction in block["transactions"]:
-                    verification_result["block_index"] = block["index"]
-                    break
-            
             if not verification_result["integrity_check"]:
                 verification_result["verified"] = False
                 verification_result["reason"] = "Invoice data has been modified since blockchain entry"
@@ -241,6 +234,20 @@ class BlockchainInvoiceVerification:
             # Create new blockchain with genesis block
             genesis = self.create_genesis_block()
             self.chain = [genesis]
+        
+        self.rebuild_invoice_index()
+    
+    def _index_block(self, block: Dict[str, Any]):
+        for tx in block.get("transactions", []):
+            invoice_id = tx.get("invoice_id")
+            if invoice_id is not None and invoice_id not in self.invoice_index:
+                self.invoice_index[invoice_id] = (block["index"], tx)
+    
+    def rebuild_invoice_index(self):
+        """Index invoice transactions by invoice id for constant-time lookups"""
+        self.invoice_index = {}
+        for block in self.chain:
+            self._index_block(block)
     
     def save_blockchain(self):
         """Save blockchain to file"""
@@ -251,6 +258,7 @@ class BlockchainInvoiceVerification:
         except Exception as e:
             logging.error(f"Failed to save blockchain: {e}")
     
+    @timed('blockchain')
     def get_blockchain_stats(self) -> Dict[str, Any]:
         """Get blockchain statistics"""
         total_blocks = len(self.chain)
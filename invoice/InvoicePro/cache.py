@@ -0,0 +1,200 @@
+import copy
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+from inspect import signature
+from itertools import chain
+from typing import Any, Callable, Hashable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+# Tables whose changes invalidate cached dashboard and analytics data
+# (payments are recorded on the invoice row itself)
+VERSIONED_TABLES = frozenset({'invoice', 'invoice_line_item', 'client'})
+
+
+class DataVersion:
+    """Version token for invoice/client data, bumped after each relevant commit
+
+    Sessions note which ``VERSIONED_TABLES`` they flushed (or bulk-modified)
+    and the version is bumped in ``after_commit``. Besides the in-process
+    counter, a marker file is replaced on every bump so that other worker
+    processes on the same host see the change on their next lookup.
+    """
+
+    def __init__(self):
+        self._counter = 0
+        self._lock = threading.Lock()
+        self._path: Optional[str] = None
+
+    def init_app(self, app):
+        path = app.config.get("DATA_VERSION_FILE") or os.path.join(app.instance_path, 'data_version')
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if not os.path.exists(path):
+                self._write_marker(path)
+            self._path = path
+        except OSError as e:
+            logging.warning(f"Data version marker unavailable, caches are per process: {e}")
+        app.extensions['data_version'] = self
+
+    @staticmethod
+    def _write_marker(path):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(uuid.uuid4().hex)
+        os.replace(tmp_path, path)
+
+    def bump(self):
+        with self._lock:
+            self._counter += 1
+        if self._path:
+            try:
+                self._write_marker(self._path)
+            except OSError as e:
+                logging.warning(f"Could not update data version marker: {e}")
+
+    def current(self) -> Hashable:
+        """Opaque token that changes whenever versioned data is committed"""
+        if self._path:
+            try:
+                stat = os.stat(self._path)
+                return (self._counter, stat.st_ino, stat.st_mtime_ns)
+            except OSError:
+                pass
+        return (self._counter,)
+
+
+data_version = DataVersion()
+
+
+def _touch(session, tables):
+    touched = VERSIONED_TABLES.intersection(tables)
+    if touched:
+        session.info.setdefault('versioned_tables_touched', set()).update(touched)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_flushed_tables(session, flush_context):
+    _touch(session, {
+        obj.__table__.name
+        for obj in chain(session.new, session.dirty, session.deleted)
+        if hasattr(obj, '__table__')
+    })
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk_tables(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None:
+            _touch(orm_execute_state.session, {table.name})
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_on_commit(session):
+    if session.info.pop('versioned_tables_touched', None):
+        data_version.bump()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_on_rollback(session):
+    session.info.pop('versioned_tables_touched', None)
+
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries carry a data version and expiry
+
+    An entry is served only while it is younger than its TTL and was built
+    for the current data version.
+    """
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, version: Hashable = None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, entry_version, value = entry
+                if expires_at > time.monotonic() and entry_version == version:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, key: Hashable, value: Any, ttl: float, version: Hashable = None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any], ttl: float,
+                       version: Hashable = None):
+        found, value = self.get(key, version)
+        if found:
+            return value
+        value = compute()
+        self.set(key, value, ttl, version)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+
+def memoize(ttl: float = 300, maxsize: int = 128, cache_if: Optional[Callable[[Any], bool]] = None,
+            enabled: bool = True):
+    """Cache results per call arguments until ``ttl`` seconds pass or the data version changes
+
+    ``self`` is left out of the key for methods, so every instance shares
+    the cache. Results for which ``cache_if(result)`` is false are returned
+    but not stored. Every caller gets its own deep copy of a cached result,
+    so a caller adding keys or sorting lists cannot change what the next
+    one sees. The wrapper gains ``cache_info()`` and ``cache_clear()``.
+    """
+    def decorator(func):
+        if not enabled:
+            return func
+
+        cache = TTLCache(maxsize)
+        params = list(signature(func).parameters)
+        skip = 1 if params and params[0] == 'self' else 0
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (args[skip:], tuple(sorted(kwargs.items())))
+            version = data_version.current()
+            try:
+                found, value = cache.get(key, version)
+            except TypeError:
+                # Unhashable arguments: nothing to key on
+                return func(*args, **kwargs)
+            if found:
+                return copy.deepcopy(value)
+            value = func(*args, **kwargs)
+            if cache_if is None or cache_if(value):
+                cache.set(key, copy.deepcopy(value), ttl, version)
+            return value
+
+        wrapper.cache_info = cache.stats
+        wrapper.cache_clear = cache.clear
+        return wrapper
+    return decorator
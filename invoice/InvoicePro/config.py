@@ -148,6 +148,29 @@ INVENTORY_ABC_ANALYSIS_ENABLED = True
 ANALYTICS_RETENTION_DAYS = 365
 ANALYTICS_BATCH_SIZE = 1000
 ANALYTICS_CACHE_ENABLED = True
+ANALYTICS_CACHE_SIZE = 64  # entries per memoized AnalyticsEngine method
+# Threads computing analytics page sections (analytics_graph.py); 1 runs them in the request thread.
+# Keep below the database pool size, since each running node holds a connection.
+ANALYTICS_GRAPH_WORKERS = int(os.environ.get("ANALYTICS_GRAPH_WORKERS", "4"))
+
+# Client segmentation (segmentation.py): low < first threshold <= medium <= second < high
+SEGMENT_VALUE_THRESHOLDS = (25000, 100000)  # paid revenue in rupees
+SEGMENT_RISK_THRESHOLDS = (0.3, 0.7)  # ai_risk_score
+SEGMENT_VALUE_HISTOGRAM_EDGES = (0, 10000, 25000, 50000, 100000, 250000, 500000, 1000000)
+SEGMENT_RISK_HISTOGRAM_EDGES = (0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9)
+
+# Similar-invoice index (similarity_index.py); weights of the per-feature similarities sum to 1
+SIMILARITY_TOKEN_DIMENSIONS = 32  # hashed description token buckets per invoice
+SIMILARITY_WEIGHTS = {'amount': 0.35, 'client': 0.25, 'date': 0.15, 'line_count': 0.1, 'description': 0.15}
+
+# In-memory invoice arrays (similarity index, columnar fact store): changed invoices past which a refresh rebuilds
+INVOICE_ARRAYS_RELOAD_THRESHOLD = 50000
+
+# Post-commit invoice side effects (invoice_pipeline.py): QR, AI risk, payment date, blockchain, PDF.
+# 0 runs them in the request thread straight after the commit.
+INVOICE_PIPELINE_WORKERS = int(os.environ.get("INVOICE_PIPELINE_WORKERS", "2"))
+# Pre-rendered invoice PDFs (relative to the app root), also where send_invoice_email looks for attachments
+INVOICE_PDF_DIR = os.environ.get("INVOICE_PDF_DIR", "invoices")
 
 # Backup Configuration
 BACKUP_ENABLED = os.environ.get("BACKUP_ENABLED", "true").lower() == "true"
@@ -0,0 +1,208 @@
+"""Columnar invoice facts for the optional in-memory analytics backend
+
+With ``ANALYTICS_BACKEND=columnar`` the analytics engine answers its
+invoice-level group-bys (payment status, timing and modes, per-client
+totals and profitability) from NumPy columns instead of SQL: one slot per
+invoice holding the client, status and payment mode codes, date ordinals,
+paise totals and line-item sums. Month-by-month figures keep coming from
+the ``monthly_revenue_rollup`` table, which is already aggregated. The store
+is built at service warm-up and follows the database like the similar-invoice
+index (see ``invoice_arrays``). Results have the shapes of the SQL
+implementations; ``benchmarks/fact_store.py`` checks them against each other.
+"""
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from invoice_arrays import InvoiceArrays
+from lazy_imports import lazy_import
+from models import Invoice, InvoiceLineItem
+from money import PAISE_PER_RUPEE
+from service_registry import services
+import config
+
+np = lazy_import('numpy')
+
+# Global store instance, created by initialize_fact_store()
+invoice_fact_store = None
+
+
+def _ordinal(value):
+    return value.toordinal() if value else 0
+
+
+class _Vocabulary:
+    """Small-integer codes for a string column (None included)"""
+
+    def __init__(self):
+        self.values: List[Optional[str]] = []
+        self._codes: Dict[Optional[str], int] = {}
+
+    def code(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def codes(self, values):
+        return [self._codes[value] for value in values if value in self._codes]
+
+
+class InvoiceFactStore(InvoiceArrays):
+    """Invoice facts as NumPy columns with vectorized group-bys"""
+
+    label = 'Analytics fact store'
+    invoice_fields = (
+        Invoice.client_id, Invoice.payment_status, Invoice.payment_mode,
+        Invoice.invoice_date, Invoice.due_date, Invoice.payment_date,
+        Invoice.total_amount_paise, Invoice.amount_paid_paise
+    )
+    line_item_fields = (InvoiceLineItem.quantity, InvoiceLineItem.total_amount_paise,
+                        InvoiceLineItem.tax_amount_paise, InvoiceLineItem.cost_price_paise)
+
+    def __init__(self, full_reload_threshold: int = 50000):
+        self.statuses = _Vocabulary()
+        self.payment_modes = _Vocabulary()
+        super().__init__(full_reload_threshold)
+
+    def _column_specs(self):
+        return {
+            'client_ids': ('int64', ()),
+            'status': ('int16', ()),
+            'mode': ('int16', ()),
+            'invoice_dates': ('int32', ()),  # date ordinals, 0 when missing
+            'due_dates': ('int32', ()),
+            'payment_dates': ('int32', ()),
+            'total_paise': ('int64', ()),
+            'paid_paise': ('int64', ()),
+            # Line-item sums, as the SQL queries compute them
+            'line_counts': ('int32', ()),
+            'line_revenue': ('int64', ()),  # total_amount_paise - tax_amount_paise
+            'line_cost': ('int64', ()),  # cost_price_paise * quantity, rounded per line
+        }
+
+    def _set_invoice(self, slot, row):
+        self.client_ids[slot] = row.client_id or 0
+        self.status[slot] = self.statuses.code(row.payment_status)
+        self.mode[slot] = self.payment_modes.code(row.payment_mode)
+        self.invoice_dates[slot] = _ordinal(row.invoice_date)
+        self.due_dates[slot] = _ordinal(row.due_date)
+        self.payment_dates[slot] = _ordinal(row.payment_date)
+        self.total_paise[slot] = row.total_amount_paise or 0
+        self.paid_paise[slot] = row.amount_paid_paise or 0
+        self.line_counts[slot] = 0
+        self.line_revenue[slot] = 0
+        self.line_cost[slot] = 0
+
+    def _add_line_items(self, slots, rows):
+        quantity = np.array([row.quantity or 0 for row in rows], dtype=np.float64)
+        net = [(row.total_amount_paise or 0) - (row.tax_amount_paise or 0) for row in rows]
+        cost = quantity * [row.cost_price_paise or 0 for row in rows]
+        np.add.at(self.line_counts, slots, 1)
+        np.add.at(self.line_revenue, slots, np.array(net, dtype=np.int64))
+        # Half away from zero, like SQL ROUND
+        np.add.at(self.line_cost, slots, (np.sign(cost) * np.floor(np.abs(cost) + 0.5)).astype(np.int64))
+
+    def _status_mask(self, n, status):
+        codes = self.statuses.codes([status])
+        return self.status[:n] == codes[0] if codes else np.zeros(n, dtype=bool)
+
+    # Queries; each refreshes first and returns plain Python values
+
+    def _group(self, codes, mask, vocabulary):
+        counts = np.bincount(codes[mask], minlength=len(vocabulary.values))
+        amounts = np.bincount(codes[mask], weights=self.total_paise[:self.size][mask],
+                              minlength=len(vocabulary.values))
+        return [
+            {'count': int(counts[code]), 'amount': amounts[code] / PAISE_PER_RUPEE, 'value': value}
+            for code, value in enumerate(vocabulary.values)
+            if counts[code]
+        ]
+
+    def payment_status_distribution(self) -> List[Dict[str, Any]]:
+        """``[{'status', 'count', 'amount'}]`` over all invoices"""
+        self.refresh()
+        with self._lock:
+            groups = self._group(self.status[:self.size], self.valid[:self.size], self.statuses)
+        return [{'status': g['value'], 'count': g['count'], 'amount': g['amount']} for g in groups]
+
+    def payment_timing(self) -> Dict[str, float]:
+        """Average, earliest and latest payment relative to the due date, in days"""
+        self.refresh()
+        with self._lock:
+            n = self.size
+            mask = (self.valid[:n] & self._status_mask(n, 'Paid')
+                    & (self.payment_dates[:n] > 0) & (self.due_dates[:n] > 0))
+            delay = (self.payment_dates[:n][mask] - self.due_dates[:n][mask]).astype(np.float64)
+        if not len(delay):
+            return {'avg_delay_days': 0.0, 'min_delay_days': 0.0, 'max_delay_days': 0.0}
+        return {
+            'avg_delay_days': float(delay.mean()),
+            'min_delay_days': float(delay.min()),
+            'max_delay_days': float(delay.max())
+        }
+
+    def payment_mode_totals(self) -> List[Dict[str, Any]]:
+        """``[{'mode', 'count', 'amount'}]`` over paid invoices with a payment mode"""
+        self.refresh()
+        with self._lock:
+            n = self.size
+            mask = (self.valid[:n] & self._status_mask(n, 'Paid')
+                    & ~np.isin(self.mode[:n], self.payment_modes.codes([None])))
+            groups = self._group(self.mode[:n], mask, self.payment_modes)
+        return [{'mode': g['value'], 'count': g['count'], 'amount': g['amount']} for g in groups]
+
+    def client_totals(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Paid revenue, invoice count, average and last invoice date per client, top ``limit``"""
+        self.refresh()
+        with self._lock:
+            n = self.size
+            mask = self.valid[:n] & self._status_mask(n, 'Paid')
+            clients, index = np.unique(self.client_ids[:n][mask], return_inverse=True)
+            revenue = np.bincount(index, weights=self.total_paise[:n][mask], minlength=len(clients))
+            count = np.bincount(index, minlength=len(clients))
+            last = np.zeros(len(clients), dtype=np.int32)
+            np.maximum.at(last, index, self.invoice_dates[:n][mask])
+        top = np.argsort(-revenue, kind='stable')[:limit]
+        return [
+            {
+                'client_id': int(clients[i]),
+                'total_revenue': revenue[i] / PAISE_PER_RUPEE,
+                'invoice_count': int(count[i]),
+                'avg_invoice_value': revenue[i] / count[i] / PAISE_PER_RUPEE,
+                'last_invoice_date': date.fromordinal(int(last[i])) if last[i] else None
+            }
+            for i in top
+        ]
+
+    def client_profitability(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Line-item revenue and cost of paid invoices per client, top ``limit`` by revenue"""
+        self.refresh()
+        with self._lock:
+            n = self.size
+            mask = self.valid[:n] & self._status_mask(n, 'Paid') & (self.line_counts[:n] > 0)
+            clients, index = np.unique(self.client_ids[:n][mask], return_inverse=True)
+            revenue = np.bincount(index, weights=self.line_revenue[:n][mask], minlength=len(clients))
+            cost = np.bincount(index, weights=self.line_cost[:n][mask], minlength=len(clients))
+        top = np.argsort(-revenue, kind='stable')[:limit]
+        return [
+            {'client_id': int(clients[i]), 'revenue': float(revenue[i]) / PAISE_PER_RUPEE,
+             'cost': float(cost[i]) / PAISE_PER_RUPEE}
+            for i in top
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(super().stats(), statuses=len(self.statuses.values), payment_modes=len(self.payment_modes.values))
+
+
+def initialize_fact_store():
+    """Build the global fact store from the database"""
+    global invoice_fact_store
+    store = InvoiceFactStore(full_reload_threshold=config.INVOICE_ARRAYS_RELOAD_THRESHOLD)
+    store.build()
+    invoice_fact_store = store
+
+
+def active_fact_store() -> Optional[InvoiceFactStore]:
+    """The fact store when the columnar backend is enabled and loaded, else None"""
+    return services.get('invoice_fact_store')
@@ -0,0 +1,16 @@
+"""Gunicorn settings for serving ``wsgi:app``"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+# Build templates, PDF styles, regex tables and the blockchain index once in
+# the master; workers share them copy-on-write. Pooled database connections
+# are dropped in each worker by the fork hook installed in create_app().
+preload_app = True
+
+accesslog = '-'
+errorlog = '-'
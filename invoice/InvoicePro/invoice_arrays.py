@@ -0,0 +1,269 @@
+"""Per-invoice NumPy columns kept in step with the database
+
+Base class for in-memory invoice structures (the similar-invoice index, the
+analytics fact store). A subclass declares its columns and the invoice and
+line-item fields it needs, and fills one slot per invoice; loading, growth
+and incremental refresh live here.
+
+Refresh is lazy: before use, if the data version moved, the store reloads
+the invoices committed through this process (queued by session events),
+rows other processes added or edited (id and ``updated_at`` watermarks) and
+drops deleted ones (row count check). Ids only grow, so the id column stays
+sorted and slots are found with ``searchsorted``; anything that breaks that
+order triggers a full rebuild.
+"""
+import logging
+import threading
+import time
+import weakref
+from itertools import chain
+from typing import Any, Dict, Iterable, Tuple
+
+from sqlalchemy import event, func, or_
+from sqlalchemy.orm import Session
+
+from app import db
+from cache import data_version
+from lazy_imports import lazy_import
+from models import Invoice, InvoiceLineItem
+
+np = lazy_import('numpy')
+
+_LOAD_CHUNK = 500
+_BATCH = 50000
+
+# Live stores, told about invoices committed through this process
+_stores = weakref.WeakSet()
+
+
+class RebuildNeeded(Exception):
+    """An id arrived below the loaded maximum, so the sorted id order cannot be kept"""
+
+
+class InvoiceArrays:
+    """One slot per invoice across a set of NumPy columns
+
+    Subclasses set ``invoice_fields`` and ``line_item_fields`` (model
+    attributes loaded besides the ids) and implement ``_column_specs``,
+    ``_set_invoice`` and, when they read line items, ``_add_line_items``.
+    ``_finish`` runs on the slots touched by each load.
+    """
+
+    label = 'Invoice arrays'
+    invoice_fields: Tuple = ()
+    line_item_fields: Tuple = ()
+
+    def __init__(self, full_reload_threshold: int = 50000):
+        self.full_reload_threshold = full_reload_threshold
+        self._lock = threading.RLock()
+        self._pending = set()
+        self._allocate(0)
+        self.size = 0
+        self.max_id = 0
+        self.watermark = None
+        self.version = None
+        self.build_seconds = None
+        _stores.add(self)
+
+    # Subclass hooks
+
+    def _column_specs(self) -> Dict[str, Tuple[str, Tuple[int, ...]]]:
+        """``{attribute: (dtype, trailing shape)}`` of the subclass's columns"""
+        return {}
+
+    def _set_invoice(self, slot, row):
+        """Fill ``slot`` from an invoice row, resetting anything derived from line items"""
+        raise NotImplementedError
+
+    def _add_line_items(self, slots, rows):
+        """Fold line-item rows into their invoices' slots (slots may repeat)"""
+
+    def _finish(self, slots):
+        """Post-process freshly loaded slots"""
+
+    # Storage
+
+    def _specs(self):
+        specs = {'ids': ('int64', ()), 'valid': ('bool', ())}
+        specs.update(self._column_specs())
+        return specs
+
+    def _allocate(self, capacity):
+        for name, (dtype, shape) in self._specs().items():
+            setattr(self, name, np.zeros((capacity,) + shape, dtype=dtype))
+
+    def _grow(self, needed):
+        capacity = len(self.ids)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 1024)
+        for name in self._specs():
+            old = getattr(self, name)
+            grown = np.zeros((new_capacity,) + old.shape[1:], dtype=old.dtype)
+            grown[:self.size] = old[:self.size]
+            setattr(self, name, grown)
+
+    def _slot_of(self, invoice_ids, include_deleted=False):
+        """Slots of ``invoice_ids`` (-1 where absent)"""
+        invoice_ids = np.asarray(invoice_ids, dtype=np.int64)
+        if not self.size:
+            return np.full(len(invoice_ids), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.ids[:self.size], invoice_ids), self.size - 1)
+        found = self.ids[positions] == invoice_ids
+        if not include_deleted:
+            found &= self.valid[positions]
+        return np.where(found, positions, -1)
+
+    def _set_row(self, slot, row):
+        self.ids[slot] = row.id
+        self.valid[slot] = True
+        self._set_invoice(slot, row)
+        if row.updated_at and (self.watermark is None or row.updated_at > self.watermark):
+            self.watermark = row.updated_at
+
+    def _invoice_query(self):
+        return db.session.query(Invoice.id, Invoice.updated_at, *self.invoice_fields)
+
+    def _line_item_query(self):
+        return db.session.query(InvoiceLineItem.invoice_id, *self.line_item_fields)
+
+    def _fold_line_items(self, rows):
+        if not rows:
+            return
+        slots = self._slot_of([row[0] for row in rows])
+        keep = slots >= 0
+        self._add_line_items(slots[keep], [row for row, kept in zip(rows, keep) if kept])
+
+    # Loading
+
+    def build(self):
+        """Load every invoice from the database"""
+        with self._lock:
+            start = time.perf_counter()
+            version = data_version.current()
+            total = db.session.query(func.count(Invoice.id)).scalar() or 0
+            self._allocate(total)
+            self.size = 0
+            self.watermark = None
+
+            for row in self._invoice_query().order_by(Invoice.id).yield_per(_BATCH):
+                if self.size >= len(self.ids):
+                    self._grow(self.size + 1)
+                self._set_row(self.size, row)
+                self.size += 1
+
+            if self.line_item_fields:
+                batch = []
+                for row in self._line_item_query().order_by(InvoiceLineItem.invoice_id).yield_per(_BATCH):
+                    batch.append(row)
+                    if len(batch) >= _BATCH:
+                        self._fold_line_items(batch)
+                        batch = []
+                self._fold_line_items(batch)
+
+            for offset in range(0, self.size, 100000):
+                self._finish(np.arange(offset, min(offset + 100000, self.size)))
+
+            self.max_id = int(self.ids[self.size - 1]) if self.size else 0
+            self.version = version
+            self._pending.clear()
+            self.build_seconds = time.perf_counter() - start
+            logging.info(f"{self.label} built: {self.size} invoices in {self.build_seconds:.2f}s")
+
+    def mark_changed(self, invoice_ids: Iterable[int]):
+        """Queue invoices for reloading on the next refresh"""
+        with self._lock:
+            self._pending.update(invoice_ids)
+
+    def _load(self, invoice_ids):
+        """Upsert the given invoices from the database; ids no longer present are dropped"""
+        for offset in range(0, len(invoice_ids), _LOAD_CHUNK):
+            chunk = invoice_ids[offset:offset + _LOAD_CHUNK]
+            rows = self._invoice_query().filter(Invoice.id.in_(chunk)).order_by(Invoice.id).all()
+
+            found = {row.id for row in rows}
+            gone = self._slot_of([invoice_id for invoice_id in chunk if invoice_id not in found])
+            self.valid[gone[gone >= 0]] = False
+
+            slots = []
+            for row in rows:
+                slot = int(self._slot_of([row.id], include_deleted=True)[0])
+                if slot < 0:
+                    if row.id <= self.max_id:
+                        raise RebuildNeeded()
+                    self._grow(self.size + 1)
+                    slot = self.size
+                    self.size += 1
+                    self.max_id = row.id
+                self._set_row(slot, row)
+                slots.append(slot)
+
+            if slots:
+                if self.line_item_fields:
+                    self._fold_line_items(self._line_item_query().filter(InvoiceLineItem.invoice_id.in_(found)).all())
+                self._finish(np.asarray(slots))
+
+    def refresh(self):
+        """Apply queued and externally made changes since the last refresh"""
+        with self._lock:
+            version = data_version.current()
+            if version == self.version:
+                return
+            changed = set(self._pending)
+            self._pending.clear()
+
+            since = or_(Invoice.id > self.max_id, Invoice.updated_at >= self.watermark) \
+                if self.watermark is not None else Invoice.id > self.max_id
+            changed.update(invoice_id for invoice_id, in db.session.query(Invoice.id).filter(since))
+
+            if len(changed) > self.full_reload_threshold:
+                self.build()
+                return
+            try:
+                self._load(sorted(changed))
+            except RebuildNeeded:
+                self.build()
+                return
+
+            # Deletions made elsewhere leave no trace but a lower row count
+            total = db.session.query(func.count(Invoice.id)).scalar() or 0
+            if total != int(self.valid[:self.size].sum()):
+                existing = np.fromiter((invoice_id for invoice_id, in db.session.query(Invoice.id)), dtype=np.int64)
+                self.valid[:self.size] &= np.isin(self.ids[:self.size], existing)
+            self.version = version
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'invoices': int(self.valid[:self.size].sum()),
+                'slots': self.size,
+                'memory_mb': round(sum(getattr(self, name).nbytes for name in self._specs()) / 2 ** 20, 1),
+                'build_seconds': self.build_seconds,
+                'pending': len(self._pending)
+            }
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_invoices(session, flush_context):
+    changed = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Invoice):
+            changed.add(obj.id)
+        elif isinstance(obj, InvoiceLineItem):
+            changed.add(obj.invoice_id)
+    changed.discard(None)
+    if changed:
+        session.info.setdefault('invoice_arrays_changed', set()).update(changed)
+
+
+@event.listens_for(Session, 'after_commit')
+def _queue_changed_invoices(session):
+    changed = session.info.pop('invoice_arrays_changed', None)
+    if changed:
+        for store in list(_stores):
+            store.mark_changed(changed)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_changed_invoices(session):
+    session.info.pop('invoice_arrays_changed', None)
@@ -0,0 +1,279 @@
+"""Post-commit pipeline for the side effects of creating an invoice
+
+The payment QR code, the AI risk assessment, the predicted payment date,
+blockchain anchoring and the PDF pre-render used to run inside the
+create-invoice request, holding its write transaction open for seconds of
+GPT calls and proof-of-work. Now the request records a ``pending``
+``invoice_side_effect`` row per stage next to the invoice and commits; once
+that commit succeeds the stages run in order on background threads. Each
+stage is claimed with a conditional UPDATE, runs in a worker app context
+and commits its own result, so ``invoice_detail`` shows progress as it
+happens. A rolled-back invoice never starts its stages.
+
+Stages left behind by a restart, or that failed, are rerun with
+``flask run-invoice-pipeline``.
+"""
+import logging
+import os
+import queue
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from flask import current_app
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from app import db
+from models import Invoice, InvoiceSideEffect
+from service_registry import services
+from utils import generate_payment_qr_code, predict_payment_date
+import config
+
+STAGE_LABELS = {
+    'qr': 'Payment QR code',
+    'ai_risk': 'AI risk assessment',
+    'payment_date': 'Predicted payment date',
+    'blockchain': 'Blockchain anchoring',
+    'pdf': 'PDF pre-render',
+}
+# Run order: the payment date needs the risk assessment, and the PDF shows the blockchain hash
+STAGES = tuple(STAGE_LABELS)
+FINISHED = ('done', 'skipped')
+
+side_effect_table = InvoiceSideEffect.__table__
+
+_PENDING = 'invoice_pipeline_pending'
+_stage_functions: Dict[str, Callable[[Invoice], None]] = {}
+# The blockchain service keeps its pending transactions and chain in memory
+_blockchain_lock = threading.Lock()
+
+
+class StageSkipped(Exception):
+    """Raised by a stage that does not apply, e.g. because its feature is off"""
+
+
+def stage(name: str):
+    def decorator(func):
+        _stage_functions[name] = func
+        return func
+    return decorator
+
+
+@stage('qr')
+def _qr_code(invoice):
+    qr_code = generate_payment_qr_code(invoice)
+    if not qr_code:
+        raise RuntimeError('QR code generation failed')
+    invoice.qr_payment_code = qr_code
+
+
+@stage('ai_risk')
+def _ai_risk(invoice):
+    ai_assistant = services.get('ai_assistant')
+    if not (current_app.config.get("AI_FEATURES_ENABLED") and ai_assistant):
+        raise StageSkipped('AI features are not available')
+    assessment = ai_assistant.analyze_client_history(invoice.client_id)
+    if assessment.get('error'):
+        raise RuntimeError(assessment['error'])
+    invoice.ai_risk_assessment = assessment
+
+
+@stage('payment_date')
+def _payment_date(invoice):
+    if not invoice.ai_risk_assessment:
+        raise StageSkipped('No AI risk assessment to predict from')
+    invoice.predicted_payment_date = predict_payment_date(invoice, invoice.ai_risk_assessment)
+
+
+@stage('blockchain')
+def _blockchain(invoice):
+    blockchain_service = services.get('blockchain_service')
+    if not (current_app.config.get("BLOCKCHAIN_ENABLED") and blockchain_service):
+        raise StageSkipped('Blockchain is not enabled')
+    with _blockchain_lock:
+        if not blockchain_service.add_invoice_to_blockchain(invoice):
+            raise RuntimeError('Blockchain anchoring failed')
+
+
+@stage('pdf')
+def _pdf(invoice):
+    from pdf_generator import generate_invoice_pdf
+
+    path = prerendered_pdf_path(invoice.id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(generate_invoice_pdf(invoice).getvalue())
+    os.replace(tmp_path, path)
+
+
+def prerendered_pdf_path(invoice_id: int) -> str:
+    """Where the invoice's PDF is pre-rendered, under the app root whatever the working directory"""
+    return os.path.join(current_app.root_path, config.INVOICE_PDF_DIR, f"invoice_{invoice_id}.pdf")
+
+
+def prerendered_pdf(invoice) -> Optional[str]:
+    """Path of the invoice's pre-rendered PDF, unless it is missing or older than the invoice"""
+    path = prerendered_pdf_path(invoice.id)
+    try:
+        rendered_at = datetime.utcfromtimestamp(os.path.getmtime(path))
+    except OSError:
+        return None
+    if invoice.updated_at and rendered_at < invoice.updated_at:
+        return None
+    return path
+
+
+def enqueue_side_effects(invoice, stages: Iterable[str] = STAGES):
+    """Mark ``stages`` of ``invoice`` pending; they start once the current transaction commits"""
+    if invoice.id is None:
+        db.session.flush()
+    stages = list(stages)
+    existing = {row.stage: row for row in InvoiceSideEffect.query.filter(
+        InvoiceSideEffect.invoice_id == invoice.id, InvoiceSideEffect.stage.in_(stages))}
+    for name in stages:
+        row = existing.get(name)
+        if row is None:
+            row = InvoiceSideEffect(invoice_id=invoice.id, stage=name, attempts=0)
+            db.session.add(row)
+        row.status = 'pending'
+        row.detail = row.started_at = row.finished_at = None
+    db.session.info.setdefault(_PENDING, set()).add(invoice.id)
+
+
+def _claim(invoice_id: int, name: str, statuses) -> bool:
+    """Move a stage from one of ``statuses`` to running; False if another worker got there first"""
+    claimed = db.session.execute(
+        update(side_effect_table)
+        .where(side_effect_table.c.invoice_id == invoice_id, side_effect_table.c.stage == name,
+               side_effect_table.c.status.in_(statuses))
+        .values(status='running', detail=None, attempts=side_effect_table.c.attempts + 1,
+                started_at=datetime.utcnow(), finished_at=None)
+    ).rowcount == 1
+    db.session.commit()
+    return claimed
+
+
+def run_stages(invoice_id: int, statuses=('pending',)) -> Dict[str, str]:
+    """Run the invoice's stages currently in ``statuses``, in order; returns their new statuses"""
+    results = {}
+    for name in STAGES:
+        if not _claim(invoice_id, name, statuses):
+            continue
+        invoice = db.session.get(Invoice, invoice_id)
+        status, detail = 'done', None
+        try:
+            if invoice is None:
+                raise StageSkipped('Invoice no longer exists')
+            _stage_functions[name](invoice)
+        except StageSkipped as e:
+            status, detail = 'skipped', str(e)
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Invoice {invoice_id} stage {name} failed: {e}")
+            status, detail = 'failed', str(e)
+        row = db.session.get(InvoiceSideEffect, (invoice_id, name))
+        if row is not None:
+            row.status, row.detail, row.finished_at = status, detail, datetime.utcnow()
+        db.session.commit()
+        results[name] = status
+    return results
+
+
+def run_unfinished(statuses=('pending', 'running', 'failed')) -> Dict[int, Dict[str, str]]:
+    """Run every invoice's stages in ``statuses`` in this thread, e.g. after a restart
+
+    Only include ``running`` when no workers are active, or a stage in
+    progress elsewhere may run twice.
+    """
+    invoice_ids = db.session.scalars(
+        select(side_effect_table.c.invoice_id).where(side_effect_table.c.status.in_(statuses))
+        .distinct().order_by(side_effect_table.c.invoice_id)
+    ).all()
+    return {invoice_id: run_stages(invoice_id, statuses) for invoice_id in invoice_ids}
+
+
+def side_effect_status(invoice_id: int) -> List[Dict[str, Any]]:
+    """The invoice's stages in run order, for ``invoice_detail``; empty if it has none"""
+    rows = {row.stage: row for row in InvoiceSideEffect.query.filter_by(invoice_id=invoice_id)}
+    return [
+        {
+            'stage': name,
+            'label': STAGE_LABELS[name],
+            'status': rows[name].status,
+            'detail': rows[name].detail,
+            'attempts': rows[name].attempts,
+            'finished_at': rows[name].finished_at.isoformat() if rows[name].finished_at else None
+        }
+        for name in STAGES if name in rows
+    ]
+
+
+class InvoicePipeline:
+    """Runs committed invoices' stages on daemon worker threads, one invoice at a time each
+
+    The table is the durable record, so exiting does not wait for the queue
+    to drain: whatever is left stays pending (or running) for
+    ``flask run-invoice-pipeline``.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._queue = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._threads_lock = threading.Lock()
+
+    def _start_workers(self):
+        with self._threads_lock:
+            # Threads do not survive a fork, so a forked worker starts its own
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            for i in range(len(self._threads), self.max_workers):
+                thread = threading.Thread(target=self._work, name=f'invoice-pipeline-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            app, invoice_id = self._queue.get()
+            try:
+                self._run(app, invoice_id)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, app, invoice_id: int):
+        # A fresh app context means a fresh scoped session, removed again on exit
+        with app.app_context():
+            try:
+                run_stages(invoice_id)
+            except Exception as e:
+                db.session.rollback()
+                logging.error(f"Invoice {invoice_id} pipeline failed: {e}")
+
+    def submit(self, app, invoice_ids: Iterable[int]):
+        if self.max_workers <= 0:
+            for invoice_id in invoice_ids:
+                self._run(app, invoice_id)
+            return
+        self._start_workers()
+        for invoice_id in invoice_ids:
+            self._queue.put((app, invoice_id))
+
+    def join(self):
+        """Block until every submitted invoice has been processed"""
+        self._queue.join()
+
+
+pipeline = InvoicePipeline(config.INVOICE_PIPELINE_WORKERS)
+
+
+@event.listens_for(Session, 'after_commit')
+def _start_committed(session):
+    invoice_ids = session.info.pop(_PENDING, None)
+    if invoice_ids:
+        pipeline.submit(current_app._get_current_object(), sorted(invoice_ids))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_rolled_back(session):
+    session.info.pop(_PENDING, None)
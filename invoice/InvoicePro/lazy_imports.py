@@ -0,0 +1,67 @@
+import importlib
+import logging
+import sys
+import threading
+import time
+import types
+from typing import Dict
+
+
+# Heavy third-party modules that must not be imported while the app boots
+HEAVY_MODULES = ('pandas', 'reportlab', 'fpdf', 'cv2', 'pytesseract', 'numpy', 'openai', 'PIL', 'qrcode')
+
+_load_times: Dict[str, float] = {}
+_load_lock = threading.Lock()
+
+
+class LazyModule(types.ModuleType):
+    """Module placeholder that imports the real module on first attribute access"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__['_lazy_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_lazy_module']
+        if module is not None:
+            return module
+
+        with _load_lock:
+            module = self.__dict__['_lazy_module']
+            if module is None:
+                already_loaded = self.__name__ in sys.modules
+                start = time.perf_counter()
+                module = importlib.import_module(self.__name__)
+                if not already_loaded:
+                    _load_times[self.__name__] = time.perf_counter() - start
+                    logging.debug(f"Lazy import of {self.__name__} took {_load_times[self.__name__] * 1000:.1f} ms")
+                self.__dict__['_lazy_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_lazy_module'] is not None else 'not loaded'
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Return a placeholder for ``name`` that imports it when first used"""
+    return LazyModule(name)
+
+
+def lazy_load_times() -> Dict[str, float]:
+    """Seconds spent importing each lazily loaded module so far"""
+    return dict(_load_times)
+
+
+def loaded_heavy_modules():
+    """Heavy modules currently present in ``sys.modules``"""
+    return sorted(name for name in HEAVY_MODULES if name in sys.modules)
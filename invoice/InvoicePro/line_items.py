@@ -0,0 +1,159 @@
+"""Line-item engine: validate, price and insert an invoice's lines in bulk
+
+Every path that creates line items (the invoice form, the voice invoice
+builder, imports) goes through ``price_line_items`` and ``save_line_items``.
+Numeric fields are parsed and checked as arrays, every amount comes from
+``money.compute_invoice_totals`` in one vectorized pass, and the rows are
+written with a single executemany insert instead of one ORM object each.
+Bulk inserts skip the ORM's money-column sync, so rows carry both the paise
+and the rupee columns.
+"""
+from typing import Any, Dict, List, Mapping, Sequence
+
+from sqlalchemy import insert
+
+from app import db
+from lazy_imports import lazy_import
+from models import Client, Company, InvoiceLineItem
+from money import compute_invoice_totals, from_paise, to_paise_array
+import config
+
+np = lazy_import('numpy')
+
+MAX_TAX_PERCENTAGE = 100
+
+
+class LineItemError(ValueError):
+    """Line items failed validation; ``errors`` lists ``{'line', 'field', 'message'}``"""
+
+    def __init__(self, errors: List[Dict[str, Any]]):
+        self.errors = errors
+        summary = '; '.join(f"line {error['line']}: {error['message']}" for error in errors[:5])
+        if len(errors) > 5:
+            summary += f" (and {len(errors) - 5} more)"
+        super().__init__(f"Invalid line items: {summary}")
+
+
+def _numbers(values: List[Any], default=None):
+    """A float64 column; missing entries take ``default``, unparseable ones become NaN"""
+    if default is not None:
+        values = [default if value is None or value == '' else value for value in values]
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        # Only a bad batch pays for the per-value parse
+        parsed = np.empty(len(values))
+        for i, value in enumerate(values):
+            try:
+                parsed[i] = float(value)
+            except (TypeError, ValueError):
+                parsed[i] = np.nan
+        return parsed
+
+
+def _report(mask, field: str, message: str, errors: List[Dict[str, Any]]):
+    for index in np.flatnonzero(mask):
+        errors.append({'line': int(index) + 1, 'field': field, 'message': message})
+
+
+def price_line_items(items: Sequence[Mapping[str, Any]], intra_state: bool = True) -> Dict[str, Any]:
+    """Validate line items and compute all their amounts in one pass
+
+    Items are mappings with ``description``, ``quantity`` and ``unit_price``
+    (rupees) and optionally ``tax_percentage`` (default
+    ``config.DEFAULT_TAX_RATE``), ``cost_price``, ``hsn_code``, ``unit`` and
+    ``ai_suggested``. Returns the ``compute_invoice_totals`` result plus the
+    parsed ``items``, ``quantity``, ``tax_rate`` and ``cost_price`` (paise)
+    columns. Raises ``LineItemError`` listing every invalid field.
+    """
+    errors = []
+    items = list(items)
+    not_mappings = np.array([not isinstance(item, Mapping) for item in items], dtype=bool)
+    _report(not_mappings, 'item', 'line item must be an object', errors)
+    items = [item if isinstance(item, Mapping) else {} for item in items]
+
+    descriptions = [str(item.get('description') or '').strip() for item in items]
+    quantity = _numbers([item.get('quantity') for item in items])
+    unit_price = _numbers([item.get('unit_price') for item in items])
+    tax_rate = _numbers([item.get('tax_percentage') for item in items], default=config.DEFAULT_TAX_RATE)
+    cost_price = _numbers([item.get('cost_price') for item in items], default=0)
+
+    _report(~not_mappings & ~np.array([bool(d) for d in descriptions], dtype=bool),
+            'description', 'description is required', errors)
+    _report(~np.isfinite(quantity), 'quantity', 'quantity must be a number', errors)
+    _report(np.isfinite(quantity) & (quantity <= 0), 'quantity', 'quantity must be greater than zero', errors)
+    _report(~np.isfinite(unit_price), 'unit_price', 'unit price must be a number', errors)
+    _report(np.isfinite(unit_price) & (unit_price < 0), 'unit_price', 'unit price cannot be negative', errors)
+    _report(~np.isfinite(tax_rate) | (tax_rate < 0) | (tax_rate > MAX_TAX_PERCENTAGE), 'tax_percentage',
+            f"tax percentage must be between 0 and {MAX_TAX_PERCENTAGE}", errors)
+    _report(~np.isfinite(cost_price) | (cost_price < 0), 'cost_price',
+            'cost price must be a non-negative number', errors)
+    if errors:
+        errors.sort(key=lambda error: error['line'])
+        raise LineItemError(errors)
+
+    priced = compute_invoice_totals(quantity, unit_price, tax_rate, intra_state=intra_state)
+    priced.update({
+        'items': [dict(item, description=description) for item, description in zip(items, descriptions)],
+        'quantity': quantity,
+        'tax_rate': tax_rate,
+        'cost_price': to_paise_array(cost_price)
+    })
+    return priced
+
+
+def line_item_rows(invoice_id: int, priced: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Insert parameters for every priced line of one invoice"""
+    lines = priced['lines']
+    columns = zip(
+        priced['items'], priced['quantity'].tolist(), priced['tax_rate'].tolist(),
+        lines['unit_price'].tolist(), lines['tax'].tolist(), lines['total'].tolist(),
+        priced['cost_price'].tolist()
+    )
+    return [
+        {
+            'invoice_id': invoice_id,
+            'sr_no': sr_no,
+            'hsn_code': item.get('hsn_code') or '',
+            'description': item['description'],
+            'quantity': quantity,
+            'unit': item.get('unit') or 'Nos',
+            'unit_price': from_paise(unit_price),
+            'unit_price_paise': unit_price,
+            'tax_percentage': tax_rate,
+            'tax_amount': from_paise(tax),
+            'tax_amount_paise': tax,
+            'total_amount': from_paise(total),
+            'total_amount_paise': total,
+            'cost_price': from_paise(cost),
+            'cost_price_paise': cost,
+            'ai_suggested': bool(item.get('ai_suggested', False))
+        }
+        for sr_no, (item, quantity, tax_rate, unit_price, tax, total, cost) in enumerate(columns, 1)
+    ]
+
+
+def save_line_items(invoice, priced: Dict[str, Any]) -> int:
+    """Set the invoice totals from ``priced`` and insert its lines with one executemany
+
+    The invoice needs its id, so flush it first. Returns the number of lines.
+    """
+    invoice.subtotal_paise = priced['subtotal']
+    invoice.cgst_paise = priced['cgst']
+    invoice.sgst_paise = priced['sgst']
+    invoice.igst_paise = priced['igst']
+    invoice.total_amount_paise = priced['total']
+
+    rows = line_item_rows(invoice.id, priced)
+    if rows:
+        db.session.execute(insert(InvoiceLineItem), rows)
+    # The lines bypassed the ORM, so reload the collection on next access
+    db.session.expire(invoice, ['line_items'])
+    return len(rows)
+
+
+def is_intra_state(client_id) -> bool:
+    """Whether the client is in the company's state (CGST+SGST rather than IGST)"""
+    client = Client.query.get(client_id) if client_id else None
+    company = Company.query.first()
+    return bool(client and company and client.state == company.state)
@@ -1,9 +1,11 @@
 import os
 import logging
-from app import app
+from app import create_app
 
-# Force debug mode ON during local development
-app.debug = True
+app = create_app()
+
+# Debug mode is opt-in (FLASK_DEBUG=true); production runs through wsgi.py
+app.debug = os.environ.get('FLASK_DEBUG', 'false').lower() in ('1', 'true')
 
 # Configure logging (optional in dev)
 if not app.debug:
@@ -23,5 +25,5 @@ if __name__ == '__main__':
     app.run(
         host=host,
         port=port,
-        debug=app.debug  # Now app.debug is True
+        debug=app.debug
     )
@@ -0,0 +1,302 @@
+import ipaddress
+import os
+import threading
+import time
+import weakref
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, Iterable, List
+
+from flask import Response, abort, current_app, g, has_request_context, request, session
+from sqlalchemy import event
+
+
+# Histogram buckets (seconds) for request latency
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Recent samples kept per series for quantile estimates
+RESERVOIR_SIZE = 2048
+
+
+def _quantile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank quantile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(q * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def _labels(**labels) -> str:
+    parts = []
+    for key, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+class _Series:
+    """Count, sum, histogram buckets and a bounded reservoir for one label set"""
+
+    def __init__(self, buckets: Iterable[float] = ()):
+        self.count = 0
+        self.total = 0.0
+        self.buckets = list(buckets)
+        self.bucket_counts = [0] * len(self.buckets)
+        self.samples = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.samples.append(seconds)
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.bucket_counts[i] += 1
+
+    def quantiles(self) -> Dict[float, float]:
+        ordered = sorted(self.samples)
+        return {q: _quantile(ordered, q) for q in QUANTILES}
+
+
+class RequestMetrics:
+    """In-process request latency and subsystem timing
+
+    Every request is timed by endpoint; time spent inside ``track()`` blocks
+    (SQL statements are tracked through engine events) is attributed to the
+    current request and to the subsystem overall. ``render()`` produces the
+    Prometheus text exposition served at ``/metrics``, so nothing beyond a
+    scraper is needed. The endpoint answers logged-in users and the addresses
+    in ``METRICS_ALLOWED_IPS`` (loopback by default) and nobody else. Each
+    worker process keeps its own numbers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._requests: Dict[str, _Series] = {}
+        self._statuses: Dict[tuple, int] = defaultdict(int)
+        self._subsystems: Dict[str, _Series] = {}
+        self._request_subsystems: Dict[tuple, float] = defaultdict(float)
+        self._started = time.time()
+        self._engines = weakref.WeakSet()
+
+    def init_app(self, app):
+        app.config.setdefault("METRICS_ALLOWED_IPS", os.environ.get("METRICS_ALLOWED_IPS", "127.0.0.1,::1"))
+        app.extensions['request_metrics'] = self
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+        db = app.extensions.get('sqlalchemy')
+        if db is not None:
+            with app.app_context():
+                for engine in db.engines.values():
+                    self.instrument_engine(engine)
+
+    # -- request hooks -----------------------------------------------------
+
+    def _start_request(self):
+        g._metrics_start = time.perf_counter()
+        g._metrics_subsystems = defaultdict(float)
+
+    def _finish_request(self, response):
+        start = g.pop('_metrics_start', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        endpoint = request.endpoint or 'unmatched'
+        subsystems = g.pop('_metrics_subsystems', {})
+
+        with self._lock:
+            series = self._requests.get(endpoint)
+            if series is None:
+                series = self._requests[endpoint] = _Series(LATENCY_BUCKETS)
+            series.observe(elapsed)
+            self._statuses[(endpoint, response.status_code)] += 1
+            for subsystem, seconds in subsystems.items():
+                self._request_subsystems[(endpoint, subsystem)] += seconds
+        return response
+
+    # -- subsystem timing --------------------------------------------------
+
+    def current_collector(self):
+        """The per-request subsystem totals work on this thread is added to, if any"""
+        collector = getattr(self._local, 'collector', None)
+        if collector is None and has_request_context():
+            collector = g.get('_metrics_subsystems')
+        return collector
+
+    @contextmanager
+    def collecting(self, collector):
+        """Add work on this thread to ``collector`` (from ``current_collector()``)
+
+        Lets pool threads serving part of a request charge their time to it.
+        """
+        previous = getattr(self._local, 'collector', None)
+        self._local.collector = collector
+        try:
+            yield
+        finally:
+            self._local.collector = previous
+
+    def record(self, subsystem: str, seconds: float):
+        """Attribute ``seconds`` of work to ``subsystem``"""
+        collector = self.current_collector()
+        with self._lock:
+            series = self._subsystems.get(subsystem)
+            if series is None:
+                series = self._subsystems[subsystem] = _Series()
+            series.observe(seconds)
+            # Several threads may be adding to one request's totals
+            if collector is not None:
+                collector[subsystem] += seconds
+
+    @contextmanager
+    def track(self, subsystem: str):
+        """Time a block of work; nested blocks of the same subsystem count once"""
+        active = getattr(self._local, 'active', None)
+        if active is None:
+            active = self._local.active = set()
+        if subsystem in active:
+            yield
+            return
+
+        active.add(subsystem)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            active.discard(subsystem)
+            self.record(subsystem, time.perf_counter() - start)
+
+    def timed(self, subsystem: str):
+        """Decorator form of ``track()``"""
+        def decorator(f):
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                with self.track(subsystem):
+                    return f(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def instrument_engine(self, engine):
+        """Time every SQL statement executed through ``engine``"""
+        if engine in self._engines:
+            return
+        self._engines.add(engine)
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('_metrics_query_start', []).append(time.perf_counter())
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            starts = conn.info.get('_metrics_query_start')
+            if starts:
+                self.record('sql', time.perf_counter() - starts.pop())
+
+        @event.listens_for(engine, 'handle_error')
+        def _handle_error(exception_context):
+            conn = exception_context.connection
+            starts = conn.info.get('_metrics_query_start') if conn is not None else None
+            if starts:
+                self.record('sql', time.perf_counter() - starts.pop())
+
+    # -- exposition --------------------------------------------------------
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Current per-endpoint and per-subsystem figures as plain dicts"""
+        with self._lock:
+            return {
+                'endpoints': {
+                    endpoint: {
+                        'count': series.count,
+                        'total_seconds': series.total,
+                        'quantiles': series.quantiles(),
+                        'subsystems': {
+                            subsystem: seconds
+                            for (ep, subsystem), seconds in self._request_subsystems.items()
+                            if ep == endpoint
+                        }
+                    }
+                    for endpoint, series in self._requests.items()
+                },
+                'subsystems': {
+                    subsystem: {
+                        'count': series.count,
+                        'total_seconds': series.total,
+                        'quantiles': series.quantiles()
+                    }
+                    for subsystem, series in self._subsystems.items()
+                }
+            }
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            lines.append('# HELP invoicepro_request_duration_seconds Request latency by endpoint')
+            lines.append('# TYPE invoicepro_request_duration_seconds summary')
+            for endpoint, series in sorted(self._requests.items()):
+                for q, value in series.quantiles().items():
+                    lines.append(f'invoicepro_request_duration_seconds{_labels(endpoint=endpoint, quantile=q)} {value:.6f}')
+                lines.append(f'invoicepro_request_duration_seconds_sum{_labels(endpoint=endpoint)} {series.total:.6f}')
+                lines.append(f'invoicepro_request_duration_seconds_count{_labels(endpoint=endpoint)} {series.count}')
+
+            lines.append('# HELP invoicepro_request_latency_seconds Request latency histogram by endpoint')
+            lines.append('# TYPE invoicepro_request_latency_seconds histogram')
+            for endpoint, series in sorted(self._requests.items()):
+                for bound, count in zip(series.buckets, series.bucket_counts):
+                    lines.append(f'invoicepro_request_latency_seconds_bucket{_labels(endpoint=endpoint, le=bound)} {count}')
+                lines.append(f'invoicepro_request_latency_seconds_bucket{_labels(endpoint=endpoint, le="+Inf")} {series.count}')
+                lines.append(f'invoicepro_request_latency_seconds_sum{_labels(endpoint=endpoint)} {series.total:.6f}')
+                lines.append(f'invoicepro_request_latency_seconds_count{_labels(endpoint=endpoint)} {series.count}')
+
+            lines.append('# HELP invoicepro_requests_total Requests by endpoint and status code')
+            lines.append('# TYPE invoicepro_requests_total counter')
+            for (endpoint, status), count in sorted(self._statuses.items()):
+                lines.append(f'invoicepro_requests_total{_labels(endpoint=endpoint, status=status)} {count}')
+
+            lines.append('# HELP invoicepro_request_subsystem_seconds_total Time spent in each subsystem while serving an endpoint')
+            lines.append('# TYPE invoicepro_request_subsystem_seconds_total counter')
+            for (endpoint, subsystem), seconds in sorted(self._request_subsystems.items()):
+                lines.append(f'invoicepro_request_subsystem_seconds_total{_labels(endpoint=endpoint, subsystem=subsystem)} {seconds:.6f}')
+
+            lines.append('# HELP invoicepro_subsystem_duration_seconds Duration of individual subsystem calls')
+            lines.append('# TYPE invoicepro_subsystem_duration_seconds summary')
+            for subsystem, series in sorted(self._subsystems.items()):
+                for q, value in series.quantiles().items():
+                    lines.append(f'invoicepro_subsystem_duration_seconds{_labels(subsystem=subsystem, quantile=q)} {value:.6f}')
+                lines.append(f'invoicepro_subsystem_duration_seconds_sum{_labels(subsystem=subsystem)} {series.total:.6f}')
+                lines.append(f'invoicepro_subsystem_duration_seconds_count{_labels(subsystem=subsystem)} {series.count}')
+
+        lines.append('# HELP invoicepro_process_start_time_seconds Start time of the process since the epoch')
+        lines.append('# TYPE invoicepro_process_start_time_seconds gauge')
+        lines.append(f'invoicepro_process_start_time_seconds {self._started:.3f}')
+        return '\n'.join(lines) + '\n'
+
+    def _allowed(self) -> bool:
+        if 'user_id' in session:
+            return True
+        try:
+            address = ipaddress.ip_address(request.remote_addr or '')
+        except ValueError:
+            return False
+        for allowed in current_app.config["METRICS_ALLOWED_IPS"].split(','):
+            allowed = allowed.strip()
+            if allowed and address in ipaddress.ip_network(allowed, strict=False):
+                return True
+        return False
+
+    def metrics_view(self):
+        if not self._allowed():
+            abort(403)
+        return Response(self.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+# Global request metrics
+metrics = RequestMetrics()
+track = metrics.track
+timed = metrics.timed
@@ -0,0 +1,153 @@
+"""Versioned schema migrations
+
+``db.create_all()`` only creates missing tables, so changes to existing
+tables (new indexes, new columns) are applied here. Each migration runs
+once, in order, inside its own transaction, and its version is recorded in
+the ``schema_version`` table. New databases get the same end state because
+the models declare everything the migrations add and each step skips work
+that is already present.
+"""
+import logging
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+
+def _index_names(conn, table):
+    return {index['name'] for index in inspect(conn).get_indexes(table)}
+
+
+def _create_index(conn, name, table, columns):
+    if name not in _index_names(conn, table):
+        conn.execute(text(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})"))
+
+
+# Indexes matching the filters and sort orders of the dashboard, analytics and list queries
+INVOICE_INDEXES = [
+    ('ix_invoice_invoice_date', 'invoice', ['invoice_date']),
+    ('ix_invoice_due_date', 'invoice', ['due_date']),
+    ('ix_invoice_created_at', 'invoice', ['created_at']),
+    ('ix_invoice_status_date', 'invoice', ['payment_status', 'invoice_date']),
+    ('ix_invoice_client_date', 'invoice', ['client_id', 'invoice_date']),
+    ('ix_invoice_status_due', 'invoice', ['payment_status', 'due_date']),
+    ('ix_invoice_line_item_invoice_id', 'invoice_line_item', ['invoice_id']),
+]
+
+
+def add_invoice_indexes(conn):
+    for name, table, columns in INVOICE_INDEXES:
+        _create_index(conn, name, table, columns)
+
+
+def _add_column(conn, table, name, ddl_type, default=None):
+    existing = {column['name'] for column in inspect(conn).get_columns(table)}
+    if name not in existing:
+        default_sql = f" DEFAULT {default}" if default is not None else ""
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl_type}{default_sql}"))
+
+
+# Float money columns that gain an exact integer-paise counterpart
+PAISE_COLUMNS = {
+    'invoice': ['subtotal', 'cgst', 'sgst', 'igst', 'total_amount', 'amount_paid'],
+    'invoice_line_item': ['unit_price', 'tax_amount', 'total_amount', 'cost_price'],
+}
+
+
+def add_paise_columns(conn):
+    """Add ``<column>_paise`` BIGINT columns and backfill them from the floats"""
+    for table, columns in PAISE_COLUMNS.items():
+        for column in columns:
+            _add_column(conn, table, f"{column}_paise", 'BIGINT', default=0)
+        assignments = ', '.join(
+            f"{column}_paise = CAST(ROUND(COALESCE({column}, 0) * 100) AS BIGINT)" for column in columns
+        )
+        conn.execute(text(f"UPDATE {table} SET {assignments}"))
+
+
+def add_revenue_rollup(conn):
+    """Create and populate ``monthly_revenue_rollup`` (see revenue_rollup.py)"""
+    from models import MonthlyRevenueRollup
+    from revenue_rollup import rebuild_rollup
+
+    MonthlyRevenueRollup.__table__.create(conn, checkfirst=True)
+    # Recomputing a month's collections filters on the payment date
+    _create_index(conn, 'ix_invoice_payment_date', 'invoice', ['payment_date'])
+    rebuild_rollup(conn)
+
+
+def extend_status_due_index(conn):
+    """Widen ``ix_invoice_status_due`` into a covering index for receivables aging"""
+    columns = ['payment_status', 'due_date', 'client_id', 'total_amount_paise', 'amount_paid_paise']
+    existing = {index['name']: index['column_names'] for index in inspect(conn).get_indexes('invoice')}
+    if existing.get('ix_invoice_status_due') != columns:
+        if 'ix_invoice_status_due' in existing:
+            conn.execute(text("DROP INDEX ix_invoice_status_due" + (" ON invoice" if conn.dialect.name == 'mysql' else "")))
+        _create_index(conn, 'ix_invoice_status_due', 'invoice', columns)
+
+
+def add_updated_at_index(conn):
+    """Let the similar-invoice index find recently edited invoices without a table scan"""
+    _create_index(conn, 'ix_invoice_updated_at', 'invoice', ['updated_at'])
+
+
+def add_number_sequences(conn):
+    """Create ``number_sequence`` and start it after numbers already issued (see sequences.py)"""
+    from models import NumberSequence
+    from sequences import seed_sequences
+
+    NumberSequence.__table__.create(conn, checkfirst=True)
+    seed_sequences(conn)
+
+
+def add_invoice_side_effects(conn):
+    """Create ``invoice_side_effect``, the status of post-commit invoice stages"""
+    from models import InvoiceSideEffect
+    InvoiceSideEffect.__table__.create(conn, checkfirst=True)
+
+
+# (version, description, upgrade function taking a connection)
+MIGRATIONS = [
+    (1, 'Indexes for invoice hot paths', add_invoice_indexes),
+    (2, 'Integer paise money columns', add_paise_columns),
+    (3, 'Monthly revenue rollup table', add_revenue_rollup),
+    (4, 'Covering index for receivables aging', extend_status_due_index),
+    (5, 'Index on invoice.updated_at', add_updated_at_index),
+    (6, 'Per-day document number sequences', add_number_sequences),
+    (7, 'Post-commit invoice side effect status', add_invoice_side_effects),
+]
+
+
+def _ensure_version_table(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version INTEGER PRIMARY KEY, "
+        "description VARCHAR(200), "
+        "applied_at TIMESTAMP)"
+    ))
+
+
+def applied_versions(engine):
+    """Versions already recorded in ``schema_version``"""
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        return {row[0] for row in conn.execute(text("SELECT version FROM schema_version"))}
+
+
+def run_migrations(engine):
+    """Apply pending migrations in order and return the versions applied"""
+    done = applied_versions(engine)
+    applied = []
+
+    for version, description, upgrade in MIGRATIONS:
+        if version in done:
+            continue
+        with engine.begin() as conn:
+            upgrade(conn)
+            conn.execute(
+                text("INSERT INTO schema_version (version, description, applied_at) VALUES (:v, :d, :t)"),
+                {'v': version, 'd': description, 't': datetime.utcnow()}
+            )
+        logging.info(f"Applied migration {version}: {description}")
+        applied.append(version)
+
+    return applied
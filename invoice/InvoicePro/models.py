@@ -1,6 +1,9 @@
 from datetime import datetime
-from sqlalchemy import func, JSON
+from itertools import chain
+from sqlalchemy import func, JSON, event, inspect
+from sqlalchemy.orm import Session
 from app import db
+from money import to_paise, from_paise
 
 class Company(db.Model):
     __tablename__ = 'company'
@@ -66,8 +69,8 @@ class Invoice(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     invoice_number = db.Column(db.String(50), unique=True, nullable=False)
     client_id = db.Column(db.Integer, db.ForeignKey('client.id'), nullable=False)
-    invoice_date = db.Column(db.Date, nullable=False, default=datetime.utcnow().date())
-    due_date = db.Column(db.Date)
+    invoice_date = db.Column(db.Date, nullable=False, default=datetime.utcnow().date(), index=True)
+    due_date = db.Column(db.Date, index=True)
     
     # Financial fields
     subtotal = db.Column(db.Float, default=0.0)
@@ -75,12 +78,20 @@ class Invoice(db.Model):
     sgst = db.Column(db.Float, default=0.0)
     igst = db.Column(db.Float, default=0.0)
     total_amount = db.Column(db.Float, default=0.0)
+
+    # Exact amounts in paise; these are what SUM() aggregates read
+    subtotal_paise = db.Column(db.BigInteger, default=0)
+    cgst_paise = db.Column(db.BigInteger, default=0)
+    sgst_paise = db.Column(db.BigInteger, default=0)
+    igst_paise = db.Column(db.BigInteger, default=0)
+    total_amount_paise = db.Column(db.BigInteger, default=0)
     
     # Payment tracking
     payment_status = db.Column(db.String(20), default='Unpaid')
-    payment_date = db.Column(db.Date)
+    payment_date = db.Column(db.Date, index=True)
     payment_mode = db.Column(db.String(50))
     amount_paid = db.Column(db.Float, default=0.0)
+    amount_paid_paise = db.Column(db.BigInteger, default=0)
     
     # Additional fields
     notes = db.Column(db.Text)
@@ -102,15 +113,27 @@ class Invoice(db.Model):
     predicted_payment_date = db.Column(db.Date)  # AI-predicted payment date
     
     # Timestamps
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     line_items = db.relationship('InvoiceLineItem', backref='invoice', lazy=True, cascade='all, delete-orphan')
     ai_interactions = db.relationship('AIInteraction', backref='invoice', lazy=True)
+    side_effects = db.relationship('InvoiceSideEffect', backref='invoice', lazy=True, cascade='all, delete-orphan')
+
+    __money_columns__ = ('subtotal', 'cgst', 'sgst', 'igst', 'total_amount', 'amount_paid')
+
+    # Composite indexes for status/client filters combined with date ranges (see migrations.py)
+    __table_args__ = (
+        db.Index('ix_invoice_status_date', 'payment_status', 'invoice_date'),
+        db.Index('ix_invoice_client_date', 'client_id', 'invoice_date'),
+        # Covers receivables aging (receivables.py) without touching the table
+        db.Index('ix_invoice_status_due', 'payment_status', 'due_date', 'client_id',
+                 'total_amount_paise', 'amount_paid_paise'),
+    )
 
 class InvoiceLineItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    invoice_id = db.Column(db.Integer, db.ForeignKey('invoice.id'), nullable=False)
+    invoice_id = db.Column(db.Integer, db.ForeignKey('invoice.id'), nullable=False, index=True)
     sr_no = db.Column(db.Integer, nullable=False)
     hsn_code = db.Column(db.String(20))
     description = db.Column(db.Text, nullable=False)
@@ -121,6 +144,14 @@ class InvoiceLineItem(db.Model):
     tax_amount = db.Column(db.Float, default=0.0)
     total_amount = db.Column(db.Float, default=0.0)
     cost_price = db.Column(db.Float, default=0.0)
+
+    # Exact amounts in paise
+    unit_price_paise = db.Column(db.BigInteger, default=0)
+    tax_amount_paise = db.Column(db.BigInteger, default=0)
+    total_amount_paise = db.Column(db.BigInteger, default=0)
+    cost_price_paise = db.Column(db.BigInteger, default=0)
+
+    __money_columns__ = ('unit_price', 'tax_amount', 'total_amount', 'cost_price')
     
     # AI-Enhanced Line Item Features
     ai_suggested = db.Column(db.Boolean, default=False)  # AI suggested this item
@@ -311,3 +342,58 @@ class DocumentTemplate(db.Model):
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class MonthlyRevenueRollup(db.Model):
+    """Per-month, per-payment-status invoice totals maintained by revenue_rollup.py
+
+    Revenue, tax, cost and invoice count belong to the month of the invoice
+    date; collected amount and count belong to the month of the payment date.
+    """
+    __tablename__ = 'monthly_revenue_rollup'
+    month = db.Column(db.String(7), primary_key=True)  # 'YYYY-MM'
+    status = db.Column(db.String(20), primary_key=True)
+    revenue_paise = db.Column(db.BigInteger, nullable=False, default=0)
+    tax_paise = db.Column(db.BigInteger, nullable=False, default=0)
+    cost_paise = db.Column(db.BigInteger, nullable=False, default=0)
+    invoice_count = db.Column(db.Integer, nullable=False, default=0)
+    collected_paise = db.Column(db.BigInteger, nullable=False, default=0)
+    collected_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class NumberSequence(db.Model):
+    """Last number issued per document prefix and day (see sequences.py)"""
+    __tablename__ = 'number_sequence'
+    prefix = db.Column(db.String(20), primary_key=True)
+    day = db.Column(db.String(8), primary_key=True)  # 'YYYYMMDD'
+    last_value = db.Column(db.BigInteger, nullable=False, default=0)
+
+class InvoiceSideEffect(db.Model):
+    """Progress of one post-commit stage for an invoice (see invoice_pipeline.py)"""
+    __tablename__ = 'invoice_side_effect'
+    invoice_id = db.Column(db.Integer, db.ForeignKey('invoice.id'), primary_key=True)
+    stage = db.Column(db.String(30), primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, done, skipped, failed
+    detail = db.Column(db.Text)  # why it was skipped or how it failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+
+@event.listens_for(Session, 'before_flush')
+def sync_money_columns(session, flush_context, instances):
+    """Keep each rupee float column and its ``<name>_paise`` column in step
+
+    Code that assigns paise wins; code that still assigns the float column
+    (or leaves both unset) gets the paise value derived from it.
+    """
+    for obj in chain(session.new, session.dirty):
+        names = getattr(type(obj), '__money_columns__', None)
+        if not names:
+            continue
+        state = inspect(obj)
+        for name in names:
+            paise_name = f"{name}_paise"
+            if state.attrs[paise_name].history.has_changes():
+                setattr(obj, name, from_paise(getattr(obj, paise_name)))
+            elif state.attrs[name].history.has_changes() or getattr(obj, paise_name) is None:
+                setattr(obj, paise_name, to_paise(getattr(obj, name)))
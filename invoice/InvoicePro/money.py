@@ -0,0 +1,97 @@
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, Iterable
+
+from sqlalchemy import Float, cast, func
+
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+
+# Amounts are stored as integer paise; quantities and tax rates are scaled to
+# integers as well so line arithmetic never touches binary floating point
+PAISE_PER_RUPEE = 100
+QUANTITY_SCALE = 1000   # quantities to 3 decimals
+RATE_SCALE = 100        # tax percentages to 2 decimals (basis points)
+
+
+def to_paise(amount) -> int:
+    """Rupee amount (float, str, Decimal or None) to integer paise, rounding half up"""
+    if amount is None or amount == '':
+        return 0
+    return int(Decimal(str(amount)).scaleb(2).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_paise(paise) -> float:
+    """Integer paise to a rupee float for display and legacy columns"""
+    return (paise or 0) / PAISE_PER_RUPEE
+
+
+def sum_rupees(column):
+    """SQL ``SUM`` over a paise expression, returned in rupees
+
+    The sum itself is exact integer arithmetic in the database; only the
+    final value is converted. Like ``func.sum`` it is NULL for no rows.
+    """
+    return cast(func.sum(column), Float) / PAISE_PER_RUPEE
+
+
+def _scaled(values: Iterable, scale: int):
+    """Scale decimal inputs to int64, rounding half away from zero"""
+    scaled = np.asarray(list(values), dtype=np.float64) * scale
+    # The small epsilon absorbs binary representation error (2.675 * 100 = 267.4999...)
+    return (np.sign(scaled) * np.floor(np.abs(scaled) + 0.5 + 1e-7)).astype(np.int64)
+
+
+def to_paise_array(amounts: Iterable):
+    """Rupee amounts to an int64 array of paise, rounding half away from zero"""
+    return _scaled(amounts, PAISE_PER_RUPEE)
+
+
+def _divide_half_up(numerator, denominator: int):
+    """Integer division of an int64 array rounding half away from zero"""
+    magnitude = (np.abs(numerator) * 2 + denominator) // (2 * denominator)
+    return np.sign(numerator) * magnitude
+
+
+def compute_line_amounts(quantities: Iterable, unit_prices: Iterable, tax_rates: Iterable) -> Dict[str, object]:
+    """Net, tax and gross amounts for every line in one vectorized pass
+
+    ``unit_prices`` are rupees and ``tax_rates`` percentages. Returns int64
+    paise arrays ``net``, ``tax`` and ``total`` plus the scaled inputs
+    (``unit_price`` in paise, ``quantity_milli``, ``rate_bp``).
+    """
+    quantity_milli = _scaled(quantities, QUANTITY_SCALE)
+    unit_price = _scaled(unit_prices, PAISE_PER_RUPEE)
+    rate_bp = _scaled(tax_rates, RATE_SCALE)
+
+    net = _divide_half_up(quantity_milli * unit_price, QUANTITY_SCALE)
+    tax = _divide_half_up(net * rate_bp, 100 * RATE_SCALE)
+    return {
+        'quantity_milli': quantity_milli,
+        'unit_price': unit_price,
+        'rate_bp': rate_bp,
+        'net': net,
+        'tax': tax,
+        'total': net + tax
+    }
+
+
+def split_gst(total_tax: int, intra_state: bool) -> Dict[str, int]:
+    """CGST/SGST halves for intra-state supply, IGST otherwise (paise)
+
+    An odd paisa goes to CGST so the parts always add up to ``total_tax``.
+    """
+    if intra_state:
+        return {'cgst': total_tax - total_tax // 2, 'sgst': total_tax // 2, 'igst': 0}
+    return {'cgst': 0, 'sgst': 0, 'igst': total_tax}
+
+
+def compute_invoice_totals(quantities: Iterable, unit_prices: Iterable, tax_rates: Iterable,
+                           intra_state: bool = True) -> Dict[str, object]:
+    """Line amounts plus exact invoice subtotal, GST split and total in paise"""
+    lines = compute_line_amounts(quantities, unit_prices, tax_rates)
+    subtotal = int(lines['net'].sum())
+    total_tax = int(lines['tax'].sum())
+    totals = {'lines': lines, 'subtotal': subtotal, 'total_tax': total_tax, 'total': subtotal + total_tax}
+    totals.update(split_gst(total_tax, intra_state))
+    return totals
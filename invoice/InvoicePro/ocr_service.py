@@ -1,14 +1,59 @@
 import os
-import cv2
-import pytesseract
 import json
 import logging
-from PIL import Image
-import numpy as np
 from typing import Dict, Any, List
 import re
 from datetime import datetime
-import openai
+from lazy_imports import lazy_import
+from metrics import track, timed
+
+# OpenCV, Tesseract, NumPy and OpenAI are imported the first time a document is scanned
+cv2 = lazy_import('cv2')
+pytesseract = lazy_import('pytesseract')
+np = lazy_import('numpy')
+openai = lazy_import('openai')
+
+# Regex tables are compiled once at import so preloaded workers share them
+INVOICE_NUMBER_PATTERNS = [re.compile(p) for p in (
+    r'(?i)invoice\s*(?:no|number|#)\s*:?\s*([A-Z0-9\-/]+)',
+    r'(?i)inv\s*(?:no|#)\s*:?\s*([A-Z0-9\-/]+)',
+    r'(?i)bill\s*(?:no|number|#)\s*:?\s*([A-Z0-9\-/]+)',
+    r'(?i)reference\s*(?:no|number|#)\s*:?\s*([A-Z0-9\-/]+)'
+)]
+
+TOTAL_AMOUNT_PATTERNS = [re.compile(p) for p in (
+    r'(?i)total\s*:?\s*(?:rs|₹|inr)?\s*([0-9,]+\.?\d*)',
+    r'(?i)grand\s*total\s*:?\s*(?:rs|₹|inr)?\s*([0-9,]+\.?\d*)',
+    r'(?i)amount\s*(?:due|payable)?\s*:?\s*(?:rs|₹|inr)?\s*([0-9,]+\.?\d*)',
+    r'(?:rs|₹|inr)\s*([0-9,]+\.?\d*)',
+    r'([0-9,]+\.\d{2})'
+)]
+
+CONFIDENCE_PATTERNS = [re.compile(p) for p in (
+    r'(?i)invoice',
+    r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}',
+    r'(?:rs|₹|inr|\$)\s*\d+',
+    r'(?i)total'
+)]
+
+_date_patterns = {}
+
+
+def _get_date_patterns(date_type: str):
+    """Compiled date patterns for a label such as 'invoice' or 'due'"""
+    patterns = _date_patterns.get(date_type)
+    if patterns is None:
+        patterns = [re.compile(p) for p in (
+            r'(?i)' + date_type + r'\s*(?:date)?\s*:?\s*(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
+            r'(?i)' + date_type + r'\s*(?:date)?\s*:?\s*(\d{1,2}\s+\w+\s+\d{2,4})',
+            r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})'
+        )]
+        _date_patterns[date_type] = patterns
+    return patterns
+
+
+for _date_type in ('invoice', 'due'):
+    _get_date_patterns(_date_type)
 
 class OCRDocumentProcessor:
     """Advanced OCR processing for invoices and receipts"""
@@ -45,7 +90,7 @@ class OCRDocumentProcessor:
         except:
             return False
     
-    def preprocess_image(self, image_path: str) -> np.ndarray:
+    def preprocess_image(self, image_path: str) -> "np.ndarray":
         """Preprocess image for better OCR results"""
         try:
             # Load image
@@ -87,6 +132,7 @@ class OCRDocumentProcessor:
             # Return original image if preprocessing fails
             return cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
     
+    @timed('ocr')
     def extract_text_from_image(self, image_path: str) -> str:
         """Extract text from image using OCR"""
         try:
@@ -184,11 +230,12 @@ class OCRDocumentProcessor:
             If any field cannot be extracted, use null or empty string. Be conservative with confidence scores.
             """
             
-            response = openai.chat.completions.create(
-                model="gpt-4o",  # the newest OpenAI model is "gpt-4o" which was released May 13, 2024. do not change this unless explicitly requested by the user
-                messages=[{"role": "user", "content": prompt}],
-                response_format={"type": "json_object"}
-            )
+            with track('openai'):
+                response = openai.chat.completions.create(
+                    model="gpt-4o",  # the newest OpenAI model is "gpt-4o" which was released May 13, 2024. do not change this unless explicitly requested by the user
+                    messages=[{"role": "user", "content": prompt}],
+                    response_format={"type": "json_object"}
+                )
             
             parsed_data = json.loads(response.choices[0].message.content)
             return parsed_data
@@ -226,15 +273,8 @@ class OCRDocumentProcessor:
     
     def _extract_invoice_number(self, text: str) -> str:
         """Extract invoice number using regex patterns"""
-        patterns = [
-            r'(?i)invoice\s*(?:no|number|#)\s*:?\s*([A-Z0-9\-/]+)',
-            r'(?i)inv\s*(?:no|#)\s*:?\s*([A-Z0-9\-/]+)',
-            r'(?i)bill\s*(?:no|number|#)\s*:?\s*([A-Z0-9\-/]+)',
-            r'(?i)reference\s*(?:no|number|#)\s*:?\s*([A-Z0-9\-/]+)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text)
+        for pattern in INVOICE_NUMBER_PATTERNS:
+            match = pattern.search(text)
             if match:
                 return match.group(1).strip()
         
@@ -242,14 +282,8 @@ class OCRDocumentProcessor:
     
     def _extract_date(self, text: str, date_type: str) -> str:
         """Extract dates from text"""
-        patterns = [
-            r'(?i)' + date_type + r'\s*(?:date)?\s*:?\s*(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-            r'(?i)' + date_type + r'\s*(?:date)?\s*:?\s*(\d{1,2}\s+\w+\s+\d{2,4})',
-            r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text)
+        for pattern in _get_date_patterns(date_type):
+            match = pattern.search(text)
             if match:
                 date_str = match.group(1)
                 try:
@@ -279,16 +313,8 @@ class OCRDocumentProcessor:
     
     def _extract_total_amount(self, text: str) -> float:
         """Extract total amount from text"""
-        patterns = [
-            r'(?i)total\s*:?\s*(?:rs|₹|inr)?\s*([0-9,]+\.?\d*)',
-            r'(?i)grand\s*total\s*:?\s*(?:rs|₹|inr)?\s*([0-9,]+\.?\d*)',
-            r'(?i)amount\s*(?:due|payable)?\s*:?\s*(?:rs|₹|inr)?\s*([0-9,]+\.?\d*)',
-            r'(?:rs|₹|inr)\s*([0-9,]+\.?\d*)',
-            r'([0-9,]+\.\d{2})'
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, text)
+        for pattern in TOTAL_AMOUNT_PATTERNS:
+            matches = pattern.findall(text)
             if matches:
                 # Get the largest amount found (likely the total)
                 amounts = []
@@ -310,14 +336,9 @@ class OCRDocumentProcessor:
             score = 0.0
             
             # Check for common invoice elements
-            if re.search(r'(?i)invoice', text):
-                score += 0.2
-            if re.search(r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}', text):
-                score += 0.2
-            if re.search(r'(?:rs|₹|inr|\$)\s*\d+', text):
-                score += 0.2
-            if re.search(r'(?i)total', text):
-                score += 0.2
+            for pattern in CONFIDENCE_PATTERNS:
+                if pattern.search(text):
+                    score += 0.2
             
             # Check text quality
             word_count = len(text.split())
@@ -388,11 +409,12 @@ class ExpenseReceiptProcessor(OCRDocumentProcessor):
             Common expense categories: Office Supplies, Travel, Meals, Fuel, Utilities, Software, Hardware, Professional Services, Marketing, Training
             """
             
-            response = openai.chat.completions.create(
-                model="gpt-4o",  # the newest OpenAI model is "gpt-4o" which was released May 13, 2024. do not change this unless explicitly requested by the user
-                messages=[{"role": "user", "content": prompt}],
-                response_format={"type": "json_object"}
-            )
+            with track('openai'):
+                response = openai.chat.completions.create(
+                    model="gpt-4o",  # the newest OpenAI model is "gpt-4o" which was released May 13, 2024. do not change this unless explicitly requested by the user
+                    messages=[{"role": "user", "content": prompt}],
+                    response_format={"type": "json_object"}
+                )
             
             categorized_data = json.loads(response.choices[0].message.content)
             return categorized_data
@@ -1,6 +1,7 @@
 import io
 import os
 from datetime import datetime
+from functools import lru_cache
 from flask import send_file
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
@@ -14,47 +15,73 @@ import logging
 from utils import number_to_words
 from models import Company
 import config
+from metrics import timed
 
-def generate_invoice_pdf(invoice):
-    """Generate a professional invoice PDF with modern styling"""
-    try:
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=A4,
-            topMargin=0.5 * inch,
-            bottomMargin=0.5 * inch,
-            leftMargin=0.5 * inch,
-            rightMargin=0.5 * inch
-        )
 
-        styles = getSampleStyleSheet()
-        content = []
+@lru_cache(maxsize=None)
+def get_invoice_styles():
+    """Paragraph styles shared by every generated PDF
 
-        # Custom styles
-        title_style = ParagraphStyle(
+    Built once per process (or once in the preloading master) and treated as
+    read-only afterwards.
+    """
+    return {
+        'sample': getSampleStyleSheet(),
+        'title': ParagraphStyle(
             name='InvoiceTitle',
             fontSize=20,
             alignment=TA_CENTER,
             fontName='Helvetica-Bold',
             textColor=colors.HexColor('#2563eb'),
             spaceAfter=20
-        )
-        
-        header_style = ParagraphStyle(
+        ),
+        'header': ParagraphStyle(
             name='Header',
             fontSize=12,
             fontName='Helvetica-Bold',
             textColor=colors.HexColor('#1f2937')
-        )
-        
-        normal_style = ParagraphStyle(
+        ),
+        'normal': ParagraphStyle(
             name='Normal',
             fontSize=10,
             fontName='Helvetica',
             textColor=colors.HexColor('#374151')
+        ),
+        'footer': ParagraphStyle('Footer', fontSize=8, alignment=TA_CENTER,
+                                 textColor=colors.HexColor('#6b7280')),
+        'challan_title': ParagraphStyle(
+            name='ChallanTitle',
+            fontSize=18,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold',
+            textColor=colors.HexColor('#dc2626'),
+            spaceAfter=20
+        ),
+    }
+
+
+@timed('pdf')
+def generate_invoice_pdf(invoice):
+    """Generate a professional invoice PDF with modern styling"""
+    try:
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(
+            buffer,
+            pagesize=A4,
+            topMargin=0.5 * inch,
+            bottomMargin=0.5 * inch,
+            leftMargin=0.5 * inch,
+            rightMargin=0.5 * inch
         )
 
+        pdf_styles = get_invoice_styles()
+        content = []
+
+        # Custom styles
+        title_style = pdf_styles['title']
+        header_style = pdf_styles['header']
+        normal_style = pdf_styles['normal']
+
         # Invoice title
         if invoice.invoice_type == 'Proforma':
             title_text = "PROFORMA INVOICE"
@@ -284,9 +311,7 @@ def generate_invoice_pdf(invoice):
         if invoice.blockchain_hash:
             footer_text += f" | Blockchain Verified: {invoice.blockchain_hash[:16]}..."
         
-        footer_para = Paragraph(footer_text, 
-                               ParagraphStyle('Footer', fontSize=8, alignment=TA_CENTER, 
-                                            textColor=colors.HexColor('#6b7280')))
+        footer_para = Paragraph(footer_text, pdf_styles['footer'])
         content.append(Spacer(1, 20))
         content.append(footer_para)
 
@@ -300,6 +325,7 @@ def generate_invoice_pdf(invoice):
         logging.error(f"PDF generation failed: {e}")
         raise
 
+@timed('pdf')
 def generate_challan_pdf(challan):
     """Generate delivery challan PDF"""
     try:
@@ -313,19 +339,11 @@ def generate_challan_pdf(challan):
             rightMargin=0.5 * inch
         )
 
-        styles = getSampleStyleSheet()
         content = []
 
         # Title
-        title_style = ParagraphStyle(
-            name='ChallanTitle',
-            fontSize=18,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold',
-            textColor=colors.HexColor('#dc2626'),
-            spaceAfter=20
-        )
-        
+        title_style = get_invoice_styles()['challan_title']
+
         content.append(Paragraph("DELIVERY CHALLAN", title_style))
         content.append(Spacer(1, 20))
 
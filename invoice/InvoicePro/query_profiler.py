@@ -0,0 +1,99 @@
+import logging
+import os
+import re
+import time
+from collections import Counter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+
+# A statement shape repeated this many times in one request is reported as a likely N+1
+N_PLUS_ONE_THRESHOLD = 5
+
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PARAM_LIST_RE = re.compile(r'\((?:\s*\?\s*,)+\s*\?\s*\)')
+_WHITESPACE_RE = re.compile(r'\s+')
+_SELECT_LIST_RE = re.compile(r'^SELECT .+? FROM ')
+
+
+def statement_shape(statement: str) -> str:
+    """Normalize a SQL statement so repeated executions compare equal
+
+    Literals become ``?`` and expanded ``IN (?, ?, ...)`` lists collapse to a
+    single placeholder, leaving only the structure of the query.
+    """
+    shape = _LITERAL_RE.sub('?', statement)
+    shape = _PARAM_LIST_RE.sub('(?)', shape)
+    return _WHITESPACE_RE.sub(' ', shape).strip()
+
+
+class QueryProfiler:
+    """Per-request SQL query counter and N+1 detector
+
+    Enabled in debug mode or with ``SQL_PROFILING=true``. Counts statements
+    and database time for each request, groups statements by shape and
+    reports shapes executed ``N_PLUS_ONE_THRESHOLD`` or more times. Results go
+    to ``X-SQL-*`` response headers and one log line per request.
+    """
+
+    def init_app(self, app):
+        app.config.setdefault("SQL_PROFILING", os.environ.get("SQL_PROFILING", "false").lower() == "true")
+        if not (app.config["SQL_PROFILING"] or app.debug):
+            return
+
+        app.extensions['query_profiler'] = self
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+        db = app.extensions.get('sqlalchemy')
+        if db is not None:
+            with app.app_context():
+                for engine in db.engines.values():
+                    self.instrument_engine(engine)
+
+    def instrument_engine(self, engine):
+        @event.listens_for(engine, 'before_cursor_execute')
+        def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if has_request_context() and 'sql_profile' in g:
+                conn.info.setdefault('_profiler_query_start', []).append(time.perf_counter())
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            starts = conn.info.get('_profiler_query_start')
+            if not starts or not has_request_context() or 'sql_profile' not in g:
+                return
+            profile = g.sql_profile
+            profile['count'] += 1
+            profile['seconds'] += time.perf_counter() - starts.pop()
+            profile['shapes'][statement_shape(statement)] += 1
+
+    def _start_request(self):
+        g.sql_profile = {'count': 0, 'seconds': 0.0, 'shapes': Counter()}
+
+    def _finish_request(self, response):
+        profile = g.pop('sql_profile', None)
+        if profile is None:
+            return response
+
+        suspects = [(shape, count) for shape, count in profile['shapes'].most_common()
+                    if count >= N_PLUS_ONE_THRESHOLD]
+        db_ms = profile['seconds'] * 1000
+
+        response.headers['X-SQL-Queries'] = str(profile['count'])
+        response.headers['X-SQL-Time-Ms'] = f"{db_ms:.1f}"
+        response.headers['X-SQL-N-Plus-One'] = str(len(suspects))
+
+        endpoint = request.endpoint or request.path
+        message = f"SQL {endpoint}: {profile['count']} queries, {db_ms:.1f} ms"
+        if suspects:
+            details = '; '.join(f"{count}x {_SELECT_LIST_RE.sub('SELECT ... FROM ', shape)[:160]}"
+                                for shape, count in suspects[:3])
+            logging.warning(f"{message}, likely N+1: {details}")
+        else:
+            logging.info(message)
+        return response
+
+
+# Global query profiler
+query_profiler = QueryProfiler()
@@ -0,0 +1,126 @@
+"""Receivables aging: open balances in exclusive overdue buckets, per client and overall"""
+from datetime import date, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import case, func
+
+from app import db
+from cache import memoize
+from models import Client, Invoice
+from money import PAISE_PER_RUPEE
+import config
+
+OPEN_STATUSES = ('Unpaid', 'Partially Paid')
+
+# (key, label, first day overdue) in order; each bucket runs up to the next one's start
+AGING_BUCKETS = (
+    ('current', 'Current', None),
+    ('1_30', '1-30 days', 1),
+    ('31_60', '31-60 days', 31),
+    ('61_90', '61-90 days', 61),
+    ('90_plus', '90+ days', 91),
+)
+
+
+def aging_bucket(as_of: date):
+    """CASE expression assigning each invoice to exactly one aging bucket
+
+    Compares the raw ``due_date`` with precomputed cut-off dates so the
+    ``ix_invoice_status_due`` index stays usable; it also carries the client
+    and balance columns, so aging never reads the table itself. Invoices
+    without a due date count as current.
+    """
+    whens = [(Invoice.due_date.is_(None), AGING_BUCKETS[0][0]),
+             (Invoice.due_date >= as_of, AGING_BUCKETS[0][0])]
+    for (key, _, _), (_, _, next_start) in zip(AGING_BUCKETS[1:-1], AGING_BUCKETS[2:]):
+        whens.append((Invoice.due_date > as_of - timedelta(days=next_start), key))
+    return case(*whens, else_=AGING_BUCKETS[-1][0])
+
+
+def _empty_buckets():
+    return {key: {'count': 0, 'amount': 0} for key, _, _ in AGING_BUCKETS}
+
+
+def _to_rupees(buckets):
+    return {key: {'count': b['count'], 'amount': b['amount'] / PAISE_PER_RUPEE} for key, b in buckets.items()}
+
+
+@memoize(ttl=config.CACHE_DEFAULT_TIMEOUT, maxsize=32)
+def _aging(as_of: date, top_n: int, client_id: Optional[int]) -> Dict[str, Any]:
+    # Aggregate first, then look up names for the (few) grouped rows
+    grouped = db.session.query(
+        Invoice.client_id.label('client_id'),
+        aging_bucket(as_of).label('bucket'),
+        func.count(Invoice.id).label('count'),
+        func.sum(Invoice.total_amount_paise - Invoice.amount_paid_paise).label('balance')
+    ).filter(
+        Invoice.payment_status.in_(OPEN_STATUSES)
+    ).group_by(Invoice.client_id, 'bucket')
+    if client_id is not None:
+        grouped = grouped.filter(Invoice.client_id == client_id)
+    grouped = grouped.subquery()
+
+    query = db.session.query(
+        grouped.c.client_id, Client.name, grouped.c.bucket, grouped.c.count, grouped.c.balance
+    ).join(Client, Client.id == grouped.c.client_id)
+
+    overall = _empty_buckets()
+    clients = {}
+    for row in query:
+        balance = int(row.balance or 0)
+        entry = clients.setdefault(row.client_id, {
+            'client_id': row.client_id, 'name': row.name, 'count': 0, 'amount': 0,
+            'buckets': _empty_buckets()
+        })
+        for target in (overall[row.bucket], entry['buckets'][row.bucket], entry):
+            target['count'] += row.count
+            target['amount'] += balance
+
+    top_debtors = {}
+    for key, _, _ in AGING_BUCKETS:
+        debtors = sorted(
+            (entry for entry in clients.values() if entry['buckets'][key]['count']),
+            key=lambda entry: entry['buckets'][key]['amount'], reverse=True
+        )[:top_n]
+        top_debtors[key] = [
+            {
+                'client_id': entry['client_id'],
+                'name': entry['name'],
+                'count': entry['buckets'][key]['count'],
+                'amount': entry['buckets'][key]['amount'] / PAISE_PER_RUPEE
+            }
+            for entry in debtors
+        ]
+
+    client_rows = sorted(clients.values(), key=lambda entry: entry['amount'], reverse=True)
+    return {
+        'as_of': as_of.isoformat(),
+        'bucket_labels': {key: label for key, label, _ in AGING_BUCKETS},
+        'buckets': _to_rupees(overall),
+        'total': {
+            'count': sum(b['count'] for b in overall.values()),
+            'amount': sum(b['amount'] for b in overall.values()) / PAISE_PER_RUPEE
+        },
+        'top_debtors': top_debtors,
+        'clients': [
+            {
+                'client_id': entry['client_id'],
+                'name': entry['name'],
+                'count': entry['count'],
+                'amount': entry['amount'] / PAISE_PER_RUPEE,
+                'buckets': _to_rupees(entry['buckets'])
+            }
+            for entry in client_rows
+        ]
+    }
+
+
+def receivables_aging(as_of: Optional[date] = None, top_n: int = 5,
+                      client_id: Optional[int] = None) -> Dict[str, Any]:
+    """Open balances in exclusive aging buckets, overall and per client
+
+    One grouped query over open invoices; the per-bucket top debtors and the
+    overall totals are folded from its rows. Results are cached until the
+    invoice data changes. Amounts are rupees.
+    """
+    return _aging(as_of or date.today(), top_n, client_id)
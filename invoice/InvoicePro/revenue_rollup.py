@@ -0,0 +1,352 @@
+"""Incrementally maintained ``monthly_revenue_rollup`` table
+
+Month-by-month analytics read this table (one row per month and payment
+status) instead of grouping the whole invoice history on every request.
+
+Maintenance is transactional and additive. Before a change to an invoice
+or its line items is flushed, the invoice's current contribution to the
+rollup is read (with the invoice row locked) and subtracted from a
+per-(month, status) delta kept on the session; just before commit the
+contributions of every touched invoice are read again and added back.
+The delta is applied with ``INSERT ... ON CONFLICT DO UPDATE SET
+revenue_paise = revenue_paise + excluded.revenue_paise``, the idiom
+sequences.py uses, so transactions touching the same month add up
+instead of recomputing it from their own snapshots and overwriting each
+other. Changes to columns the rollup does not use (QR codes, hashes, AI
+assessments, notes) never touch it.
+
+Bulk ORM statements whose invoices cannot be worked out cheaply fall back
+to a full rebuild, which is also available as the ``flask rebuild-rollup``
+command.
+"""
+import logging
+from datetime import datetime
+from itertools import chain
+
+from sqlalchemy import case, delete, event, func, insert, inspect, select, text
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app import db
+from models import Invoice, InvoiceLineItem, MonthlyRevenueRollup
+from money import PAISE_PER_RUPEE
+from sql_functions import month_bucket
+
+rollup_table = MonthlyRevenueRollup.__table__
+invoice_table = Invoice.__table__
+line_item_table = InvoiceLineItem.__table__
+
+# Attributes whose changes move rollup figures
+INVOICE_FIELDS = ('invoice_date', 'payment_date', 'payment_status', 'total_amount_paise',
+                  'cgst_paise', 'sgst_paise', 'igst_paise', 'amount_paid_paise')
+LINE_ITEM_FIELDS = ('invoice_id', 'quantity', 'cost_price_paise')
+
+# Summed columns of a rollup row
+FIGURES = ('revenue_paise', 'tax_paise', 'cost_paise', 'invoice_count', 'collected_paise', 'collected_count')
+
+# Past this many invoices in one transaction one grouped scan of everything
+# beats reading each invoice's contribution twice
+MAX_REFRESH_INVOICE_IDS = 500
+
+_DELTA = 'revenue_rollup_delta'
+_INVOICE_IDS = 'revenue_rollup_invoice_ids'
+_REBUILD = 'revenue_rollup_rebuild'
+
+
+def month_key(value):
+    """``'YYYY-MM'`` for a date, datetime or ISO date string (None passes through)"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value[:7]
+    return value.strftime('%Y-%m')
+
+
+def _aggregate(conn, invoice_ids=None):
+    """Rollup rows computed from the invoice tables, for ``invoice_ids`` only unless None"""
+    inv = invoice_table.c
+    status = func.coalesce(inv.payment_status, 'Unpaid').label('status')
+    rows = {}
+
+    def row(month, row_status):
+        return rows.setdefault((month, row_status), dict(dict.fromkeys(FIGURES, 0), month=month, status=row_status))
+
+    billed = select(
+        month_bucket(inv.invoice_date).label('month'), status,
+        func.sum(inv.total_amount_paise),
+        func.sum(func.coalesce(inv.cgst_paise, 0) + func.coalesce(inv.sgst_paise, 0) + func.coalesce(inv.igst_paise, 0)),
+        func.count(inv.id)
+    ).group_by('month', 'status')
+
+    # Rounded per line so the costs of separate invoices add up exactly
+    cost = select(
+        month_bucket(inv.invoice_date).label('month'), status,
+        func.sum(func.round(line_item_table.c.cost_price_paise * line_item_table.c.quantity))
+    ).select_from(line_item_table.join(invoice_table)).group_by('month', 'status')
+
+    # A paid invoice counts in full; a part-paid one for what has come in so far
+    collected = select(
+        month_bucket(inv.payment_date).label('month'), status,
+        func.sum(case((inv.payment_status == 'Paid', inv.total_amount_paise), else_=inv.amount_paid_paise)),
+        func.count(inv.id)
+    ).where(inv.payment_date.isnot(None)).group_by('month', 'status')
+
+    if invoice_ids is not None:
+        billed = billed.where(inv.id.in_(invoice_ids))
+        cost = cost.where(inv.id.in_(invoice_ids))
+        collected = collected.where(inv.id.in_(invoice_ids))
+
+    for month, row_status, revenue, tax, count in conn.execute(billed):
+        target = row(month, row_status)
+        target.update(revenue_paise=int(revenue or 0), tax_paise=int(tax or 0), invoice_count=count)
+    for month, row_status, line_cost in conn.execute(cost):
+        row(month, row_status)['cost_paise'] = int(round(line_cost or 0))
+    for month, row_status, amount, count in conn.execute(collected):
+        target = row(month, row_status)
+        target.update(collected_paise=int(amount or 0), collected_count=count)
+
+    return list(rows.values())
+
+
+def _add_contributions(conn, invoice_ids, sign, delta):
+    """Add ``sign`` times the rollup rows of ``invoice_ids`` into ``delta``"""
+    for row in _aggregate(conn, invoice_ids):
+        target = delta.setdefault((row['month'], row['status']), dict.fromkeys(FIGURES, 0))
+        for name in FIGURES:
+            target[name] += sign * row[name]
+
+
+def apply_delta(conn, delta):
+    """Add a ``{(month, status): {figure: amount}}`` delta to the rollup table
+
+    Every row is an upsert that adds to whatever the row holds when it is
+    written, so concurrent transactions never overwrite each other's
+    figures. Rows left without invoices or collections are dropped.
+    Returns the number of rows changed.
+    """
+    rows = [dict(figures, month=month, status=status)
+            for (month, status), figures in delta.items() if any(figures.values())]
+    if not rows:
+        return 0
+
+    dialect = conn.dialect.name
+    now = datetime.utcnow()
+    if dialect in ('sqlite', 'postgresql'):
+        upsert = (sqlite.insert if dialect == 'sqlite' else postgresql.insert)(rollup_table)
+        added = {name: rollup_table.c[name] + upsert.excluded[name] for name in FIGURES}
+        statement = upsert.on_conflict_do_update(index_elements=['month', 'status'], set_=dict(added, updated_at=now))
+    elif dialect == 'mysql':
+        upsert = mysql.insert(rollup_table)
+        added = {name: rollup_table.c[name] + upsert.inserted[name] for name in FIGURES}
+        statement = upsert.on_duplicate_key_update(dict(added, updated_at=now))
+    else:
+        raise NotImplementedError(f"Rollup deltas are not supported on {dialect}")
+
+    conn.execute(statement, rows)
+    conn.execute(delete(rollup_table).where(
+        rollup_table.c.month.in_({row['month'] for row in rows}),
+        rollup_table.c.invoice_count == 0,
+        rollup_table.c.collected_count == 0
+    ))
+    return len(rows)
+
+
+def rebuild_rollup(conn):
+    """Recompute the whole rollup table; returns the number of rows written"""
+    if conn.dialect.name == 'postgresql':
+        # Concurrent delta upserts wait for the rebuild, and it for them
+        conn.execute(text(f"LOCK TABLE {rollup_table.name} IN SHARE ROW EXCLUSIVE MODE"))
+    rows = _aggregate(conn)
+    conn.execute(delete(rollup_table))
+    if rows:
+        conn.execute(insert(rollup_table), rows)
+    logging.info(f"Monthly revenue rollup rebuilt: {len(rows)} rows")
+    return len(rows)
+
+
+def _changed(obj, fields):
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in fields)
+
+
+def _history_values(obj, name, load=False):
+    attr = inspect(obj).attrs[name]
+    history = attr.load_history() if load else attr.history
+    return chain(history.added, history.unchanged, history.deleted)
+
+
+def _subtract_starting_state(session, conn, invoice_ids):
+    """Subtract the current contribution of invoices this transaction has not touched yet
+
+    The invoice rows are locked first, so no other transaction can change
+    them between this read and our commit. SQLite serializes writers anyway.
+    """
+    info = session.info
+    if info.get(_REBUILD):
+        return
+    seen = info.setdefault(_INVOICE_IDS, set())
+    invoice_ids = set(invoice_ids) - seen
+    invoice_ids.discard(None)
+    if not invoice_ids:
+        return
+    if len(seen) + len(invoice_ids) > MAX_REFRESH_INVOICE_IDS:
+        info[_REBUILD] = True
+        return
+
+    if conn.dialect.name != 'sqlite':
+        conn.execute(
+            select(invoice_table.c.id).where(invoice_table.c.id.in_(invoice_ids))
+            .order_by(invoice_table.c.id).with_for_update()
+        )
+    _add_contributions(conn, invoice_ids, -1, info.setdefault(_DELTA, {}))
+    seen.update(invoice_ids)
+
+
+def _touched_invoice_ids(session, load=False):
+    """Ids of the invoices whose rollup figures the pending changes move
+
+    ``load`` reads expired line item attributes from the database, which is
+    only possible before the flush.
+    """
+    invoice_ids = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Invoice):
+            if obj in session.dirty and not _changed(obj, INVOICE_FIELDS):
+                continue
+            invoice_ids.add(obj.id)
+        elif isinstance(obj, InvoiceLineItem):
+            if obj in session.dirty and not _changed(obj, LINE_ITEM_FIELDS):
+                continue
+            invoice_ids.update(_history_values(obj, 'invoice_id', load))
+            # A new item attached through the relationship has no invoice_id yet
+            parent = obj.__dict__.get('invoice')
+            if parent is not None:
+                invoice_ids.add(parent.id)
+    invoice_ids.discard(None)
+    return invoice_ids
+
+
+@event.listens_for(Session, 'before_flush')
+def _record_starting_state(session, flush_context, instances):
+    if session.info.get(_REBUILD):
+        return
+    invoice_ids = _touched_invoice_ids(session, load=True)
+    if invoice_ids - session.info.get(_INVOICE_IDS, set()):
+        _subtract_starting_state(session, session.connection(), invoice_ids)
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_new_invoices(session, flush_context):
+    info = session.info
+    if info.get(_REBUILD):
+        return
+    seen = info.setdefault(_INVOICE_IDS, set())
+    # New invoices had no contribution to subtract
+    seen.update(obj.id for obj in session.new if isinstance(obj, Invoice))
+    if _touched_invoice_ids(session) - seen:
+        # A change the before_flush pass could not place (e.g. history never loaded)
+        info[_REBUILD] = True
+    elif len(seen) > MAX_REFRESH_INVOICE_IDS:
+        info[_REBUILD] = True
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _record_bulk_statement(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    statement = orm_execute_state.statement
+    table = getattr(statement, 'table', None)
+    if table is None or table.name not in (invoice_table.name, line_item_table.name):
+        return
+
+    session = orm_execute_state.session
+    info = session.info
+    if info.get(_REBUILD):
+        return
+    params = orm_execute_state.parameters
+    if isinstance(params, dict):
+        params = [params]
+
+    if orm_execute_state.is_insert:
+        key = 'id' if table.name == invoice_table.name else 'invoice_id'
+        invoice_ids = {row.get(key) for row in params or ()}
+        if not invoice_ids or None in invoice_ids:
+            # Ids assigned by the database, or values we cannot see
+            info[_REBUILD] = True
+            return
+        if table.name == invoice_table.name:
+            info.setdefault(_INVOICE_IDS, set()).update(invoice_ids)
+            return
+        conn = session.connection(bind_arguments=orm_execute_state.bind_arguments)
+    elif (statement.whereclause is None
+          or (orm_execute_state.is_update and table.name == line_item_table.name)):
+        # Whole-table statements, or line items possibly moving between invoices
+        info[_REBUILD] = True
+        return
+    else:
+        # Read the affected invoices before the statement changes or removes them
+        key = invoice_table.c.id if table.name == invoice_table.name else line_item_table.c.invoice_id
+        conn = session.connection(bind_arguments=orm_execute_state.bind_arguments)
+        invoice_ids = set(conn.scalars(select(key).where(statement.whereclause)))
+
+    _subtract_starting_state(session, conn, invoice_ids)
+
+
+@event.listens_for(Session, 'before_commit')
+def _apply_rollup_delta(session):
+    # Flush first so the last batch of changes is both recorded and visible
+    session.flush()
+
+    rebuild = session.info.pop(_REBUILD, False)
+    delta = session.info.pop(_DELTA, {})
+    invoice_ids = session.info.pop(_INVOICE_IDS, set())
+    if rebuild:
+        rebuild_rollup(session.connection())
+    elif invoice_ids:
+        conn = session.connection()
+        _add_contributions(conn, invoice_ids, 1, delta)
+        apply_delta(conn, delta)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_rollup_delta(session):
+    for key in (_DELTA, _INVOICE_IDS, _REBUILD):
+        session.info.pop(key, None)
+
+
+def _rupees(paise):
+    return float(paise or 0) / PAISE_PER_RUPEE
+
+
+def monthly_rollup(since=None, statuses=('Paid',)):
+    """Rollup figures per month for the given payment statuses, oldest first
+
+    ``since`` (a date or ``'YYYY-MM'``) keeps months from that month on.
+    Amounts are rupees; ``revenue`` includes tax, so net revenue is
+    ``revenue - tax``. A month can have collections but no invoices.
+    """
+    r = rollup_table.c
+    query = select(
+        r.month,
+        func.sum(r.revenue_paise).label('revenue'),
+        func.sum(r.tax_paise).label('tax'),
+        func.sum(r.cost_paise).label('cost'),
+        func.sum(r.invoice_count).label('invoice_count'),
+        func.sum(r.collected_paise).label('collected'),
+        func.sum(r.collected_count).label('collected_count')
+    ).where(r.status.in_(statuses)).group_by(r.month).order_by(r.month)
+    if since is not None:
+        query = query.where(r.month >= month_key(since))
+
+    return [
+        {
+            'month': row.month,
+            'revenue': _rupees(row.revenue),
+            'tax': _rupees(row.tax),
+            'cost': _rupees(row.cost),
+            'invoice_count': int(row.invoice_count or 0),
+            'collected': _rupees(row.collected),
+            'collected_count': int(row.collected_count or 0)
+        }
+        for row in db.session.execute(query)
+    ]
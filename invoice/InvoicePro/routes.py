@@ -2,29 +2,77 @@ import os
 import json
 import logging
 from datetime import datetime
-from flask import render_template, request, redirect, url_for, flash, jsonify, send_file, session, abort, Flask
+from types import SimpleNamespace
+from flask import render_template, request, redirect, url_for, flash, jsonify, send_file, session, abort, Flask, current_app
 from werkzeug.utils import secure_filename
-from sqlalchemy import func, and_, or_, extract, desc
-from sqlalchemy.orm import joinedload
+from sqlalchemy import and_, or_, extract, desc
+from sqlalchemy.orm import joinedload, contains_eager
 
-from app import app, db, mail 
+from app import db, mail 
 from models import *
 from utils import *
-from pdf_generator import generate_invoice_pdf, generate_challan_pdf
-from ai_services import ai_assistant, predictive_analytics, inventory_ai
-from blockchain_service import blockchain_service, smart_contract_manager
-from ocr_service import ocr_processor, receipt_processor
-from voice_service import voice_processor, voice_invoice_builder
+from service_registry import services
 from analytics_engine import AnalyticsEngine
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
+from lazy_imports import lazy_import
+from metrics import timed
+from line_items import LineItemError, is_intra_state, price_line_items, save_line_items
+from invoice_pipeline import enqueue_side_effects, prerendered_pdf, side_effect_status
+from cache import TTLCache, data_version
+from receivables import receivables_aging
+from analytics_graph import compute_analytics_page
+import config
 import io
 import csv
-from flask import Response, request
+from flask import Response
+
+# Heavy modules are imported the first time a PDF/export code path runs
+canvas = lazy_import('reportlab.pdfgen.canvas')
+pagesizes = lazy_import('reportlab.lib.pagesizes')
+pd = lazy_import('pandas')
 
 # Initialize analytics engine
 analytics_engine = AnalyticsEngine(db.session)
 
+# Rendered dashboard data, reused until invoices/clients change or the TTL expires
+dashboard_cache = TTLCache(maxsize=8)
+
+
+class RouteTable:
+    """Collects view functions so ``create_app()`` can attach them to an app
+
+    Unlike a blueprint this keeps the plain endpoint names used throughout the
+    templates (``url_for('dashboard')`` rather than ``url_for('web.dashboard')``).
+    """
+
+    def __init__(self):
+        self._deferred = []
+
+    def route(self, rule, **options):
+        endpoint = options.pop('endpoint', None)
+
+        def decorator(f):
+            self._deferred.append(lambda app: app.add_url_rule(rule, endpoint or f.__name__, f, **options))
+            return f
+        return decorator
+
+    def errorhandler(self, code):
+        def decorator(f):
+            self._deferred.append(lambda app: app.register_error_handler(code, f))
+            return f
+        return decorator
+
+    def context_processor(self, f):
+        self._deferred.append(lambda app: app.context_processor(f))
+        return f
+
+    def init_app(self, app):
+        for register in self._deferred:
+            register(app)
+
+
+web = RouteTable()
+init_app = web.init_app
+
 def login_required(f):
     """Decorator to require login for routes"""
     from functools import wraps
@@ -36,7 +84,7 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-@app.route('/login', methods=['GET', 'POST'])
+@web.route('/login', methods=['GET', 'POST'])
 def login():
     """User login"""
     if request.method == 'POST':
@@ -60,74 +108,99 @@ def login():
     
     return render_template('login.html')
 
-@app.route('/logout')
+@web.route('/logout')
 def logout():
     """User logout"""
     session.clear()
     flash('You have been logged out successfully.', 'success')
     return redirect(url_for('login'))
 
-@app.route('/')
+def _invoice_summary(invoice):
+    """Plain copy of the invoice fields the dashboard lists use, safe to cache"""
+    return SimpleNamespace(
+        id=invoice.id,
+        invoice_number=invoice.invoice_number,
+        ai_generated=invoice.ai_generated,
+        voice_command_created=invoice.voice_command_created,
+        total_amount=invoice.total_amount,
+        payment_status=invoice.payment_status,
+        due_date=invoice.due_date,
+        client=SimpleNamespace(name=invoice.client.name if invoice.client else '')
+    )
+
+
+def build_dashboard_snapshot():
+    """Compute everything the dashboard shows as plain, cacheable values"""
+    # Get basic statistics
+    kpis = get_kpi_summary()
+    
+    # AI-powered insights
+    ai_insights = {}
+    predictive_analytics = services.get('predictive_analytics')
+    if current_app.config.get("AI_FEATURES_ENABLED") and predictive_analytics:
+        try:
+            cash_flow_prediction = predictive_analytics.predict_cash_flow(6)
+            payment_patterns = predictive_analytics.analyze_client_payment_patterns()
+            ai_insights = {
+                'cash_flow': cash_flow_prediction,
+                'payment_patterns': payment_patterns
+            }
+        except Exception as e:
+            logging.error(f"AI insights generation failed: {e}")
+    
+    # Recent activities
+    limit = config.RECENT_ACTIVITIES_LIMIT
+    recent_invoices = Invoice.query.options(joinedload(Invoice.client)) \
+        .order_by(Invoice.created_at.desc()).limit(limit).all()
+    upcoming_payments = Invoice.query.options(joinedload(Invoice.client)).filter(
+        Invoice.due_date >= datetime.now().date(),
+        Invoice.payment_status.in_(['Unpaid', 'Partially Paid'])
+    ).order_by(Invoice.due_date.asc()).limit(limit).all()
+    
+    # Analytics data
+    monthly_revenue = analytics_engine.get_monthly_revenue_trend()
+    client_analytics = analytics_engine.get_client_performance_metrics()
+    
+    # Blockchain statistics
+    blockchain_stats = {}
+    blockchain_service = services.get('blockchain_service')
+    if current_app.config.get("BLOCKCHAIN_ENABLED") and blockchain_service:
+        try:
+            blockchain_stats = blockchain_service.get_blockchain_stats()
+        except Exception as e:
+            logging.error(f"Blockchain stats failed: {e}")
+    
+    return {
+        'total_revenue': kpis['total_revenue'],
+        'outstanding_amount': kpis['outstanding_amount'],
+        'total_invoices': kpis['total_invoices'],
+        'total_clients': kpis['total_clients'],
+        'kpis': kpis,
+        'recent_invoices': [_invoice_summary(invoice) for invoice in recent_invoices],
+        'upcoming_payments': [_invoice_summary(invoice) for invoice in upcoming_payments],
+        'monthly_revenue': monthly_revenue,
+        'client_analytics': client_analytics,
+        'ai_insights': ai_insights,
+        'blockchain_stats': blockchain_stats
+    }
+
+
+@web.route('/')
 @login_required
 def dashboard():
     """AI-powered dashboard with predictive analytics"""
     try:
-        # Get basic statistics
-        total_revenue = db.session.query(func.sum(Invoice.total_amount)).filter(
-            Invoice.payment_status == 'Paid'
-        ).scalar() or 0
-        
-        outstanding_amount = db.session.query(func.sum(Invoice.total_amount - Invoice.amount_paid)).filter(
-            Invoice.payment_status.in_(['Unpaid', 'Partially Paid'])
-        ).scalar() or 0
-        
-        total_invoices = Invoice.query.count()
-        total_clients = Client.query.count()
-        
-        # AI-powered insights
-        ai_insights = {}
-        if app.config.get("AI_FEATURES_ENABLED") and predictive_analytics:
-            try:
-                cash_flow_prediction = predictive_analytics.predict_cash_flow(6)
-                payment_patterns = predictive_analytics.analyze_client_payment_patterns()
-                ai_insights = {
-                    'cash_flow': cash_flow_prediction,
-                    'payment_patterns': payment_patterns
-                }
-            except Exception as e:
-                logging.error(f"AI insights generation failed: {e}")
-        
-        # Recent activities
-        recent_invoices = Invoice.query.order_by(Invoice.created_at.desc()).limit(10).all()
-        upcoming_payments = Invoice.query.filter(
-            Invoice.due_date >= datetime.now().date(),
-            Invoice.payment_status.in_(['Unpaid', 'Partially Paid'])
-        ).order_by(Invoice.due_date.asc()).limit(10).all()
-        
-        # Analytics data
-        monthly_revenue = analytics_engine.get_monthly_revenue_trend()
-        client_analytics = analytics_engine.get_client_performance_metrics()
-        
-        # Blockchain statistics
-        blockchain_stats = {}
-        if app.config.get("BLOCKCHAIN_ENABLED") and blockchain_service:
-            try:
-                blockchain_stats = blockchain_service.get_blockchain_stats()
-            except Exception as e:
-                logging.error(f"Blockchain stats failed: {e}")
+        timeout = current_app.config.get("DASHBOARD_CACHE_TIMEOUT", config.DASHBOARD_CACHE_TIMEOUT)
+        if timeout > 0:
+            # Keyed by date as well, since "upcoming" payments depend on today
+            snapshot = dashboard_cache.get_or_compute(
+                ('dashboard', datetime.now().date()), build_dashboard_snapshot,
+                ttl=timeout, version=data_version.current()
+            )
+        else:
+            snapshot = build_dashboard_snapshot()
         
-        return render_template('dashboard.html',
-                             total_revenue=total_revenue,
-                             outstanding_amount=outstanding_amount,
-                             total_invoices=total_invoices,
-                             total_clients=total_clients,
-                             recent_invoices=recent_invoices,
-                             upcoming_payments=upcoming_payments,
-                             monthly_revenue=monthly_revenue,
-                             client_analytics=client_analytics,
-                             ai_insights=ai_insights,
-                             blockchain_stats=blockchain_stats,
-                             today=datetime.now())
+        return render_template('dashboard.html', today=datetime.now(), **snapshot)
                              
     except Exception as e:
         logging.error(f"Dashboard error: {e}")
@@ -136,22 +209,20 @@ def dashboard():
 
 
 
-@app.route('/invoices')
-@login_required
-def invoice_management():
-    """Advanced invoice management with AI filtering"""
-    page = request.args.get('page', 1, type=int)
-    search = request.args.get('search', '')
-    status_filter = request.args.get('status', '')
-    client_filter = request.args.get('client_id', '')
-    date_from = request.args.get('date_from', '')
-    date_to = request.args.get('date_to', '')
-    
-    # Build query
-    query = Invoice.query.options(joinedload(Invoice.client))
+def filter_invoices(query, args):
+    """Apply the invoice list's search, status, client and date filters
+
+    ``query`` must already be joined to ``Client``. Used by the invoice list
+    page and its JSON feed so both return the same rows.
+    """
+    search = args.get('search', '')
+    status_filter = args.get('status', '')
+    client_filter = args.get('client_id', '')
+    date_from = args.get('date_from', '')
+    date_to = args.get('date_to', '')
     
     if search:
-        query = query.join(Client).filter(
+        query = query.filter(
             or_(
                 Invoice.invoice_number.contains(search),
                 Client.name.contains(search),
@@ -172,6 +243,30 @@ def invoice_management():
     if date_to:
         query = query.filter(Invoice.invoice_date <= datetime.strptime(date_to, '%Y-%m-%d').date())
     
+    return query
+
+
+def invoice_insights_enabled():
+    return bool(current_app.config.get("AI_FEATURES_ENABLED") and services.get('ai_assistant'))
+
+
+@web.route('/invoices')
+@login_required
+def invoice_management():
+    """Advanced invoice management with AI filtering"""
+    page = request.args.get('page', 1, type=int)
+    search = request.args.get('search', '')
+    status_filter = request.args.get('status', '')
+    client_filter = request.args.get('client_id', '')
+    date_from = request.args.get('date_from', '')
+    date_to = request.args.get('date_to', '')
+    
+    # Build query
+    query = filter_invoices(
+        Invoice.query.join(Invoice.client).options(contains_eager(Invoice.client)),
+        request.args
+    )
+    
     # Pagination
     invoices = query.order_by(Invoice.created_at.desc()).paginate(
         page=page, per_page=20, error_out=False
@@ -182,7 +277,7 @@ def invoice_management():
     
     # AI insights for invoices
     ai_invoice_insights = {}
-    if app.config.get("AI_FEATURES_ENABLED") and ai_assistant:
+    if invoice_insights_enabled():
         try:
             # Get payment delay predictions
             ai_invoice_insights = analytics_engine.get_ai_invoice_insights(
@@ -200,7 +295,81 @@ def invoice_management():
                          date_from=date_from,
                          date_to=date_to,
                          ai_insights=ai_invoice_insights)
-@app.route('/create_invoice', methods=['GET', 'POST'])
+
+
+@web.route('/api/invoices')
+@login_required
+def api_invoices():
+    """Invoice list as JSON for infinite scroll, with the same filters as /invoices"""
+    try:
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', config.ITEMS_PER_PAGE, type=int), 1),
+                       config.MAX_ITEMS_PER_PAGE)
+        
+        # One query for the page: invoice, client and insight columns only
+        query = filter_invoices(
+            db.session.query(
+                Invoice.id, Invoice.invoice_number, Invoice.invoice_date, Invoice.due_date,
+                Invoice.total_amount, Invoice.amount_paid, Invoice.payment_status,
+                Invoice.ai_generated, Invoice.voice_command_created,
+                Invoice.predicted_payment_date, Invoice.ai_risk_assessment,
+                Client.id.label('client_id'), Client.name.label('client_name'),
+                Client.email.label('client_email'), Client.phone.label('client_phone'),
+                Client.ai_risk_score
+            ).join(Client, Client.id == Invoice.client_id),
+            request.args
+        )
+        # Fetch one extra row to know whether another page follows, without a COUNT
+        rows = query.order_by(Invoice.created_at.desc(), Invoice.id.desc()) \
+            .offset((page - 1) * per_page).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        
+        with_insights = invoice_insights_enabled()
+        today = datetime.now().date()
+        invoices = []
+        for row in rows:
+            item = {
+                'id': row.id,
+                'invoice_number': row.invoice_number,
+                'invoice_date': row.invoice_date.isoformat() if row.invoice_date else None,
+                'due_date': row.due_date.isoformat() if row.due_date else None,
+                'overdue': bool(row.due_date and row.due_date < today and row.payment_status != 'Paid'),
+                'total_amount': row.total_amount,
+                'amount_paid': row.amount_paid,
+                'payment_status': row.payment_status,
+                'ai_generated': row.ai_generated,
+                'voice_command_created': row.voice_command_created,
+                'client': {
+                    'id': row.client_id,
+                    'name': row.client_name,
+                    'contact': row.client_email or row.client_phone
+                },
+                'urls': {
+                    'detail': url_for('invoice_detail', id=row.id),
+                    'pdf': url_for('invoice_pdf', id=row.id)
+                }
+            }
+            if with_insights:
+                item['ai_insights'] = AnalyticsEngine.build_invoice_insight(
+                    row.ai_risk_score, row.predicted_payment_date, row.ai_risk_assessment
+                )
+            invoices.append(item)
+        
+        return jsonify({
+            'invoices': invoices,
+            'page': page,
+            'per_page': per_page,
+            'has_more': has_more,
+            'next_page': page + 1 if has_more else None
+        })
+        
+    except Exception as e:
+        logging.error(f"Invoice feed failed: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@web.route('/create_invoice', methods=['GET', 'POST'])
 @login_required
 def create_invoice():
     """AI-enhanced invoice creation with voice commands"""
@@ -217,6 +386,11 @@ def create_invoice():
             invoice_date = datetime.strptime(invoice_date_str, '%Y-%m-%d').date() if invoice_date_str else datetime.now().date()
             due_date = datetime.strptime(due_date_str, '%Y-%m-%d').date() if due_date_str else None
 
+            # Validate and price every line up front, before anything is written.
+            # Taxes depend on client location (CGST+SGST within the state, IGST otherwise)
+            line_items_data = json.loads(request.form.get('line_items', '[]'))
+            priced = price_line_items(line_items_data, intra_state=is_intra_state(client_id))
+
             # Generate invoice number
             invoice_number = generate_invoice_number()
 
@@ -235,74 +409,11 @@ def create_invoice():
             db.session.add(invoice)
             db.session.flush()
 
-            # Process line items
-            line_items_data = json.loads(request.form.get('line_items', '[]'))
-            subtotal = 0
-            total_tax = 0
-
-            for i, item_data in enumerate(line_items_data, 1):
-                quantity = float(item_data['quantity'])
-                unit_price = float(item_data['unit_price'])
-                tax_percentage = float(item_data.get('tax_percentage', 18.0))
-
-                line_total = quantity * unit_price
-                tax_amount = (line_total * tax_percentage) / 100
-
-                line_item = InvoiceLineItem(
-                    invoice_id=invoice.id,
-                    sr_no=i,
-                    hsn_code=item_data.get('hsn_code', ''),
-                    description=item_data['description'],
-                    quantity=quantity,
-                    unit=item_data.get('unit', 'Nos'),
-                    unit_price=unit_price,
-                    tax_percentage=tax_percentage,
-                    tax_amount=tax_amount,
-                    total_amount=line_total + tax_amount,
-                    cost_price=float(item_data.get('cost_price', 0)),
-                    ai_suggested=item_data.get('ai_suggested', False)
-                )
-
-                db.session.add(line_item)
-                subtotal += line_total
-                total_tax += tax_amount
+            # Invoice totals plus all lines in one executemany
+            save_line_items(invoice, priced)
 
-            # Calculate taxes based on client location
-            client = Client.query.get(client_id)
-            company = Company.query.first()
-
-            if client and company and client.state == company.state:
-                invoice.cgst = total_tax / 2
-                invoice.sgst = total_tax / 2
-                invoice.igst = 0
-            else:
-                invoice.igst = total_tax
-                invoice.cgst = 0
-                invoice.sgst = 0
-
-            invoice.subtotal = subtotal
-            invoice.total_amount = subtotal + total_tax
-
-            # Generate QR code
-            invoice.qr_payment_code = generate_payment_qr_code(invoice)
-
-            # AI risk assessment
-            if app.config.get("AI_FEATURES_ENABLED") and ai_assistant:
-                try:
-                    risk_assessment = ai_assistant.analyze_client_history(client_id)
-                    invoice.ai_risk_assessment = risk_assessment
-                    invoice.predicted_payment_date = predict_payment_date(invoice, risk_assessment)
-                except Exception as e:
-                    logging.error(f"AI risk assessment failed: {e}")
-
-            # Blockchain
-            if app.config.get("BLOCKCHAIN_ENABLED") and blockchain_service:
-                try:
-                    blockchain_hash = blockchain_service.add_invoice_to_blockchain(invoice)
-                    if blockchain_hash:
-                        logging.info(f"Invoice {invoice_number} added to blockchain")
-                except Exception as e:
-                    logging.error(f"Blockchain addition failed: {e}")
+            # QR code, AI risk, payment date, blockchain and PDF run after the commit
+            enqueue_side_effects(invoice)
 
             db.session.commit()
 
@@ -315,6 +426,12 @@ def create_invoice():
             flash('AI-powered invoice created successfully!', 'success')
             return redirect(invoice_url)
 
+        except LineItemError as e:
+            db.session.rollback()
+            if request.headers.get("X-Requested-With") == "XMLHttpRequest":
+                return jsonify(success=False, error=str(e), line_errors=e.errors)
+            flash(str(e), 'error')
+
         except Exception as e:
             db.session.rollback()
             logging.error(f"Invoice creation failed: {e}")
@@ -326,8 +443,9 @@ def create_invoice():
     clients = Client.query.order_by(Client.name).all()
     ai_suggestions = {}
     client_id = request.args.get('client_id')
+    ai_assistant = services.get('ai_assistant')
 
-    if client_id and app.config.get("AI_FEATURES_ENABLED") and ai_assistant:
+    if client_id and current_app.config.get("AI_FEATURES_ENABLED") and ai_assistant:
         try:
             ai_suggestions = ai_assistant.suggest_invoice_items(int(client_id))
         except Exception as e:
@@ -338,7 +456,7 @@ def create_invoice():
                            today=datetime.now())
 
 
-@app.route('/invoice/<int:id>')
+@web.route('/invoice/<int:id>')
 @login_required
 def invoice_detail(id):
     """Detailed invoice view with blockchain verification"""
@@ -346,19 +464,32 @@ def invoice_detail(id):
     
     # Blockchain verification
     blockchain_verification = {}
-    if app.config.get("BLOCKCHAIN_ENABLED") and blockchain_service and invoice.blockchain_hash:
+    blockchain_service = services.get('blockchain_service')
+    if current_app.config.get("BLOCKCHAIN_ENABLED") and blockchain_service and invoice.blockchain_hash:
         try:
             blockchain_verification = blockchain_service.verify_invoice_integrity(id)
         except Exception as e:
             logging.error(f"Blockchain verification failed: {e}")
     
+    side_effects = side_effect_status(id)
+    ai_stage = next((stage for stage in side_effects if stage['stage'] == 'ai_risk'), None)
+
     # AI insights for this invoice
     ai_insights = {}
-    if app.config.get("AI_FEATURES_ENABLED") and ai_assistant:
+    ai_assistant = services.get('ai_assistant')
+    if current_app.config.get("AI_FEATURES_ENABLED") and ai_assistant:
         try:
-            client_analysis = ai_assistant.analyze_client_history(invoice.client_id)
+            if invoice.ai_risk_assessment:
+                payment_prediction = invoice.ai_risk_assessment.get('risk_assessment', {})
+            elif ai_stage is None:
+                # Created before the pipeline existed, so nothing will fill it in; ask now
+                client_analysis = ai_assistant.analyze_client_history(invoice.client_id)
+                payment_prediction = client_analysis.get('risk_assessment', {})
+            else:
+                # Never call the model from the page: show the stage (pending, failed...) instead
+                payment_prediction = {'status': ai_stage['status'], 'detail': ai_stage['detail']}
             ai_insights = {
-                'payment_prediction': client_analysis.get('risk_assessment', {}),
+                'payment_prediction': payment_prediction,
                 'similar_invoices': analytics_engine.find_similar_invoices(id)
             }
         except Exception as e:
@@ -367,15 +498,28 @@ def invoice_detail(id):
     return render_template('invoice_detail.html',
                          invoice=invoice,
                          blockchain_verification=blockchain_verification,
-                         ai_insights=ai_insights)
+                         ai_insights=ai_insights,
+                         side_effects=side_effects)
 
-@app.route('/invoice/<int:id>/pdf')
+@web.route('/api/invoice/<int:id>/side_effects')
+@login_required
+def invoice_side_effects(id):
+    """Status of the invoice's post-commit stages, polled by invoice_detail"""
+    Invoice.query.get_or_404(id)
+    stages = side_effect_status(id)
+    return jsonify(stages=stages, finished=all(stage['status'] not in ('pending', 'running') for stage in stages))
+
+@web.route('/invoice/<int:id>/pdf')
 @login_required
 def invoice_pdf(id):
     """Generate PDF for invoice"""
+    from pdf_generator import generate_invoice_pdf
+
     invoice = Invoice.query.get_or_404(id)
     try:
-        pdf_buffer = generate_invoice_pdf(invoice)
+        # Rendered by the invoice pipeline unless the invoice changed since;
+        # both paths use the same ReportLab layout
+        pdf_buffer = prerendered_pdf(invoice) or generate_invoice_pdf(invoice)
         return send_file(pdf_buffer,
                         as_attachment=True,
                         download_name=f'Invoice_{invoice.invoice_number}.pdf',
@@ -385,7 +529,7 @@ def invoice_pdf(id):
         flash('Error generating PDF', 'error')
         return redirect(url_for('invoice_detail', id=id))
     
-@app.route('/invoice/<int:id>/delete', methods=['POST'])
+@web.route('/invoice/<int:id>/delete', methods=['POST'])
 @login_required
 def delete_invoice(id):
     invoice = Invoice.query.get_or_404(id)
@@ -394,17 +538,19 @@ def delete_invoice(id):
     flash('Invoice deleted successfully.', 'success')
     return redirect(url_for('invoice_management'))
 
-@app.route('/invoices/bulk_delete', methods=['POST'])
+@web.route('/invoices/bulk_delete', methods=['POST'])
 @login_required
 def bulk_delete_invoices():
     data = request.get_json()
     ids = data.get('invoice_ids', [])
     if ids:
+        # A bulk delete skips ORM cascades, so remove pipeline status rows first
+        InvoiceSideEffect.query.filter(InvoiceSideEffect.invoice_id.in_(ids)).delete(synchronize_session=False)
         Invoice.query.filter(Invoice.id.in_(ids)).delete(synchronize_session=False)
         db.session.commit()
     return jsonify({'success': True})
 
-@app.route('/invoices/<int:id>', methods=['DELETE'])
+@web.route('/invoices/<int:id>', methods=['DELETE'])
 @login_required
 def delete_invoice1(id):
     invoice = Invoice.query.get_or_404(id)
@@ -421,7 +567,7 @@ def delete_invoice1(id):
 
 
 
-@app.route('/invoice/<int:id>/edit', methods=['GET', 'POST'])
+@web.route('/invoice/<int:id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit_invoice(id):
     invoice = Invoice.query.get_or_404(id)
@@ -438,6 +584,9 @@ def edit_invoice(id):
 
         # You can update other invoice fields here as needed
 
+        # Re-render the PDF once the edit is committed
+        enqueue_side_effects(invoice, ['pdf'])
+
         db.session.commit()
         flash('Invoice updated successfully!', 'success')
         
@@ -456,7 +605,7 @@ def edit_invoice(id):
 
 
 
-@app.route('/invoice/<int:id>/duplicate', methods=['POST'])
+@web.route('/invoice/<int:id>/duplicate', methods=['POST'])
 @login_required
 def duplicate_invoice(id):
     invoice = Invoice.query.get_or_404(id)
@@ -483,25 +632,7 @@ def duplicate_invoice(id):
 
 
 
-from fpdf import FPDF
-
-def generate_invoice_pdf(invoice):
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", 'B', 16)
-    pdf.cell(0, 10, f"Invoice #{invoice.invoice_number}", ln=True)
-
-    pdf.set_font("Arial", '', 12)
-    pdf.cell(0, 10, f"Client: {invoice.client.name}", ln=True)
-    pdf.cell(0, 10, f"Amount: ₹{invoice.total_amount}", ln=True)
-    pdf.multi_cell(0, 10, f"Notes:\n{invoice.notes}\n\nTerms & Conditions:\n{invoice.terms_conditions}")
-
-    pdf_file = f"Invoice_{invoice.invoice_number}.pdf"
-    pdf.output(pdf_file)
-    return pdf_file
-
-
-@app.route('/invoice/<int:id>/send', methods=['POST'])
+@web.route('/invoice/<int:id>/send', methods=['POST'])
 @login_required
 def send_invoice(id):
     invoice = Invoice.query.get_or_404(id)
@@ -520,7 +651,7 @@ def send_invoice(id):
 
 
 
-@app.route('/bulk_export', methods=['POST'])
+@web.route('/bulk_export', methods=['POST'])
 @login_required
 def bulk_export():
     data = request.get_json()
@@ -547,7 +678,7 @@ def bulk_export():
 
 
 
-@app.route('/clients')
+@web.route('/clients')
 @login_required
 def client_management():
     """Advanced client management with AI insights"""
@@ -581,7 +712,8 @@ def client_management():
 
     # AI insights for clients
     client_insights = {}
-    if app.config.get("AI_FEATURES_ENABLED") and ai_assistant:
+    ai_assistant = services.get('ai_assistant')
+    if current_app.config.get("AI_FEATURES_ENABLED") and ai_assistant:
         try:
             for client in client_list:
                 if client.ai_risk_score > 0:
@@ -602,7 +734,7 @@ def client_management():
         client_insights=client_insights
     )
 
-@app.route('/create_client', methods=['GET', 'POST'])
+@web.route('/create_client', methods=['GET', 'POST'])
 @login_required
 def create_client():
     """Create new client with AI enhancements"""
@@ -644,7 +776,7 @@ def create_client():
     
     return render_template('create_client.html')
 
-@app.route('/api/export/clients/excel')
+@web.route('/api/export/clients/excel')
 @login_required
 def export_clients_excel():
     clients = Client.query.order_by(Client.name).all()
@@ -676,14 +808,15 @@ def export_clients_excel():
         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     )
 
-@app.route('/api/export/clients/pdf')
+@web.route('/api/export/clients/pdf')
 @login_required
+@timed('pdf')
 def export_clients_pdf():
     clients = Client.query.order_by(Client.name).all()
 
     output = io.BytesIO()
-    p = canvas.Canvas(output, pagesize=letter)
-    width, height = letter
+    p = canvas.Canvas(output, pagesize=pagesizes.letter)
+    width, height = pagesizes.letter
 
     y = height - 50
     p.setFont("Helvetica-Bold", 14)
@@ -710,7 +843,7 @@ def export_clients_pdf():
         mimetype='application/pdf'
     )
 
-@app.route('/analytics')
+@web.route('/analytics')
 @login_required
 def analytics():
     """Advanced analytics dashboard with AI insights"""
@@ -718,32 +851,8 @@ def analytics():
         # Time range for analytics
         time_range = request.args.get('range', '12m')  # 12 months default
         
-        # Generate comprehensive analytics
-        analytics_data = {
-            'revenue_trends': analytics_engine.get_revenue_trends(time_range),
-            'client_performance': analytics_engine.get_client_performance_metrics(),
-            'payment_analytics': analytics_engine.get_payment_analytics(),
-            'profitability_analysis': analytics_engine.get_profitability_analysis(),
-            'ai_predictions': {},
-            'blockchain_insights': {}
-        }
-        
-        # AI-powered predictions
-        if app.config.get("AI_FEATURES_ENABLED") and predictive_analytics:
-            try:
-                analytics_data['ai_predictions'] = {
-                    'cash_flow': predictive_analytics.predict_cash_flow(6),
-                    'payment_patterns': predictive_analytics.analyze_client_payment_patterns()
-                }
-            except Exception as e:
-                logging.error(f"AI predictions failed: {e}")
-        
-        # Blockchain analytics
-        if app.config.get("BLOCKCHAIN_ENABLED") and blockchain_service:
-            try:
-                analytics_data['blockchain_insights'] = blockchain_service.get_blockchain_stats()
-            except Exception as e:
-                logging.error(f"Blockchain analytics failed: {e}")
+        # Independent sections run concurrently; shared intermediates are computed once
+        analytics_data = compute_analytics_page(time_range)
         print("Client Performance Data:", analytics_data['client_performance'])
         print("Full Analytics Data:", analytics_data)
 
@@ -761,13 +870,13 @@ def analytics():
         'ai_predictions': {},
         'blockchain_insights': {}}, error=str(e))
 
-@app.route('/ai_assistant')
+@web.route('/ai_assistant')
 @login_required
 def ai_assistant_page():
     """AI Assistant interface"""
     return render_template('ai_assistant.html')
 
-@app.route('/settings')
+@web.route('/settings')
 @login_required
 def settings():
     """Application settings with AI and blockchain configuration"""
@@ -779,37 +888,33 @@ def settings():
         'company': company,
         'user': user,
         'business_settings': {setting.key: setting.value for setting in business_settings},
-        'ai_enabled': app.config.get("AI_FEATURES_ENABLED", False),
-        'blockchain_enabled': app.config.get("BLOCKCHAIN_ENABLED", False)
+        'ai_enabled': current_app.config.get("AI_FEATURES_ENABLED", False),
+        'blockchain_enabled': current_app.config.get("BLOCKCHAIN_ENABLED", False)
     }
     
     return render_template('settings.html', settings_data=settings_data)
 
-@app.route("/create-challan")
+@web.route("/create-challan")
 @login_required
 def create_challan():
     return render_template("create_challan.html")
 
-@app.route("/delivery-challan")
+@web.route("/delivery-challan")
 @login_required
 def delivery_challan():
     return render_template("delivery_challan.html")
-@app.route('/crm')
+@web.route('/crm')
 @login_required
 def crm():
     lead_stats = analytics_engine.get_lead_stats()  
     return render_template('crm.html', title='CRM', lead_stats=lead_stats)
-@app.route('/create-reminder')
+@web.route('/create-reminder')
 @login_required
 def create_reminder():
     return render_template('create_reminder.html', title='Create Reminder')
 
 
-from flask import send_file, request
-import io
-import pandas as pd
-
-@app.route("/api/export/excel")
+@web.route("/api/export/excel")
 def export_excel():
     # Example: create a DataFrame (replace with your actual query)
     data = [
@@ -834,7 +939,8 @@ def export_excel():
 
 
 
-@app.route("/api/export/pdf")
+@web.route("/api/export/pdf")
+@timed('pdf')
 def export_pdf():
     from io import BytesIO
     buffer = BytesIO()
@@ -861,11 +967,12 @@ def export_pdf():
 
 # API Routes for AJAX and Advanced Features
 
-@app.route('/api/voice_command', methods=['POST'])
+@web.route('/api/voice_command', methods=['POST'])
 @login_required
 def api_voice_command():
     """Process voice commands"""
-    if not app.config.get("AI_FEATURES_ENABLED") or not voice_processor:
+    voice_processor = services.get('voice_processor')
+    if not current_app.config.get("AI_FEATURES_ENABLED") or not voice_processor:
         return jsonify({'error': 'Voice commands not available'})
     
     try:
@@ -883,11 +990,12 @@ def api_voice_command():
         logging.error(f"Voice command API failed: {e}")
         return jsonify({'error': str(e)})
 
-@app.route('/api/ai_suggestions/<int:client_id>')
+@web.route('/api/ai_suggestions/<int:client_id>')
 @login_required
 def api_ai_suggestions(client_id):
     """Get AI suggestions for invoice items"""
-    if not app.config.get("AI_FEATURES_ENABLED") or not ai_assistant:
+    ai_assistant = services.get('ai_assistant')
+    if not current_app.config.get("AI_FEATURES_ENABLED") or not ai_assistant:
         return jsonify({'error': 'AI features not available'})
     
     try:
@@ -899,11 +1007,12 @@ def api_ai_suggestions(client_id):
         logging.error(f"AI suggestions API failed: {e}")
         return jsonify({'error': str(e)})
 
-@app.route('/api/document_scan', methods=['POST'])
+@web.route('/api/document_scan', methods=['POST'])
 @login_required
 def api_document_scan():
     """OCR document scanning API"""
-    if not app.config.get("AI_FEATURES_ENABLED") or not ocr_processor:
+    ocr_processor = services.get('ocr_processor')
+    if not current_app.config.get("AI_FEATURES_ENABLED") or not ocr_processor:
         return jsonify({'error': 'OCR features not available'})
     
     try:
@@ -916,7 +1025,7 @@ def api_document_scan():
         
         # Save uploaded file
         filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
         file.save(filepath)
         
         
@@ -924,7 +1033,7 @@ def api_document_scan():
         scan_type = request.form.get('type', 'invoice')
         
         if scan_type == 'receipt':
-            result = receipt_processor.extract_receipt_data(filepath)
+            result = services.get('receipt_processor').extract_receipt_data(filepath)
         else:
             result = ocr_processor.extract_invoice_data(filepath)
         
@@ -937,11 +1046,12 @@ def api_document_scan():
         logging.error(f"Document scan API failed: {e}")
         return jsonify({'error': str(e)})
 
-@app.route('/api/blockchain_verify/<int:invoice_id>')
+@web.route('/api/blockchain_verify/<int:invoice_id>')
 @login_required
 def api_blockchain_verify(invoice_id):
     """Blockchain verification API"""
-    if not app.config.get("BLOCKCHAIN_ENABLED") or not blockchain_service:
+    blockchain_service = services.get('blockchain_service')
+    if not current_app.config.get("BLOCKCHAIN_ENABLED") or not blockchain_service:
         return jsonify({'error': 'Blockchain features not available'})
     
     try:
@@ -952,11 +1062,12 @@ def api_blockchain_verify(invoice_id):
         logging.error(f"Blockchain verification API failed: {e}")
         return jsonify({'error': str(e)})
 
-@app.route('/api/inventory_forecast/<int:item_id>')
+@web.route('/api/inventory_forecast/<int:item_id>')
 @login_required
 def api_inventory_forecast(item_id):
     """Inventory demand forecasting API"""
-    if not app.config.get("AI_FEATURES_ENABLED") or not inventory_ai:
+    inventory_ai = services.get('inventory_ai')
+    if not current_app.config.get("AI_FEATURES_ENABLED") or not inventory_ai:
         return jsonify({'error': 'AI inventory features not available'})
     
     try:
@@ -968,7 +1079,7 @@ def api_inventory_forecast(item_id):
         logging.error(f"Inventory forecast API failed: {e}")
         return jsonify({'error': str(e)})
 
-@app.route('/api/analytics_data')
+@web.route('/api/analytics_data')
 @login_required
 def api_analytics_data():
     """Real-time analytics data API"""
@@ -982,6 +1093,10 @@ def api_analytics_data():
             data = analytics_engine.get_client_performance_metrics()
         elif data_type == 'payments':
             data = analytics_engine.get_payment_analytics()
+        elif data_type == 'kpis':
+            data = get_kpi_summary()
+        elif data_type == 'cache':
+            data = analytics_engine.cache_stats()
         else:
             data = {'error': 'Invalid data type'}
         
@@ -993,25 +1108,57 @@ def api_analytics_data():
 
 
 
+@web.route('/api/receivables/aging')
+@login_required
+def api_receivables_aging():
+    """Open balances by aging bucket, per client and overall"""
+    try:
+        client_id = request.args.get('client_id', type=int)
+        top_n = min(request.args.get('top', 5, type=int), 50)
+        return jsonify(receivables_aging(top_n=top_n, client_id=client_id))
+    except Exception as e:
+        logging.error(f"Receivables aging failed: {e}")
+        return jsonify({'error': str(e)})
+
+
+@web.route('/api/invoice/<int:id>/similar')
+@login_required
+def api_similar_invoices(id):
+    """Most similar invoices; ``cross_client=1`` searches every client"""
+    limit = max(1, min(request.args.get('limit', 5, type=int), 50))
+    cross_client = request.args.get('cross_client', '').lower() in ('1', 'true', 'yes')
+    return jsonify({
+        'invoice_id': id,
+        'cross_client': cross_client,
+        'similar_invoices': analytics_engine.find_similar_invoices(id, limit=limit, cross_client=cross_client)
+    })
+
+
+@web.route('/api/services/status')
+@login_required
+def api_services_status():
+    """Service initialization status and per-service init time"""
+    return jsonify(services.stats())
+
 # Error Handlers
 
-@app.errorhandler(404)
+@web.errorhandler(404)
 def not_found_error(error):
     return render_template('404.html'), 404
 
-@app.errorhandler(500)
+@web.errorhandler(500)
 def internal_error(error):
     db.session.rollback()
     return render_template('500.html'), 500
 
 # Context Processors
 
-@app.context_processor
+@web.context_processor
 def inject_globals():
     """Inject global template variables"""
     return {
-        'ai_enabled': app.config.get("AI_FEATURES_ENABLED", False),
-        'blockchain_enabled': app.config.get("BLOCKCHAIN_ENABLED", False),
+        'ai_enabled': current_app.config.get("AI_FEATURES_ENABLED", False),
+        'blockchain_enabled': current_app.config.get("BLOCKCHAIN_ENABLED", False),
         'current_user_id': session.get('user_id'),
         'is_admin': session.get('is_admin', False)
     }
@@ -0,0 +1,107 @@
+"""Client value and risk segmentation computed in a single query"""
+from typing import Any, Dict, Optional, Sequence
+
+from sqlalchemy import case, func, select
+
+from app import db
+from cache import memoize
+from models import Client, Invoice
+from money import PAISE_PER_RUPEE
+import config
+
+VALUE_TIERS = ('low_value', 'medium_value', 'high_value')
+RISK_TIERS = ('low_risk', 'medium_risk', 'high_risk')
+
+
+def _tier(column, low: float, high: float, names: Sequence[str]):
+    # Below ``low`` / ``low``..``high`` inclusive / above ``high``
+    return case((column > high, names[2]), (column >= low, names[1]), else_=names[0])
+
+
+def _bin(column, edges: Sequence[float]):
+    """Index of the histogram bin ``[edges[i], edges[i + 1])``; the last bin is open-ended"""
+    whens = [(column < edge, index) for index, edge in enumerate(edges[1:])]
+    return case(*whens, else_=len(edges) - 1)
+
+
+def _histogram(counts, edges, scale=1):
+    return [
+        {
+            'from': edges[i] / scale,
+            'to': edges[i + 1] / scale if i + 1 < len(edges) else None,
+            'count': counts.get(i, 0)
+        }
+        for i in range(len(edges))
+    ]
+
+
+@memoize(ttl=config.CACHE_DEFAULT_TIMEOUT, maxsize=8)
+def _segment(value_thresholds, risk_thresholds, value_edges, risk_edges) -> Dict[str, Any]:
+    value_low, value_high = (round(t * PAISE_PER_RUPEE) for t in value_thresholds)
+    paise_edges = [round(edge * PAISE_PER_RUPEE) for edge in value_edges]
+
+    # Paid revenue per client, aggregated before the join: one pass over the
+    # paid invoices instead of one per client. Clients without paid invoices
+    # get no value tier.
+    paid = select(
+        Invoice.client_id.label('client_id'),
+        func.sum(Invoice.total_amount_paise).label('revenue'),
+        func.count(Invoice.id).label('paid_invoices')
+    ).where(Invoice.payment_status == 'Paid').group_by(Invoice.client_id).subquery()
+    per_client = select(
+        Client.id.label('client_id'),
+        Client.ai_risk_score.label('risk'),
+        func.coalesce(paid.c.revenue, 0).label('revenue'),
+        func.coalesce(paid.c.paid_invoices, 0).label('paid_invoices')
+    ).select_from(Client).outerjoin(paid, paid.c.client_id == Client.id).subquery()
+
+    has_revenue = per_client.c.paid_invoices > 0
+    has_risk = per_client.c.risk.isnot(None)
+    rows = db.session.execute(
+        select(
+            case((has_revenue, _tier(per_client.c.revenue, value_low, value_high, VALUE_TIERS))).label('value_tier'),
+            case((has_risk, _tier(per_client.c.risk, *risk_thresholds, RISK_TIERS))).label('risk_tier'),
+            case((has_revenue, _bin(per_client.c.revenue, paise_edges))).label('value_bin'),
+            case((has_risk, _bin(per_client.c.risk, risk_edges))).label('risk_bin'),
+            func.count().label('clients')
+        ).group_by('value_tier', 'risk_tier', 'value_bin', 'risk_bin')
+    ).all()
+
+    by_value = dict.fromkeys(VALUE_TIERS, 0)
+    by_risk = dict.fromkeys(RISK_TIERS, 0)
+    matrix = {value: dict.fromkeys(RISK_TIERS, 0) for value in VALUE_TIERS}
+    value_bins, risk_bins = {}, {}
+    for row in rows:
+        if row.value_tier:
+            by_value[row.value_tier] += row.clients
+            value_bins[row.value_bin] = value_bins.get(row.value_bin, 0) + row.clients
+        if row.risk_tier:
+            by_risk[row.risk_tier] += row.clients
+            risk_bins[row.risk_bin] = risk_bins.get(row.risk_bin, 0) + row.clients
+        if row.value_tier and row.risk_tier:
+            matrix[row.value_tier][row.risk_tier] += row.clients
+
+    return {
+        'thresholds': {'value': list(value_thresholds), 'risk': list(risk_thresholds)},
+        'total_clients': sum(row.clients for row in rows),
+        'by_value': {tier: by_value[tier] for tier in reversed(VALUE_TIERS)},
+        'risk_distribution': {tier: by_risk[tier] for tier in reversed(RISK_TIERS)},
+        'value_risk_matrix': matrix,
+        'value_histogram': _histogram(value_bins, paise_edges, PAISE_PER_RUPEE),
+        'risk_histogram': _histogram(risk_bins, list(risk_edges))
+    }
+
+
+def client_segmentation(value_thresholds: Optional[Sequence[float]] = None,
+                        risk_thresholds: Optional[Sequence[float]] = None) -> Dict[str, Any]:
+    """Value tiers, risk tiers and their histograms for all clients
+
+    Value tiers use paid revenue in rupees: below the first threshold is
+    low, up to and including the second is medium, above it high. Risk tiers
+    split ``ai_risk_score`` the same way. Defaults come from config
+    (``SEGMENT_VALUE_THRESHOLDS``, ``SEGMENT_RISK_THRESHOLDS``).
+    """
+    value_thresholds = tuple(value_thresholds or config.SEGMENT_VALUE_THRESHOLDS)
+    risk_thresholds = tuple(risk_thresholds or config.SEGMENT_RISK_THRESHOLDS)
+    return _segment(value_thresholds, risk_thresholds,
+                    tuple(config.SEGMENT_VALUE_HISTOGRAM_EDGES), tuple(config.SEGMENT_RISK_HISTOGRAM_EDGES))
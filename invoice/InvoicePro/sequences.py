@@ -0,0 +1,104 @@
+"""Per-prefix, per-day document number sequences
+
+Invoice and challan numbers are ``<prefix>-<YYYYMMDD>-<n>``, where ``n``
+comes from the ``number_sequence`` row for that prefix and day. ``reserve``
+bumps the row and reads the new value back in a single
+``INSERT ... ON CONFLICT DO UPDATE ... RETURNING`` statement, so concurrent
+requests can never be handed the same number and no uniqueness check is
+needed. Bulk creation reserves a whole block with one call.
+
+On SQLite the allocation joins the caller's transaction: writers are
+serialized there anyway, and a rolled-back invoice gives its number back.
+Elsewhere it commits on its own connection straight away, like a native
+sequence, so the row lock is not held while the rest of the request runs;
+numbers from rolled-back transactions are then skipped rather than reused.
+"""
+import re
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from app import db
+from models import DeliveryChallan, Invoice, NumberSequence
+import config
+
+INVOICE_PREFIX = config.INVOICE_NUMBER_PREFIX
+# Challans have always been numbered CH-...; config.CHALLAN_NUMBER_PREFIX was never applied
+CHALLAN_PREFIX = 'CH'
+
+sequence_table = NumberSequence.__table__
+
+# Columns holding numbers issued from each prefix, for seeding existing databases
+NUMBERED_COLUMNS = {
+    INVOICE_PREFIX: Invoice.__table__.c.invoice_number,
+    CHALLAN_PREFIX: DeliveryChallan.__table__.c.challan_number,
+}
+
+
+def today() -> str:
+    return datetime.now().strftime('%Y%m%d')
+
+
+def _allocate(conn, prefix: str, day: str, count: int) -> int:
+    """Add ``count`` to the sequence row and return its new value"""
+    key = (sequence_table.c.prefix == prefix) & (sequence_table.c.day == day)
+    dialect = conn.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        statement = insert(sequence_table).values(prefix=prefix, day=day, last_value=count)
+        statement = statement.on_conflict_do_update(
+            index_elements=['prefix', 'day'],
+            set_={'last_value': sequence_table.c.last_value + count}
+        ).returning(sequence_table.c.last_value)
+        return conn.execute(statement).scalar_one()
+    if dialect == 'mysql':
+        # No RETURNING; the upsert keeps the row locked until the read below
+        statement = mysql.insert(sequence_table).values(prefix=prefix, day=day, last_value=count)
+        conn.execute(statement.on_duplicate_key_update(last_value=sequence_table.c.last_value + count))
+        return conn.execute(select(sequence_table.c.last_value).where(key)).scalar_one()
+    raise NotImplementedError(f"Number sequences are not supported on {dialect}")
+
+
+def reserve(prefix: str, count: int = 1, day: str = None) -> range:
+    """Atomically take the next ``count`` numbers of ``prefix`` for ``day`` (default today)"""
+    if count < 1:
+        raise ValueError(f"count must be at least 1, got {count}")
+    day = day or today()
+    if db.engine.dialect.name == 'sqlite':
+        last = _allocate(db.session.connection(), prefix, day, count)
+    else:
+        with db.engine.begin() as conn:
+            last = _allocate(conn, prefix, day, count)
+    return range(last - count + 1, last + 1)
+
+
+def document_numbers(prefix: str, count: int = 1, width: int = 3, day: str = None) -> List[str]:
+    """``count`` consecutive ``<prefix>-<day>-<n>`` numbers, ``n`` zero-padded to ``width``"""
+    day = day or today()
+    return [f"{prefix}-{day}-{n:0{width}d}" for n in reserve(prefix, count, day)]
+
+
+def seed_sequences(conn):
+    """Start each day's sequence after the highest number already issued in that format
+
+    Lets an existing database switch to sequences without handing out
+    numbers that older code already used on the same day.
+    """
+    for prefix, column in NUMBERED_COLUMNS.items():
+        pattern = re.compile(rf"^{re.escape(prefix)}-(\d{{8}})-(\d+)$")
+        highest = {}
+        for (number,) in conn.execute(select(column).where(column.like(f"{prefix}-%"))):
+            match = pattern.match(number or '')
+            if match:
+                day, value = match.group(1), int(match.group(2))
+                highest[day] = max(highest.get(day, 0), value)
+
+        for day, value in highest.items():
+            key = (sequence_table.c.prefix == prefix) & (sequence_table.c.day == day)
+            current = conn.execute(select(func.max(sequence_table.c.last_value)).where(key)).scalar()
+            if current is None:
+                conn.execute(sequence_table.insert().values(prefix=prefix, day=day, last_value=value))
+            elif current < value:
+                conn.execute(update(sequence_table).where(key).values(last_value=value))
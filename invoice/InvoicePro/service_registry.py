@@ -0,0 +1,123 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from flask import has_app_context
+
+
+class ServiceRegistry:
+    """Lazily initialized AI, blockchain, OCR and voice services
+
+    Services are registered in groups. A group is initialized the first time
+    one of the services it provides is requested (or by ``warm_up``), and the
+    time spent in its initializer is recorded so cold-start cost is visible.
+    """
+
+    def __init__(self):
+        self._app = None
+        self._groups: Dict[str, Dict[str, Any]] = {}
+        self._providers: Dict[str, str] = {}
+        self._loaded: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._init_times: Dict[str, float] = {}
+        self._errors: Dict[str, str] = {}
+
+    def init_app(self, app):
+        """Bind the registry to a Flask app (used for config and app context)"""
+        self._app = app
+        app.extensions['service_registry'] = self
+
+    def register(self, group: str, loader: Callable[[], Any], provides: Iterable[str],
+                 enabled: Optional[Callable[[Any], bool]] = None):
+        """Register a service group
+
+        ``loader`` returns an object exposing the provided service names as
+        attributes (usually the service module after its ``initialize_*`` call).
+        ``enabled`` receives the app and decides whether the group may load.
+        """
+        self._groups[group] = {'loader': loader, 'enabled': enabled}
+        self._locks[group] = threading.Lock()
+        for name in provides:
+            self._providers[name] = group
+
+    def get(self, name: str) -> Any:
+        """Return a service instance, initializing its group on first use"""
+        group = self._providers.get(name)
+        if group is None:
+            raise KeyError(f"Unknown service: {name}")
+        namespace = self._load(group)
+        return getattr(namespace, name, None) if namespace is not None else None
+
+    def is_loaded(self, group: str) -> bool:
+        return group in self._loaded
+
+    def _load(self, group: str) -> Any:
+        if group in self._loaded:
+            return self._loaded[group]
+
+        with self._locks[group]:
+            if group in self._loaded:
+                return self._loaded[group]
+
+            spec = self._groups[group]
+            if spec['enabled'] is not None and not spec['enabled'](self._app):
+                self._loaded[group] = None
+                return None
+
+            start = time.perf_counter()
+            try:
+                if self._app is not None and not has_app_context():
+                    with self._app.app_context():
+                        namespace = spec['loader']()
+                else:
+                    namespace = spec['loader']()
+            except Exception as e:
+                logging.error(f"Service group '{group}' failed to initialize: {e}")
+                self._errors[group] = str(e)
+                namespace = None
+            elapsed = time.perf_counter() - start
+
+            self._init_times[group] = elapsed
+            self._loaded[group] = namespace
+            logging.info(f"Service group '{group}' initialized in {elapsed * 1000:.1f} ms")
+            return namespace
+
+    def warm_up(self, groups: Optional[List[str]] = None, background: bool = True):
+        """Initialize service groups ahead of the first request
+
+        With ``background=True`` the work runs in a daemon thread and the
+        thread is returned; otherwise groups are loaded synchronously.
+        """
+        targets = list(groups or self._groups)
+
+        def _run():
+            start = time.perf_counter()
+            for group in targets:
+                self._load(group)
+            logging.info(f"Service warm-up finished in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        if not background:
+            _run()
+            return None
+
+        thread = threading.Thread(target=_run, name='service-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-group initialization status and timing"""
+        return {
+            group: {
+                'loaded': group in self._loaded,
+                'available': self._loaded.get(group) is not None,
+                'init_time_ms': round(self._init_times[group] * 1000, 2) if group in self._init_times else None,
+                'error': self._errors.get(group),
+                'provides': sorted(name for name, g in self._providers.items() if g == group)
+            }
+            for group in self._groups
+        }
+
+
+# Global service registry
+services = ServiceRegistry()
@@ -0,0 +1,163 @@
+"""In-memory feature index for similar-invoice search
+
+Every invoice is a row of NumPy arrays: amount, invoice date ordinal, line
+count, client id and an L2-normalised bag of hashed line-item description
+tokens. A lookup scores the query invoice against all candidates (the same
+client, or every client) in a handful of vectorized operations and returns
+the best matches. Loading and incremental refresh come from
+``invoice_arrays.InvoiceArrays``.
+"""
+import re
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from invoice_arrays import InvoiceArrays
+from lazy_imports import lazy_import
+from models import Invoice, InvoiceLineItem
+from money import PAISE_PER_RUPEE
+import config
+
+np = lazy_import('numpy')
+
+TOKEN_RE = re.compile(r'[a-z0-9]{2,}')
+_EPSILON = 1e-6
+
+# Global index instance, created by initialize_similarity_index()
+invoice_similarity_index = None
+
+
+class InvoiceSimilarityIndex(InvoiceArrays):
+    """Feature arrays for all invoices with vectorized similarity search"""
+
+    label = 'Similarity index'
+    invoice_fields = (Invoice.client_id, Invoice.total_amount_paise, Invoice.invoice_date)
+    line_item_fields = (InvoiceLineItem.description,)
+
+    def __init__(self, dimensions: int = 32, weights: Optional[Dict[str, float]] = None,
+                 full_reload_threshold: int = 50000):
+        self.dimensions = dimensions
+        self.weights = dict(weights or config.SIMILARITY_WEIGHTS)
+        self._token_cache: Dict[str, Any] = {}
+        super().__init__(full_reload_threshold)
+
+    def _column_specs(self):
+        # Scored features are float32: exact enough for ranking and half the memory traffic
+        return {
+            'client_ids': ('int64', ()),
+            'amounts': ('float32', ()),
+            'dates': ('float32', ()),
+            'line_counts': ('float32', ()),
+            'tokens': ('float32', (self.dimensions,)),
+        }
+
+    def _set_invoice(self, slot, row):
+        self.client_ids[slot] = row.client_id or 0
+        self.amounts[slot] = (row.total_amount_paise or 0) / PAISE_PER_RUPEE
+        self.dates[slot] = row.invoice_date.toordinal() if row.invoice_date else 0
+        self.line_counts[slot] = 0
+        self.tokens[slot] = 0
+
+    def _description_buckets(self, description):
+        buckets = self._token_cache.get(description)
+        if buckets is None:
+            tokens = TOKEN_RE.findall((description or '').lower())
+            buckets = [zlib.crc32(token.encode()) % self.dimensions for token in tokens]
+            if len(self._token_cache) < 100000:
+                self._token_cache[description] = buckets
+        return buckets
+
+    def _add_line_items(self, slots, rows):
+        """Count lines and hashed description tokens for the given slots"""
+        np.add.at(self.line_counts, slots, 1)
+        token_rows, token_cols = [], []
+        for slot, row in zip(slots.tolist(), rows):
+            buckets = self._description_buckets(row.description)
+            token_rows.extend([slot] * len(buckets))
+            token_cols.extend(buckets)
+        if token_rows:
+            np.add.at(self.tokens, (np.asarray(token_rows), np.asarray(token_cols)), 1.0)
+
+    def _finish(self, slots):
+        block = self.tokens[slots]
+        norms = np.linalg.norm(block, axis=1, keepdims=True)
+        self.tokens[slots] = np.divide(block, norms, out=np.zeros_like(block), where=norms > 0)
+
+    def search(self, invoice_id: int, limit: int = 5, cross_client: bool = False) -> List[Tuple[int, float]]:
+        """``(invoice_id, score)`` of the most similar invoices, best first"""
+        self.refresh()
+        with self._lock:
+            slot = int(self._slot_of([invoice_id])[0])
+            if slot < 0:
+                return []
+            n = self.size
+            if cross_client:
+                candidates = slice(0, n)
+                scores = self._scores(slot, candidates, cross_client=True)
+                scores[~self.valid[:n]] = -np.inf
+                scores[slot] = -np.inf
+            else:
+                candidates = np.flatnonzero((self.client_ids[:n] == self.client_ids[slot]) & self.valid[:n])
+                scores = self._scores(slot, candidates, cross_client=False)
+                scores[candidates == slot] = -np.inf
+            candidate_ids = self.ids[candidates]
+
+        k = min(limit, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(scores, len(scores) - k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(int(candidate_ids[i]), round(float(scores[i]), 4)) for i in top if scores[i] > -np.inf]
+
+    def _scores(self, slot, candidates, cross_client):
+        """Weighted sum of the per-feature similarities, in float32 and mostly in place"""
+        w = self.weights
+        score = self.tokens[candidates] @ self.tokens[slot]
+        score *= w.get('description', 0)
+        work, larger = np.empty_like(score), np.empty_like(score)
+
+        _add_ratio(score, self.amounts[candidates], self.amounts[slot], w.get('amount', 0), work, larger)
+        _add_ratio(score, self.line_counts[candidates], self.line_counts[slot], w.get('line_count', 0), work, larger)
+
+        # Date proximity fades out over a year
+        np.subtract(self.dates[candidates], self.dates[slot], out=work)
+        np.abs(work, out=work)
+        work *= -1 / 365.0
+        work += 1
+        np.maximum(work, 0, out=work)
+        work *= w.get('date', 0)
+        score += work
+
+        if cross_client:
+            score[self.client_ids[candidates] == self.client_ids[slot]] += w.get('client', 0)
+        else:
+            score += w.get('client', 0)
+        return score
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(super().stats(), dimensions=self.dimensions)
+
+
+def _add_ratio(score, values, value, weight, work, larger):
+    """``score += weight * min/max``, using ``work`` and ``larger`` as scratch buffers
+
+    For non-negative values min/max equals ``1 - |a - b| / max(a, b)``; the
+    epsilon makes 0 against 0 a full match.
+    """
+    np.minimum(values, value, out=work)
+    np.maximum(values, value, out=larger)
+    work += _EPSILON
+    larger += _EPSILON
+    work /= larger
+    work *= weight
+    score += work
+
+
+def initialize_similarity_index():
+    """Build the global index from the database"""
+    global invoice_similarity_index
+    index = InvoiceSimilarityIndex(
+        dimensions=config.SIMILARITY_TOKEN_DIMENSIONS,
+        full_reload_threshold=config.INVOICE_ARRAYS_RELOAD_THRESHOLD
+    )
+    index.build()
+    invoice_similarity_index = index
@@ -0,0 +1,68 @@
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.types import Float, String
+
+
+class month_bucket(FunctionElement):
+    """``'YYYY-MM'`` string for a date or datetime expression
+
+    Use it in the SELECT list / GROUP BY and keep date filters on the raw
+    column (``Invoice.invoice_date >= start``) so they can use its index.
+    """
+    type = String()
+    name = 'month_bucket'
+    inherit_cache = True
+
+
+class days_between(FunctionElement):
+    """Days from ``start`` to ``end`` as a float: ``days_between(end, start)``"""
+    type = Float()
+    name = 'days_between'
+    inherit_cache = True
+
+
+def _literal(compiler, value):
+    # Percent signs must be doubled for DB-API drivers using format paramstyles
+    if compiler.dialect.paramstyle in ('format', 'pyformat'):
+        value = value.replace('%', '%%')
+    return f"'{value}'"
+
+
+def _args(compiler, element, **kw):
+    return [compiler.process(arg, **kw) for arg in element.clauses]
+
+
+@compiles(month_bucket)
+def _month_bucket_default(element, compiler, **kw):
+    value, = _args(compiler, element, **kw)
+    return f"to_char({value}, 'YYYY-MM')"
+
+
+@compiles(month_bucket, 'sqlite')
+def _month_bucket_sqlite(element, compiler, **kw):
+    value, = _args(compiler, element, **kw)
+    return f"strftime({_literal(compiler, '%Y-%m')}, {value})"
+
+
+@compiles(month_bucket, 'mysql')
+def _month_bucket_mysql(element, compiler, **kw):
+    value, = _args(compiler, element, **kw)
+    return f"DATE_FORMAT({value}, {_literal(compiler, '%Y-%m')})"
+
+
+@compiles(days_between)
+def _days_between_default(element, compiler, **kw):
+    end, start = _args(compiler, element, **kw)
+    return f"(EXTRACT(EPOCH FROM (CAST({end} AS TIMESTAMP) - CAST({start} AS TIMESTAMP))) / 86400.0)"
+
+
+@compiles(days_between, 'sqlite')
+def _days_between_sqlite(element, compiler, **kw):
+    end, start = _args(compiler, element, **kw)
+    return f"(julianday({end}) - julianday({start}))"
+
+
+@compiles(days_between, 'mysql')
+def _days_between_mysql(element, compiler, **kw):
+    end, start = _args(compiler, element, **kw)
+    return f"(TIMESTAMPDIFF(SECOND, {start}, {end}) / 86400.0)"
@@ -0,0 +1,50 @@
+import logging
+
+from sqlalchemy import event
+
+
+# Applied to every new SQLite connection. WAL lets readers run while a writer
+# commits; NORMAL sync is durable across application crashes in WAL mode.
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 268435456,     # 256 MB of the database file memory-mapped
+    'cache_size': -64000,       # negative = KiB, i.e. ~64 MB page cache
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,       # ms to wait on a lock before "database is locked"
+}
+
+
+def install_sqlite_pragmas(engine, pragmas=None):
+    """Set ``pragmas`` on each new connection of a SQLite engine
+
+    Engines for other databases are left untouched. Returns True when the
+    hook was installed.
+    """
+    if engine.dialect.name != 'sqlite':
+        return False
+
+    pragmas = dict(DEFAULT_SQLITE_PRAGMAS if pragmas is None else pragmas)
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    logging.debug(f"SQLite pragmas installed: {pragmas}")
+    return True
+
+
+def init_app(app):
+    """Install the pragmas on the app's SQLite engines unless SQLITE_TUNING is off"""
+    if not app.config.get("SQLITE_TUNING", True):
+        return
+
+    db = app.extensions['sqlalchemy']
+    with app.app_context():
+        for engine in db.engines.values():
+            install_sqlite_pragmas(engine, app.config.get("SQLITE_PRAGMAS"))
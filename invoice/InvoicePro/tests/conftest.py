@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """The app on a scratch SQLite database, with external services switched off"""
+    scratch = tmp_path_factory.mktemp('app')
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{scratch / 'test.db'}",
+        'AI_FEATURES_ENABLED': 'false',
+        'BLOCKCHAIN_ENABLED': 'false',
+        'OPENAI_API_KEY': '',
+    })
+    from app import bootstrap_database, create_app
+    app = create_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with app.app_context():
+        bootstrap_database()
+    return app
+
+
+@pytest.fixture
+def client(app):
+    from models import User
+    client = app.test_client()
+    with app.app_context():
+        user_id = User.query.first().id
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+    return client
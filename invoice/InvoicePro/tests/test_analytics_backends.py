@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+# Every AnalyticsEngine method whose answer can come from the fact store
+METHODS = [
+    ('get_revenue_trends', ()),
+    ('get_client_performance_metrics', ()),
+    ('get_payment_analytics', ()),
+    ('get_profitability_analysis', ()),
+    ('get_monthly_revenue_trend', ()),
+    ('_payment_status_distribution', ()),
+    ('_payment_timing', ()),
+    ('_payment_mode_totals', ()),
+    ('_top_clients', (20,)),
+    ('_client_profitability', (10,)),
+]
+
+
+def _normalized(result):
+    """JSON-shaped result with floats to a millionth, so SQL and NumPy sums compare equal
+
+    Status and payment mode groups come back in no particular order, so they are sorted.
+    """
+    def walk(value):
+        if isinstance(value, dict):
+            return {key: walk(item) for key, item in value.items()}
+        if isinstance(value, list):
+            items = [walk(item) for item in value]
+            for key in ('status', 'mode'):
+                if items and all(isinstance(item, dict) and key in item for item in items):
+                    return sorted(items, key=lambda item: str(item[key]))
+            return items
+        if isinstance(value, float):
+            return round(value, 6)
+        return value
+    return walk(json.loads(json.dumps(result, default=str)))
+
+
+@pytest.fixture(scope='module')
+def fact_store(app):
+    from app import db
+    from benchmarks.seed import seed_database
+    from fact_store import InvoiceFactStore
+
+    seed_database(app, db, clients=12, invoices=300, seed=7)
+    with app.app_context():
+        store = InvoiceFactStore()
+        store.build()
+    return store
+
+
+def _run(app, monkeypatch, store, backend, name, args):
+    import analytics_engine
+
+    monkeypatch.setitem(app.config, 'ANALYTICS_BACKEND', backend)
+    monkeypatch.setattr(analytics_engine, 'active_fact_store', lambda: store if backend == 'columnar' else None)
+    with app.app_context():
+        method = getattr(analytics_engine.AnalyticsEngine, name)
+        if hasattr(method, 'cache_clear'):
+            method.cache_clear()
+        return _normalized(getattr(analytics_engine.AnalyticsEngine(), name)(*args))
+
+
+@pytest.mark.parametrize('name, args', METHODS, ids=[name for name, _ in METHODS])
+def test_columnar_backend_matches_sql(app, monkeypatch, fact_store, name, args):
+    expected = _run(app, monkeypatch, fact_store, 'sql', name, args)
+    actual = _run(app, monkeypatch, fact_store, 'columnar', name, args)
+
+    assert not (isinstance(expected, dict) and 'error' in expected)
+    assert actual == expected
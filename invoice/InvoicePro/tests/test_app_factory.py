@@ -0,0 +1,47 @@
+import gc
+import os
+import weakref
+
+import pytest
+from sqlalchemy import text
+
+
+def test_create_app_registers_no_fork_handler_per_app(app, monkeypatch):
+    import app as app_module
+    from cache import data_version
+    from service_registry import services
+
+    # create_app rebinds these process-wide singletons; put them back afterwards
+    monkeypatch.setattr(services, '_app', services._app)
+    monkeypatch.setattr(data_version, '_path', data_version._path)
+    handlers = []
+    monkeypatch.setattr(app_module.os, 'register_at_fork', lambda **kwargs: handlers.append(kwargs))
+
+    first = app_module.create_app()
+    second = app_module.create_app()
+    assert handlers == []
+    assert first in app_module._forkable_apps and second in app_module._forkable_apps
+
+    # Only the registry's (latest) app may keep an app alive
+    collected = weakref.ref(first)
+    del first
+    gc.collect()
+    assert collected() is None
+    assert app in app_module._forkable_apps
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs os.fork')
+def test_forked_child_starts_with_an_empty_pool(app):
+    from app import db
+
+    with app.app_context():
+        db.session.execute(text('SELECT 1'))
+        db.session.remove()
+        assert db.engine.pool.checkedin() > 0
+
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0 if db.engine.pool.checkedin() == 0 else 1)
+        _, status = os.waitpid(pid, 0)
+
+    assert os.waitstatus_to_exitcode(status) == 0
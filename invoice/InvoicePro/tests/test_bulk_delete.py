@@ -0,0 +1,29 @@
+from datetime import date
+
+
+def test_bulk_delete_removes_pipeline_rows(app, client, monkeypatch):
+    from app import db
+    from invoice_pipeline import enqueue_side_effects, pipeline
+    from models import Client, Invoice, InvoiceSideEffect
+
+    # Leave the stages pending rather than running them
+    monkeypatch.setattr(pipeline, 'submit', lambda app, invoice_ids: None)
+    with app.app_context():
+        customer = Client(name='Bulk Delete Client')
+        db.session.add(customer)
+        db.session.flush()
+        invoice = Invoice(invoice_number='BULK-DELETE-1', client_id=customer.id,
+                          invoice_date=date.today(), due_date=date.today())
+        db.session.add(invoice)
+        db.session.flush()
+        enqueue_side_effects(invoice)
+        db.session.commit()
+        invoice_id = invoice.id
+        assert InvoiceSideEffect.query.filter_by(invoice_id=invoice_id).count() > 0
+
+    response = client.post('/invoices/bulk_delete', json={'invoice_ids': [invoice_id]})
+
+    assert response.get_json() == {'success': True}
+    with app.app_context():
+        assert db.session.get(Invoice, invoice_id) is None
+        assert InvoiceSideEffect.query.filter_by(invoice_id=invoice_id).count() == 0
@@ -0,0 +1,34 @@
+from cache import memoize
+
+
+def test_memoize_hands_each_caller_its_own_copy():
+    calls = []
+
+    @memoize(ttl=60)
+    def report(key):
+        calls.append(key)
+        return {'key': key, 'rows': [3, 1, 2]}
+
+    first = report('a')
+    first['rows'].sort()
+    first['extra'] = True
+    second = report('a')
+    second['rows'].append(4)
+    third = report('a')
+
+    assert calls == ['a']
+    assert third == {'key': 'a', 'rows': [3, 1, 2]}
+    assert report.cache_info()['hits'] == 2
+
+
+def test_memoize_skips_results_rejected_by_cache_if():
+    calls = []
+
+    @memoize(ttl=60, cache_if=lambda result: 'error' not in result)
+    def failing():
+        calls.append(1)
+        return {'error': 'boom'}
+
+    failing()
+    failing()
+    assert len(calls) == 2
@@ -0,0 +1,63 @@
+from datetime import date
+
+import pytest
+
+
+class RecordingAssistant:
+    def __init__(self):
+        self.calls = []
+
+    def analyze_client_history(self, client_id):
+        self.calls.append(client_id)
+        return {'risk_assessment': {'risk_level': 'low'}}
+
+
+@pytest.fixture
+def assistant(app, monkeypatch):
+    import routes
+    assistant = RecordingAssistant()
+    monkeypatch.setitem(app.config, 'AI_FEATURES_ENABLED', True)
+    monkeypatch.setattr(routes.services, 'get', lambda name: assistant if name == 'ai_assistant' else None)
+    return assistant
+
+
+def _invoice(app, number, with_side_effects):
+    from app import db
+    from invoice_pipeline import enqueue_side_effects
+    from models import Client, Invoice
+
+    with app.app_context():
+        customer = Client(name=f'Detail Client {number}')
+        db.session.add(customer)
+        db.session.flush()
+        invoice = Invoice(invoice_number=number, client_id=customer.id,
+                          invoice_date=date.today(), due_date=date.today())
+        db.session.add(invoice)
+        db.session.flush()
+        if with_side_effects:
+            enqueue_side_effects(invoice)
+        db.session.commit()
+        return invoice.id
+
+
+def test_detail_shows_pending_assessment_without_calling_the_model(app, client, assistant, monkeypatch):
+    from invoice_pipeline import pipeline
+
+    # Leave the stages pending rather than running them
+    monkeypatch.setattr(pipeline, 'submit', lambda app, invoice_ids: None)
+    invoice_id = _invoice(app, 'DETAIL-PENDING', with_side_effects=True)
+
+    response = client.get(f'/invoice/{invoice_id}')
+
+    assert response.status_code == 200
+    assert assistant.calls == []
+    assert 'pending' in response.get_data(as_text=True)
+
+
+def test_detail_asks_the_model_for_invoices_without_stages(app, client, assistant):
+    invoice_id = _invoice(app, 'DETAIL-LEGACY', with_side_effects=False)
+
+    response = client.get(f'/invoice/{invoice_id}')
+
+    assert response.status_code == 200
+    assert len(assistant.calls) == 1
@@ -0,0 +1,89 @@
+from datetime import date
+
+import pytest
+
+
+def test_line_item_error_reports_every_bad_field(app):
+    from line_items import LineItemError, price_line_items
+
+    items = [
+        {'description': 'Fine', 'quantity': 1, 'unit_price': 10},
+        {'description': 'Bad quantity', 'quantity': 'two', 'unit_price': 10},
+        {'description': 'Zero quantity', 'quantity': 0, 'unit_price': 10},
+        {'description': 'Negative price', 'quantity': 1, 'unit_price': -5},
+        {'description': 'Bad GST', 'quantity': 1, 'unit_price': 10, 'tax_percentage': 140},
+        {'description': '', 'quantity': 1, 'unit_price': 10, 'tax_percentage': 'abc'},
+        'not an item',
+    ]
+
+    with pytest.raises(LineItemError) as excinfo:
+        price_line_items(items)
+
+    errors = [(error['line'], error['field']) for error in excinfo.value.errors]
+    assert errors == [
+        (2, 'quantity'),
+        (3, 'quantity'),
+        (4, 'unit_price'),
+        (5, 'tax_percentage'),
+        (6, 'description'),
+        (6, 'tax_percentage'),
+        (7, 'item'),
+        (7, 'quantity'),
+        (7, 'unit_price'),
+    ]
+    assert 'line 2: quantity must be a number' in str(excinfo.value)
+    assert '(and 4 more)' in str(excinfo.value)
+
+
+def test_price_line_items_defaults(app):
+    import config
+    from line_items import price_line_items
+
+    priced = price_line_items([{'description': '  Widget  ', 'quantity': '2', 'unit_price': '10.50'}])
+
+    assert priced['items'][0]['description'] == 'Widget'
+    assert priced['tax_rate'].tolist() == [config.DEFAULT_TAX_RATE]
+    assert priced['cost_price'].tolist() == [0]
+    assert priced['subtotal'] == 2100
+
+
+def test_saved_line_items_match_invoice_totals(app):
+    from app import db
+    from line_items import price_line_items, save_line_items
+    from models import Client, Invoice, InvoiceLineItem
+
+    items = [
+        {'description': 'Consulting', 'quantity': 3, 'unit_price': 10.05, 'tax_percentage': 18, 'hsn_code': '9983'},
+        {'description': 'Cable', 'quantity': 1.5, 'unit_price': 99.99, 'tax_percentage': 5, 'cost_price': 40},
+        {'description': 'Adapter', 'quantity': 0.333, 'unit_price': 7.77, 'tax_percentage': 12, 'unit': 'Kg'},
+    ]
+    with app.app_context():
+        customer = Client(name='Line Item Client')
+        db.session.add(customer)
+        db.session.flush()
+        invoice = Invoice(invoice_number='LINES-1', client_id=customer.id,
+                          invoice_date=date.today(), due_date=date.today())
+        db.session.add(invoice)
+        db.session.flush()
+
+        priced = price_line_items(items, intra_state=True)
+        assert save_line_items(invoice, priced) == len(items)
+        db.session.commit()
+
+        invoice = db.session.get(Invoice, invoice.id)
+        lines = InvoiceLineItem.query.filter_by(invoice_id=invoice.id).order_by(InvoiceLineItem.sr_no).all()
+
+        assert [line.sr_no for line in lines] == [1, 2, 3]
+        assert [line.description for line in lines] == ['Consulting', 'Cable', 'Adapter']
+        assert [line.unit for line in lines] == ['Nos', 'Nos', 'Kg']
+        assert lines[1].cost_price_paise == 4000
+        net = [line.total_amount_paise - line.tax_amount_paise for line in lines]
+        assert net == priced['lines']['net'].tolist()
+        assert sum(net) == invoice.subtotal_paise
+        assert sum(line.tax_amount_paise for line in lines) == invoice.cgst_paise + invoice.sgst_paise
+        assert sum(line.total_amount_paise for line in lines) == invoice.total_amount_paise
+        assert invoice.igst_paise == 0
+        # The rupee columns were written alongside the paise ones
+        assert invoice.total_amount == invoice.total_amount_paise / 100
+        assert all(line.total_amount == line.total_amount_paise / 100 for line in lines)
+        assert len(invoice.line_items) == len(items)
@@ -0,0 +1,50 @@
+import threading
+
+from sqlalchemy import text
+
+
+def test_metrics_endpoint_is_limited_to_users_and_allowed_addresses(app):
+    anonymous = app.test_client()
+
+    assert anonymous.get('/metrics').status_code == 200  # loopback
+    assert anonymous.get('/metrics', environ_base={'REMOTE_ADDR': '203.0.113.9'}).status_code == 403
+
+    with anonymous.session_transaction() as session:
+        session['user_id'] = 1
+    assert anonymous.get('/metrics', environ_base={'REMOTE_ADDR': '203.0.113.9'}).status_code == 200
+
+    allowed = app.config['METRICS_ALLOWED_IPS']
+    app.config['METRICS_ALLOWED_IPS'] = '10.0.0.0/8'
+    try:
+        scraper = app.test_client()
+        assert scraper.get('/metrics', environ_base={'REMOTE_ADDR': '10.1.2.3'}).status_code == 200
+        assert scraper.get('/metrics').status_code == 403
+    finally:
+        app.config['METRICS_ALLOWED_IPS'] = allowed
+
+
+def test_graph_worker_sql_is_charged_to_the_request(app):
+    from analytics_graph import ComputationGraph
+    from app import db
+    from metrics import metrics
+
+    graph = ComputationGraph(max_workers=2, cache_size=4)
+    threads = set()
+
+    @graph.node(cached=False)
+    def count_invoices():
+        threads.add(threading.get_ident())
+        return db.session.execute(text('SELECT COUNT(*) FROM invoices')).scalar()
+
+    @graph.node(cached=False)
+    def count_clients():
+        threads.add(threading.get_ident())
+        return db.session.execute(text('SELECT COUNT(*) FROM clients')).scalar()
+
+    with app.test_request_context('/analytics'):
+        metrics._start_request()
+        graph.run(['count_invoices', 'count_clients'])
+        charged = dict(metrics.current_collector())
+
+    assert threading.get_ident() not in threads
+    assert charged.get('sql', 0) > 0
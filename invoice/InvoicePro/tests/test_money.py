@@ -0,0 +1,78 @@
+from datetime import date
+
+import pytest
+
+from money import compute_invoice_totals, from_paise, split_gst, to_paise, to_paise_array
+
+
+@pytest.mark.parametrize('amount, paise', [
+    (None, 0),
+    ('', 0),
+    (10, 1000),
+    ('10.10', 1010),
+    (0.005, 1),
+    (2.675, 268),   # 267.49999... as a binary float
+    (1.005, 101),
+    (-1.005, -101),  # half away from zero
+    (0.004, 0),
+])
+def test_to_paise_rounds_half_up(amount, paise):
+    assert to_paise(amount) == paise
+
+
+def test_to_paise_array_matches_to_paise():
+    amounts = [2.675, 1.005, 0.005, 10.1, 99.999, -1.005]
+    assert to_paise_array(amounts).tolist() == [to_paise(amount) for amount in amounts]
+    assert from_paise(to_paise(10.1)) == 10.1
+
+
+def test_compute_invoice_totals():
+    totals = compute_invoice_totals([3, 1.5], [10.05, 99.99], [18, 5])
+
+    # 3 x 10.05 = 30.15 net, 18% = 5.427 -> 5.43; 1.5 x 99.99 = 149.985 -> 149.99, 5% = 7.4995 -> 7.50
+    assert totals['lines']['net'].tolist() == [3015, 14999]
+    assert totals['lines']['tax'].tolist() == [543, 750]
+    assert totals['subtotal'] == 18014
+    assert totals['total_tax'] == 1293
+    assert totals['total'] == 19307
+    assert (totals['cgst'], totals['sgst'], totals['igst']) == (647, 646, 0)
+
+    inter_state = compute_invoice_totals([3, 1.5], [10.05, 99.99], [18, 5], intra_state=False)
+    assert (inter_state['cgst'], inter_state['sgst'], inter_state['igst']) == (0, 0, 1293)
+
+
+@pytest.mark.parametrize('total_tax, cgst, sgst', [(0, 0, 0), (100, 50, 50), (101, 51, 50), (1, 1, 0)])
+def test_split_gst_gives_the_odd_paisa_to_cgst(total_tax, cgst, sgst):
+    assert split_gst(total_tax, intra_state=True) == {'cgst': cgst, 'sgst': sgst, 'igst': 0}
+    assert split_gst(total_tax, intra_state=False) == {'cgst': 0, 'sgst': 0, 'igst': total_tax}
+
+
+def test_client_profitability_sums_whole_paise_per_line(app, monkeypatch):
+    import analytics_engine
+    from app import db
+    from fact_store import InvoiceFactStore
+    from models import Client, Invoice, InvoiceLineItem
+
+    with app.app_context():
+        customer = Client(name='Fractional Quantity Client')
+        db.session.add(customer)
+        db.session.flush()
+        invoice = Invoice(invoice_number='MONEY-FRACTION', client_id=customer.id, invoice_date=date.today(),
+                          due_date=date.today(), payment_status='Paid')
+        for sr_no in (1, 2, 3):
+            # 0.333 x 10.01 = 3.33333 net, 0.333 x 7.77 = 2.58741 cost: 3.33 and 2.59 per line
+            invoice.line_items.append(InvoiceLineItem(
+                sr_no=sr_no, description='Fraction', quantity=0.333, unit_price_paise=1001,
+                tax_amount_paise=60, total_amount_paise=393, cost_price_paise=777
+            ))
+        db.session.add(invoice)
+        db.session.commit()
+
+        store = InvoiceFactStore()
+        store.build()
+        for backend in (None, store):
+            monkeypatch.setattr(analytics_engine, 'active_fact_store', lambda: backend)
+            rows = analytics_engine.AnalyticsEngine()._client_profitability(10_000)
+            (row,) = [row for row in rows if row['id'] == customer.id]
+            assert row['revenue'] == pytest.approx(9.99)
+            assert row['cost'] == pytest.approx(7.77)
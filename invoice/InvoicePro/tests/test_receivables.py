@@ -0,0 +1,73 @@
+from datetime import date, timedelta
+
+import pytest
+
+AS_OF = date(2025, 6, 30)
+
+# Days overdue on AS_OF -> the one bucket each invoice must land in
+EXPECTED_BUCKETS = {
+    0: 'current',
+    1: '1_30',
+    30: '1_30',
+    31: '31_60',
+    60: '31_60',
+    61: '61_90',
+    90: '61_90',
+    95: '90_plus',
+}
+
+
+@pytest.fixture(scope='module')
+def aging_client_id(app):
+    from app import db
+    from models import Client, Invoice
+
+    with app.app_context():
+        customer = Client(name='Aging Client')
+        db.session.add(customer)
+        db.session.flush()
+        for days in EXPECTED_BUCKETS:
+            db.session.add(Invoice(
+                invoice_number=f'AGING-{days}', client_id=customer.id, invoice_date=AS_OF - timedelta(days=120),
+                due_date=AS_OF - timedelta(days=days), payment_status='Unpaid',
+                total_amount_paise=100_000 + days, amount_paid_paise=0
+            ))
+        # Settled invoices never age
+        db.session.add(Invoice(
+            invoice_number='AGING-PAID', client_id=customer.id, invoice_date=AS_OF - timedelta(days=120),
+            due_date=AS_OF - timedelta(days=45), payment_status='Paid',
+            total_amount_paise=100_000, amount_paid_paise=100_000
+        ))
+        db.session.commit()
+        return customer.id
+
+
+def test_each_invoice_lands_in_exactly_one_bucket(app, aging_client_id):
+    from receivables import receivables_aging
+
+    with app.app_context():
+        aging = receivables_aging(as_of=AS_OF, client_id=aging_client_id)
+
+    expected = {key: {'count': 0, 'amount': 0} for key in aging['bucket_labels']}
+    for days, bucket in EXPECTED_BUCKETS.items():
+        expected[bucket]['count'] += 1
+        expected[bucket]['amount'] += 100_000 + days
+    expected = {key: {'count': b['count'], 'amount': b['amount'] / 100} for key, b in expected.items()}
+    assert aging['buckets'] == expected
+    assert aging['total']['count'] == len(EXPECTED_BUCKETS)
+    (client,) = aging['clients']
+    assert client['buckets'] == expected
+
+
+def test_client_buckets_add_up_to_overall(app, aging_client_id):
+    from receivables import receivables_aging
+
+    with app.app_context():
+        aging = receivables_aging(as_of=AS_OF)
+
+    assert aging['clients']
+    for key, overall in aging['buckets'].items():
+        assert sum(client['buckets'][key]['count'] for client in aging['clients']) == overall['count']
+        assert round(sum(client['buckets'][key]['amount'] for client in aging['clients']), 2) == \
+            round(overall['amount'], 2)
+    assert sum(client['count'] for client in aging['clients']) == aging['total']['count']
@@ -0,0 +1,103 @@
+from datetime import date
+
+from sqlalchemy import select
+
+
+def _table_rows(conn):
+    from revenue_rollup import FIGURES, rollup_table
+    return {(row.month, row.status): {name: row._mapping[name] for name in FIGURES}
+            for row in conn.execute(select(rollup_table))}
+
+
+def _recomputed_rows(conn):
+    from revenue_rollup import FIGURES, _aggregate
+    return {(row['month'], row['status']): {name: row[name] for name in FIGURES}
+            for row in _aggregate(conn)}
+
+
+def _invoice(customer, number, invoice_date, total_paise, **fields):
+    from models import Invoice, InvoiceLineItem
+    invoice = Invoice(invoice_number=number, client_id=customer.id, invoice_date=invoice_date,
+                      due_date=invoice_date, total_amount_paise=total_paise, cgst_paise=total_paise // 10,
+                      **fields)
+    invoice.line_items.append(InvoiceLineItem(sr_no=1, description='Item', quantity=1.5,
+                                              unit_price_paise=total_paise, cost_price_paise=333))
+    return invoice
+
+
+def test_rollup_tracks_invoice_changes(app, monkeypatch):
+    import revenue_rollup
+    from app import db
+    from models import Client, Invoice, InvoiceLineItem
+
+    # Every change below is applied as a delta, never by rebuilding
+    monkeypatch.setattr(revenue_rollup, 'rebuild_rollup', None)
+    with app.app_context():
+        customer = Client(name='Rollup Client')
+        db.session.add(customer)
+        db.session.flush()
+        first = _invoice(customer, 'ROLLUP-1', date(2024, 1, 15), 100_000)
+        second = _invoice(customer, 'ROLLUP-2', date(2024, 2, 3), 50_050)
+        db.session.add_all([first, second])
+        db.session.commit()
+        assert _table_rows(db.session.connection()) == _recomputed_rows(db.session.connection())
+
+        # Paid in another month, moved to another month, an item removed and one added
+        first.payment_status = 'Paid'
+        first.payment_date = date(2024, 3, 1)
+        second.invoice_date = date(2024, 3, 20)
+        db.session.delete(second.line_items[0])
+        first.line_items.append(InvoiceLineItem(sr_no=2, description='Extra', quantity=2,
+                                                unit_price_paise=100, cost_price_paise=75))
+        db.session.commit()
+        assert _table_rows(db.session.connection()) == _recomputed_rows(db.session.connection())
+
+        db.session.delete(first)
+        db.session.commit()
+        Invoice.query.filter(Invoice.id == second.id).delete(synchronize_session=False)
+        db.session.commit()
+        rows = _table_rows(db.session.connection())
+        assert rows == _recomputed_rows(db.session.connection())
+        assert not any(month in ('2024-01', '2024-02', '2024-03') for month, _ in rows)
+
+
+def test_rollup_skips_unrelated_changes(app, monkeypatch):
+    import revenue_rollup
+    from app import db
+    from models import Client
+
+    with app.app_context():
+        customer = Client(name='Rollup Skip Client')
+        db.session.add(customer)
+        db.session.flush()
+        invoice = _invoice(customer, 'ROLLUP-SKIP', date(2024, 4, 1), 10_000)
+        db.session.add(invoice)
+        db.session.commit()
+
+        calls = []
+        aggregate = revenue_rollup._aggregate
+        monkeypatch.setattr(revenue_rollup, '_aggregate', lambda *args: calls.append(args) or aggregate(*args))
+        invoice.qr_payment_code = 'upi://pay?am=100'
+        invoice.blockchain_hash = 'abc123'
+        invoice.notes = 'Side effects only'
+        db.session.commit()
+        assert calls == []
+
+
+def test_apply_delta_adds_to_existing_rows(app):
+    from app import db
+    from revenue_rollup import FIGURES, apply_delta
+
+    with app.app_context():
+        conn = db.session.connection()
+        one_invoice = dict(dict.fromkeys(FIGURES, 0), revenue_paise=500, invoice_count=1)
+        apply_delta(conn, {('1999-01', 'Unpaid'): one_invoice})
+        # A second transaction's delta adds to the row rather than replacing it
+        apply_delta(conn, {('1999-01', 'Unpaid'): one_invoice})
+        assert _table_rows(conn)[('1999-01', 'Unpaid')]['revenue_paise'] == 1000
+        assert _table_rows(conn)[('1999-01', 'Unpaid')]['invoice_count'] == 2
+
+        removed = {name: -2 * value for name, value in one_invoice.items()}
+        apply_delta(conn, {('1999-01', 'Unpaid'): removed})
+        assert ('1999-01', 'Unpaid') not in _table_rows(conn)
+        db.session.rollback()
@@ -0,0 +1,82 @@
+import os
+from datetime import date, datetime, timedelta
+
+import pytest
+
+
+class RecordingSMTP:
+    sent = []
+
+    def __init__(self, host, port):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def login(self, user, password):
+        pass
+
+    def send_message(self, msg):
+        self.sent.append(msg)
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    import utils
+    RecordingSMTP.sent = []
+    monkeypatch.setattr(utils.smtplib, 'SMTP_SSL', RecordingSMTP)
+    return RecordingSMTP
+
+
+@pytest.fixture
+def invoice(app, tmp_path, monkeypatch):
+    import invoice_pipeline
+    from app import db
+    from models import Client, Invoice
+
+    monkeypatch.setattr(invoice_pipeline.config, 'INVOICE_PDF_DIR', str(tmp_path))
+    with app.app_context():
+        customer = Client(name='Email Client', email='client@example.com')
+        db.session.add(customer)
+        db.session.flush()
+        invoice = Invoice(invoice_number=f'EMAIL-{tmp_path.name}', client_id=customer.id,
+                          invoice_date=date.today(), due_date=date.today())
+        db.session.add(invoice)
+        db.session.commit()
+        yield invoice
+
+
+def _attachment(msg):
+    (part,) = list(msg.iter_attachments())
+    return part.get_content()
+
+
+def test_email_attaches_current_prerendered_pdf(invoice, smtp):
+    from invoice_pipeline import prerendered_pdf_path
+    from utils import send_invoice_email
+
+    with open(prerendered_pdf_path(invoice.id), 'wb') as f:
+        f.write(b'%PDF-prerendered')
+
+    send_invoice_email(invoice, 'client@example.com')
+
+    assert _attachment(smtp.sent[0]) == b'%PDF-prerendered'
+
+
+def test_email_renders_when_prerendered_pdf_is_stale(invoice, smtp):
+    from invoice_pipeline import prerendered_pdf_path
+    from utils import send_invoice_email
+
+    path = prerendered_pdf_path(invoice.id)
+    with open(path, 'wb') as f:
+        f.write(b'%PDF-stale')
+    rendered_at = (invoice.updated_at - timedelta(hours=1) - datetime(1970, 1, 1)).total_seconds()
+    os.utime(path, (rendered_at, rendered_at))
+
+    send_invoice_email(invoice, 'client@example.com')
+
+    attachment = _attachment(smtp.sent[0])
+    assert attachment.startswith(b'%PDF') and attachment != b'%PDF-stale'
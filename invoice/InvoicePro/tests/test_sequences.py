@@ -0,0 +1,87 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+
+
+def test_reserve_hands_out_consecutive_blocks(app):
+    from app import db
+    from sequences import reserve
+
+    with app.app_context():
+        first = reserve('TST', 3, day='20250101')
+        second = reserve('TST', 1, day='20250101')
+        third = reserve('TST', 5, day='20250101')
+        other_day = reserve('TST', 2, day='20250102')
+        db.session.commit()
+
+    assert list(first) == [1, 2, 3]
+    assert list(second) == [4]
+    assert list(third) == [5, 6, 7, 8, 9]
+    assert list(other_day) == [1, 2]
+
+
+def test_concurrent_reservations_never_overlap(app):
+    from app import db
+    from sequences import reserve
+
+    def allocate():
+        blocks = []
+        for _ in range(10):
+            with app.app_context():
+                blocks.append(reserve('CONC', 2, day='20250101'))
+                db.session.commit()
+        return blocks
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        blocks = [block for result in executor.map(lambda _: allocate(), range(4)) for block in result]
+
+    numbers = sorted(number for block in blocks for number in block)
+    assert numbers == list(range(1, 81))
+    assert all(len(block) == 2 and block.step == 1 for block in blocks)
+
+
+def test_reserve_rejects_empty_blocks(app):
+    from sequences import reserve
+
+    with app.app_context(), pytest.raises(ValueError):
+        reserve('TST', 0)
+
+
+def test_document_numbers_format(app):
+    from app import db
+    from sequences import document_numbers
+
+    with app.app_context():
+        numbers = document_numbers('FMT', 2, width=4, day='20250301')
+        db.session.commit()
+
+    assert numbers == ['FMT-20250301-0001', 'FMT-20250301-0002']
+
+
+def test_seed_sequences_continues_after_existing_numbers(app):
+    from app import db
+    from models import Client, Invoice
+    from sequences import INVOICE_PREFIX, document_numbers, seed_sequences
+
+    with app.app_context():
+        customer = Client(name='Sequence Client')
+        db.session.add(customer)
+        db.session.flush()
+        # Numbers issued before sequences existed, including one in another format
+        for number in (f'{INVOICE_PREFIX}-19990105-007', f'{INVOICE_PREFIX}-19990105-012',
+                       f'{INVOICE_PREFIX}-19990106-003', f'{INVOICE_PREFIX}-19990105-X'):
+            db.session.add(Invoice(invoice_number=number, client_id=customer.id,
+                                   invoice_date=date(1999, 1, 5), due_date=date(1999, 1, 5)))
+        db.session.flush()
+
+        seed_sequences(db.session.connection())
+
+        assert document_numbers(INVOICE_PREFIX, 2, day='19990105') == [
+            f'{INVOICE_PREFIX}-19990105-013', f'{INVOICE_PREFIX}-19990105-014']
+        assert document_numbers(INVOICE_PREFIX, 1, day='19990106') == [f'{INVOICE_PREFIX}-19990106-004']
+
+        # Seeding again never moves a sequence backwards
+        seed_sequences(db.session.connection())
+        assert document_numbers(INVOICE_PREFIX, 1, day='19990105') == [f'{INVOICE_PREFIX}-19990105-015']
+        db.session.commit()
@@ -1,17 +1,22 @@
-import random
 import hashlib
-import qrcode
 import io
 import base64
 from datetime import datetime, timedelta
 from collections import defaultdict
-from sqlalchemy import func, extract
+from sqlalchemy import case, func, extract, select
 from dateutil.relativedelta import relativedelta
 from werkzeug.security import generate_password_hash as werkzeug_generate_password_hash
 from werkzeug.security import check_password_hash as werkzeug_check_password_hash
 
 from app import db
 from models import Invoice, Client, InvoiceLineItem, Company
+from sql_functions import days_between
+from money import sum_rupees
+from revenue_rollup import monthly_rollup
+from sequences import CHALLAN_PREFIX, INVOICE_PREFIX, document_numbers
+from lazy_imports import lazy_import
+
+qrcode = lazy_import('qrcode')
 
 def generate_password_hash(password):
     """Generate password hash"""
@@ -89,25 +94,12 @@ def number_to_words(n):
     return result.strip()
 
 def generate_invoice_number():
-    """Generate unique invoice number with AI-enhanced format"""
-    current_date = datetime.now()
-    date_str = current_date.strftime('%Y%m%d')
-    
-    # Get count of invoices created today
-    today_count = Invoice.query.filter(
-        Invoice.invoice_date == current_date.date()
-    ).count() + 1
-    
-    # Generate sequential number with random component for uniqueness
-    random_component = random.randint(100, 999)
-    invoice_number = f"AI-INV-{date_str}-{today_count:03d}-{random_component}"
-    
-    # Ensure uniqueness
-    while Invoice.query.filter_by(invoice_number=invoice_number).first():
-        random_component = random.randint(100, 999)
-        invoice_number = f"AI-INV-{date_str}-{today_count:03d}-{random_component}"
-    
-    return invoice_number
+    """Next invoice number for today, e.g. ``AI-INV-20250701-042``"""
+    return generate_invoice_numbers(1)[0]
+
+def generate_invoice_numbers(count):
+    """Reserve ``count`` consecutive invoice numbers at once, for bulk creation"""
+    return document_numbers(INVOICE_PREFIX, count, width=3)
 import smtplib
 from email.message import EmailMessage
 
@@ -119,14 +111,19 @@ def send_invoice_email(invoice, recipient_email):
     msg['To'] = recipient_email
     msg.set_content(f"Dear {invoice.client.name},\n\nPlease find attached Invoice #{invoice.invoice_number}.\n\nThanks!")
 
-    # Optional: attach PDF (if you have a PDF file path)
-    pdf_path = f"invoices/invoice_{invoice.id}.pdf"
+    # Attach the pipeline's PDF while it is current, otherwise render one now
+    from invoice_pipeline import prerendered_pdf
+    from pdf_generator import generate_invoice_pdf
     try:
-        with open(pdf_path, 'rb') as f:
-            pdf_data = f.read()
+        pdf_path = prerendered_pdf(invoice)
+        if pdf_path:
+            with open(pdf_path, 'rb') as f:
+                pdf_data = f.read()
+        else:
+            pdf_data = generate_invoice_pdf(invoice).getvalue()
         msg.add_attachment(pdf_data, maintype='application', subtype='pdf', filename=f"Invoice_{invoice.invoice_number}.pdf")
-    except FileNotFoundError:
-        print("Warning: PDF not found, sending email without attachment.")
+    except Exception as e:
+        print(f"Warning: PDF unavailable ({e}), sending email without attachment.")
 
     # Send email via SMTP (example using Gmail)
     try:
@@ -138,22 +135,8 @@ def send_invoice_email(invoice, recipient_email):
 
 
 def generate_challan_number():
-    """Generate unique delivery challan number"""
-    current_date = datetime.now()
-    date_str = current_date.strftime('%Y%m%d')
-    random_number = random.randint(1000, 9999)
-    
-    challan_number = f"CH-{date_str}-{random_number}"
-    
-    # Import here to avoid circular import
-    from models import DeliveryChallan
-    
-    # Ensure uniqueness
-    while DeliveryChallan.query.filter_by(challan_number=challan_number).first():
-        random_number = random.randint(1000, 9999)
-        challan_number = f"CH-{date_str}-{random_number}"
-    
-    return challan_number
+    """Next delivery challan number for today, e.g. ``CH-20250701-0007``"""
+    return document_numbers(CHALLAN_PREFIX, 1, width=4)[0]
 
 def generate_payment_qr_code(invoice):
     """Generate QR code for payment with UPI integration"""
@@ -218,16 +201,10 @@ def get_monthly_revenue_data(months=12):
     today = datetime.today()
     start_date = today.replace(day=1) - relativedelta(months=months-1)
 
-    results = db.session.query(
-        func.strftime('%Y-%m', Invoice.invoice_date).label('month'),
-        func.sum(Invoice.total_amount).label('revenue'),
-        func.count(Invoice.id).label('invoice_count')
-    ).filter(
-        Invoice.invoice_date >= start_date,
-        Invoice.payment_status == 'Paid'
-    ).group_by('month').order_by('month').all()
-
-    revenue_dict = {r.month: {'revenue': r.revenue, 'count': r.invoice_count} for r in results}
+    revenue_dict = {
+        r['month']: {'revenue': r['revenue'], 'count': r['invoice_count']}
+        for r in monthly_rollup(since=start_date)
+    }
     
     monthly_data = []
     for i in range(months):
@@ -251,13 +228,13 @@ def get_client_performance_metrics():
     top_clients = db.session.query(
         Client.name,
         Client.id,
-        func.sum(Invoice.total_amount).label('total_revenue'),
+        sum_rupees(Invoice.total_amount_paise).label('total_revenue'),
         func.count(Invoice.id).label('invoice_count'),
         func.avg(Invoice.total_amount).label('avg_invoice_value')
     ).join(Invoice).filter(
         Invoice.payment_status == 'Paid'
     ).group_by(Client.id).order_by(
-        func.sum(Invoice.total_amount).desc()
+        sum_rupees(Invoice.total_amount_paise).desc()
     ).limit(10).all()
     
     # Client type distribution
@@ -301,14 +278,14 @@ def get_payment_analytics():
     payment_status = db.session.query(
         Invoice.payment_status,
         func.count(Invoice.id).label('count'),
-        func.sum(Invoice.total_amount).label('total_amount')
+        sum_rupees(Invoice.total_amount_paise).label('total_amount')
     ).group_by(Invoice.payment_status).all()
     
     # Payment mode analysis (for paid invoices)
     payment_modes = db.session.query(
         Invoice.payment_mode,
         func.count(Invoice.id).label('count'),
-        func.sum(Invoice.total_amount).label('total_amount')
+        sum_rupees(Invoice.total_amount_paise).label('total_amount')
     ).filter(
         Invoice.payment_status == 'Paid',
         Invoice.payment_mode.isnot(None)
@@ -316,7 +293,7 @@ def get_payment_analytics():
     
     # Average payment delay
     avg_delay = db.session.query(
-        func.avg(func.julianday(Invoice.payment_date) - func.julianday(Invoice.due_date)).label('avg_delay')
+        func.avg(days_between(Invoice.payment_date, Invoice.due_date)).label('avg_delay')
     ).filter(
         Invoice.payment_status == 'Paid',
         Invoice.payment_date.isnot(None),
@@ -346,10 +323,10 @@ def get_payment_analytics():
 def get_tax_summary():
     """Get tax summary for financial reporting"""
     tax_summary = db.session.query(
-        func.sum(Invoice.cgst).label('total_cgst'),
-        func.sum(Invoice.sgst).label('total_sgst'),
-        func.sum(Invoice.igst).label('total_igst'),
-        func.sum(Invoice.total_amount).label('total_revenue')
+        sum_rupees(Invoice.cgst_paise).label('total_cgst'),
+        sum_rupees(Invoice.sgst_paise).label('total_sgst'),
+        sum_rupees(Invoice.igst_paise).label('total_igst'),
+        sum_rupees(Invoice.total_amount_paise).label('total_revenue')
     ).filter(Invoice.payment_status == 'Paid').first()
     
     return {
@@ -480,28 +457,49 @@ def calculate_due_date(invoice_date, payment_terms_days=30):
     """Calculate due date based on invoice date and payment terms"""
     return invoice_date + timedelta(days=payment_terms_days)
 
+def get_kpi_summary():
+    """Headline invoice numbers from a single conditional-aggregation query
+
+    Every figure is a ``SUM``/``COUNT`` over ``CASE`` expressions, so the
+    invoice table is scanned once; the client count rides along as a scalar
+    subquery in the same statement.
+    """
+    is_paid = Invoice.payment_status == 'Paid'
+    is_outstanding = Invoice.payment_status.in_(['Unpaid', 'Partially Paid'])
+    is_overdue = is_outstanding & (Invoice.due_date < datetime.now().date())
+    balance = Invoice.total_amount_paise - Invoice.amount_paid_paise
+
+    row = db.session.query(
+        func.count(Invoice.id).label('total_invoices'),
+        select(func.count(Client.id)).scalar_subquery().label('total_clients'),
+        sum_rupees(Invoice.total_amount_paise).label('total_billed'),
+        func.count(case((is_paid, Invoice.id))).label('paid_count'),
+        sum_rupees(case((is_paid, Invoice.total_amount_paise), else_=0)).label('total_revenue'),
+        func.count(case((is_outstanding, Invoice.id))).label('outstanding_count'),
+        sum_rupees(case((is_outstanding, balance), else_=0)).label('outstanding_amount'),
+        func.count(case((is_overdue, Invoice.id))).label('overdue_count'),
+        sum_rupees(case((is_overdue, balance), else_=0)).label('overdue_amount')
+    ).one()
+
+    return {
+        'total_invoices': row.total_invoices or 0,
+        'total_clients': row.total_clients or 0,
+        'total_billed': float(row.total_billed or 0),
+        'paid_count': row.paid_count or 0,
+        'total_revenue': float(row.total_revenue or 0),
+        'outstanding_count': row.outstanding_count or 0,
+        'outstanding_amount': float(row.outstanding_amount or 0),
+        'overdue_count': row.overdue_count or 0,
+        'overdue_amount': float(row.overdue_amount or 0)
+    }
+
 def get_outstanding_invoices_summary():
     """Get summary of outstanding invoices"""
-    outstanding = db.session.query(
-        func.count(Invoice.id).label('count'),
-        func.sum(Invoice.total_amount - Invoice.amount_paid).label('total_outstanding')
-    ).filter(
-        Invoice.payment_status.in_(['Unpaid', 'Partially Paid'])
-    ).first()
-    
-    # Overdue invoices (past due date)
-    overdue = db.session.query(
-        func.count(Invoice.id).label('count'),
-        func.sum(Invoice.total_amount - Invoice.amount_paid).label('total_overdue')
-    ).filter(
-        Invoice.payment_status.in_(['Unpaid', 'Partially Paid']),
-        Invoice.due_date < datetime.now().date()
-    ).first()
-    
+    kpis = get_kpi_summary()
     return {
-        'outstanding_count': outstanding.count or 0,
-        'outstanding_amount': float(outstanding.total_outstanding or 0),
-        'overdue_count': overdue.count or 0,
-        'overdue_amount': float(overdue.total_overdue or 0)
+        'outstanding_count': kpis['outstanding_count'],
+        'outstanding_amount': kpis['outstanding_amount'],
+        'overdue_count': kpis['overdue_count'],
+        'overdue_amount': kpis['overdue_amount']
     }
 
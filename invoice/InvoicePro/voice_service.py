@@ -1,11 +1,34 @@
+import os
 import json
 import logging
 import re
 from typing import Dict, Any, Optional, List
-import openai
+from lazy_imports import lazy_import
+from metrics import track
+from money import sum_rupees, from_paise
+from line_items import LineItemError, is_intra_state, price_line_items, save_line_items
 from datetime import datetime, timedelta
 from app import db
 from models import Client, Invoice, InvoiceLineItem, AIInteraction
+import config
+
+openai = lazy_import('openai')
+
+# Regex tables are compiled once at import so preloaded workers share them
+SPEECH_ARTIFACTS_RE = re.compile(r'\b(um|uh|er|ah)\b', re.IGNORECASE)
+WHITESPACE_RE = re.compile(r'\s+')
+
+NUMBER_WORDS = {
+    'zero': '0', 'one': '1', 'two': '2', 'three': '3', 'four': '4',
+    'five': '5', 'six': '6', 'seven': '7', 'eight': '8', 'nine': '9',
+    'ten': '10', 'eleven': '11', 'twelve': '12', 'thirteen': '13',
+    'fourteen': '14', 'fifteen': '15', 'sixteen': '16', 'seventeen': '17',
+    'eighteen': '18', 'nineteen': '19', 'twenty': '20', 'thirty': '30',
+    'forty': '40', 'fifty': '50', 'sixty': '60', 'seventy': '70',
+    'eighty': '80', 'ninety': '90', 'hundred': '100', 'thousand': '1000'
+}
+NUMBER_WORD_PATTERNS = [(re.compile(r'\b' + word + r'\b', re.IGNORECASE), num)
+                        for word, num in NUMBER_WORDS.items()]
 
 class VoiceCommandProcessor:
     """Process voice commands for invoice operations"""
@@ -70,10 +93,10 @@ class VoiceCommandProcessor:
     def _clean_voice_input(self, text: str) -> str:
         """Clean and normalize voice input text"""
         # Remove common speech artifacts
-        text = re.sub(r'\b(um|uh|er|ah)\b', '', text, flags=re.IGNORECASE)
+        text = SPEECH_ARTIFACTS_RE.sub('', text)
         
         # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text).strip()
+        text = WHITESPACE_RE.sub(' ', text).strip()
         
         # Convert numbers written as words to digits where appropriate
         text = self._convert_words_to_numbers(text)
@@ -82,18 +105,8 @@ class VoiceCommandProcessor:
     
     def _convert_words_to_numbers(self, text: str) -> str:
         """Convert number words to digits"""
-        word_to_num = {
-            'zero': '0', 'one': '1', 'two': '2', 'three': '3', 'four': '4',
-            'five': '5', 'six': '6', 'seven': '7', 'eight': '8', 'nine': '9',
-            'ten': '10', 'eleven': '11', 'twelve': '12', 'thirteen': '13',
-            'fourteen': '14', 'fifteen': '15', 'sixteen': '16', 'seventeen': '17',
-            'eighteen': '18', 'nineteen': '19', 'twenty': '20', 'thirty': '30',
-            'forty': '40', 'fifty': '50', 'sixty': '60', 'seventy': '70',
-            'eighty': '80', 'ninety': '90', 'hundred': '100', 'thousand': '1000'
-        }
-        
-        for word, num in word_to_num.items():
-            text = re.sub(r'\b' + word + r'\b', num, text, flags=re.IGNORECASE)
+        for pattern, num in NUMBER_WORD_PATTERNS:
+            text = pattern.sub(num, text)
         
         return text
     
@@ -138,11 +151,12 @@ class VoiceCommandProcessor:
             calculate_total, save_invoice, send_invoice, payment_status, client_summary, get_analytics
             """
             
-            response = openai.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                response_format={"type": "json_object"}
-            )
+            with track('openai'):
+                response = openai.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    response_format={"type": "json_object"}
+                )
             
             intent_data = json.loads(response.choices[0].message.content)
             return intent_data
@@ -337,7 +351,7 @@ class VoiceCommandProcessor:
             if len(clients) == 1:
                 client = clients[0]
                 recent_invoices_count = Invoice.query.filter_by(client_id=client.id).count()
-                total_business = db.session.query(db.func.sum(Invoice.total_amount))\
+                total_business = db.session.query(sum_rupees(Invoice.total_amount_paise))\
                     .filter(Invoice.client_id == client.id, Invoice.payment_status == 'Paid').scalar() or 0
                 
                 return {
@@ -385,26 +399,33 @@ class VoiceCommandProcessor:
                 }
             
             line_items = context["line_items"]
-            subtotal = sum(item["total_amount"] for item in line_items)
-            
-            # Calculate tax (assuming 18% GST)
-            tax_rate = 0.18
-            cgst = subtotal * (tax_rate / 2)
-            sgst = subtotal * (tax_rate / 2)
-            total_amount = subtotal + cgst + sgst
+            priced = price_line_items(line_items, intra_state=is_intra_state(context.get("client_id")))
+            subtotal = from_paise(priced["subtotal"])
+            cgst = from_paise(priced["cgst"])
+            sgst = from_paise(priced["sgst"])
+            igst = from_paise(priced["igst"])
+            total_amount = from_paise(priced["total"])
+            taxes = f"IGST ₹{igst:.2f}" if priced["igst"] else f"CGST ₹{cgst:.2f}, SGST ₹{sgst:.2f}"
             
             return {
                 "success": True,
-                "message": f"Invoice total: Subtotal ₹{subtotal:.2f}, CGST ₹{cgst:.2f}, SGST ₹{sgst:.2f}, Total Amount ₹{total_amount:.2f}",
+                "message": f"Invoice total: Subtotal ₹{subtotal:.2f}, {taxes}, Total Amount ₹{total_amount:.2f}",
                 "calculation": {
                     "subtotal": subtotal,
                     "cgst": cgst,
                     "sgst": sgst,
+                    "igst": igst,
                     "total_amount": total_amount,
                     "item_count": len(line_items)
                 }
             }
             
+        except LineItemError as e:
+            return {
+                "success": False,
+                "message": f"Some items need fixing before I can total them: {e}",
+                "errors": e.errors
+            }
         except Exception as e:
             logging.error(f"Calculate total command failed: {e}")
             return {
@@ -413,6 +434,66 @@ class VoiceCommandProcessor:
                 "error": str(e)
             }
     
+    def _handle_save_invoice(self, context: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Handle saving the invoice built up in the voice session"""
+        try:
+            if not context or not context.get("client_id"):
+                return {
+                    "success": False,
+                    "message": "There is no invoice in progress. Say 'Create invoice for [client name]' first.",
+                    "action_required": "provide_client_name"
+                }
+            
+            if not context.get("line_items"):
+                return {
+                    "success": False,
+                    "message": "Please add at least one item before saving the invoice.",
+                    "action_required": "provide_item_description"
+                }
+            
+            from utils import generate_invoice_number
+            from invoice_pipeline import enqueue_side_effects
+            
+            client_id = context["client_id"]
+            priced = price_line_items(context["line_items"], intra_state=is_intra_state(client_id))
+            
+            invoice_date = datetime.utcnow().date()
+            invoice = Invoice(
+                invoice_number=generate_invoice_number(),
+                client_id=client_id,
+                invoice_date=invoice_date,
+                due_date=invoice_date + timedelta(days=config.DEFAULT_PAYMENT_TERMS_DAYS),
+                voice_command_created=True
+            )
+            db.session.add(invoice)
+            db.session.flush()
+            save_line_items(invoice, priced)
+            enqueue_side_effects(invoice)
+            db.session.commit()
+            
+            return {
+                "success": True,
+                "message": f"Saved invoice {invoice.invoice_number} for ₹{from_paise(priced['total']):.2f}.",
+                "invoice_id": invoice.id,
+                "invoice_number": invoice.invoice_number
+            }
+            
+        except LineItemError as e:
+            db.session.rollback()
+            return {
+                "success": False,
+                "message": f"Some items need fixing before I can save the invoice: {e}",
+                "errors": e.errors
+            }
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Save invoice command failed: {e}")
+            return {
+                "success": False,
+                "message": "I couldn't save the invoice right now. Please try again.",
+                "error": str(e)
+            }
+    
     def _handle_unknown_command(self, original_text: str, intent_analysis: Dict[str, Any]) -> Dict[str, Any]:
         """Handle unknown or unclear commands"""
         return {
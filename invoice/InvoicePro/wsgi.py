@@ -0,0 +1,11 @@
+"""WSGI entry point for production servers
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+With ``preload_app`` the module is imported once in the gunicorn master, so
+the shared read-only state is built before the workers are forked.
+"""
+from app import create_app, preload_shared_state
+
+app = create_app()
+preload_shared_state(app)